@@ -1,2 +1,2 @@
-__all__ = ["child", "pool", "wrapper", "formatting", "reporting", "utils", "cache", "ui"]
+__all__ = ["child", "pool", "wrapper", "formatting", "reporting", "utils", "cache", "ui", "headless", "stats", "profile", "distributed", "jobs", "board", "channel", "feeder", "pacing", "navtiming", "results", "runreport", "metrics", "spool", "sinks", "screenshots", "artifacts", "log"]
 
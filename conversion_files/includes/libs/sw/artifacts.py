@@ -0,0 +1,143 @@
+from multiprocessing import Array
+from sw.const import *
+import zlib
+
+# Fields of the shared counters: screenshots taken, failures whose artifacts were skipped by sampling, screenshots
+# skipped for being over the disk budget, and bytes of screenshots written
+A_TAKEN     = 0
+A_SAMPLED   = 1
+A_BUDGET    = 2
+A_BYTES     = 3
+A_FIELDS    = 4
+
+# Slots in the table of failures counted per error signature. Signatures are hashed into it, two that share a slot are
+# sampled as one.
+SIGNATURES = 1024
+
+
+
+class ArtifactPolicy:
+    """Decides which failures leave artifacts behind: a screenshot, the formatted error, the stack trace, and local
+    variables. When a site falls over every job of every child fails the same way, and capturing all of that for each
+    would storm the disk just when the run needs to keep up.
+
+    The first *first* failures with each error signature (see :func:`~sw.formatting.errorSignature`) are captured, then
+    1 in every *every* after that. Failures that aren't are logged on a single line. Screenshots also stop once
+    *budget* bytes of them have been written in the run. Skipped captures are counted.
+
+    The counts are kept in shared memory, like the :class:`~sw.board.StatusBoard`, so every child of the pool samples and
+    spends from the same run-wide totals.
+
+    :param 5 first: Failures captured for each error signature before sampling starts.
+    :param 50 every: Then capture 1 failure in this many, 1 captures all of them.
+    :param None budget: Most bytes of screenshots written in the run, None for no limit.
+    :param None thumbnail: Shrink screenshots to at most this many pixels wide, None to keep them full size.
+    :param "png" format: Write screenshots as "png" or "jpeg". Both this and thumbnail need PIL, without it screenshots
+        are written as they are.
+
+    :return: ArtifactPolicy (self)
+    """
+    def __init__( self, first=5, every=50, budget=None, thumbnail=None, format="png" ):
+        if format not in [ "png", "jpeg" ]:
+            raise ValueError( ''.join( [ "Unknown screenshot format: ", str( format ) ] ) )
+        if every < 1:
+            raise ValueError( "Artifacts must be sampled at least 1 in every 1." )
+
+        self.first = first
+        self.every = every
+        self.budget = budget
+        self.thumbnail = thumbnail
+        self.format = format
+
+        self.counters = Array( 'd', A_FIELDS )
+
+        # Failures seen per signature slot, guarded by the counters' lock
+        self.signatures = Array( 'i', SIGNATURES, lock=False )
+
+
+
+    def capture( self, signature ):
+        """Counts a failure and decides whether its artifacts are captured.
+
+        :param signature: The error's signature.
+        :returns: Boolean
+        """
+        if not isinstance( signature, bytes ):
+            signature = signature.encode( 'utf-8' )
+        slot = ( zlib.crc32( signature ) & 0xffffffff ) % SIGNATURES
+
+        with self.counters.get_lock( ):
+            self.signatures[slot] += 1
+            n = self.signatures[slot]
+
+            if n <= self.first or ( n - self.first ) % self.every == 0:
+                return True
+
+            self.counters[A_SAMPLED] += 1
+
+        return False
+
+
+
+    def allow( self ):
+        """Decides whether a screenshot can be taken, which it can while the run is under its budget.
+
+        :returns: Boolean
+        """
+        with self.counters.get_lock( ):
+            if self.budget is not None and self.counters[A_BYTES] >= self.budget:
+                self.counters[A_BUDGET] += 1
+                return False
+
+            self.counters[A_TAKEN] += 1
+
+        return True
+
+
+
+    def spend( self, n ):
+        """Counts bytes of screenshots written.
+
+        :param n: Bytes written.
+        :returns: None
+        """
+        with self.counters.get_lock( ):
+            self.counters[A_BYTES] += n
+
+
+
+    def get( self, field ):
+        """Reads a counter.
+
+        :param field: An A_ constant.
+        :returns: Integer
+        """
+        return int( self.counters[field] )
+
+
+
+    def summary( self ):
+        """Describes what's been captured and skipped.
+
+        :returns: String
+        """
+        return ''.join( [ str( self.get( A_TAKEN ) ), " screenshot(s) taken (", str( self.get( A_BYTES ) // 1024 ), "KB), ",
+                          str( self.get( A_SAMPLED ) ), " failure(s) not captured by sampling, ",
+                          str( self.get( A_BUDGET ) ), " screenshot(s) skipped over budget" ] )
+
+
+
+def fromOptions( options ):
+    """Builds a run's artifact policy from its options, see the ``artifacts`` options.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :returns: :class:`ArtifactPolicy`, or None if every failure is captured.
+    """
+    if not options.get( 'artifacts', True ):
+        return None
+
+    budget = options.get( 'artifactsbudget', None )
+
+    return ArtifactPolicy( options.get( 'artifactsfirst', 5 ), options.get( 'artifactsevery', 50 ),
+                           budget * 1024 * 1024 if budget is not None else None,
+                           options.get( 'screenshotwidth', None ), options.get( 'screenshotformat', "png" ) )
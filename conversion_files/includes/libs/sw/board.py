@@ -0,0 +1,74 @@
+from multiprocessing import Array
+from sw.const import * # Constants
+import time
+
+class StatusBoard:
+    """A block of shared memory holding the live state of every child: its status, what it is showing on the console,
+    the step of its job it's on, and when it last did anything. Each child has a slot, indexed by its number, that only
+    it and the pool write to, so children update their state by writing straight into memory rather than sending a
+    message for the pool to unpickle. The pool and UI read the board whenever they like. The child queue is left for
+    results.
+
+    Fields within a slot are listed under the status board fields in const.py. Every field is stored as a double; the
+    status and display are whole numbers, the heartbeat a UNIX timestamp.
+
+    :param capacity: Number of slots, the most children the pool can have.
+
+    :return: StatusBoard (self)
+    """
+    def __init__( self, capacity ):
+        self.capacity = capacity
+
+        # Writes are single values with one writer each so the board doesn't need a lock
+        self.array = Array( 'd', capacity * B_FIELDS, lock=False )
+
+        for i in range( capacity ):
+            self.array[i * B_FIELDS + B_STATUS] = STARTING
+            self.array[i * B_FIELDS + B_DISPLAY] = DISP_LOAD
+
+
+
+    def get( self, num, field ):
+        """Reads a field from a child's slot.
+
+        :param num: The child's number.
+        :param field: The field, a B_ constant from const.py.
+        :returns: Float value of the field.
+        """
+        return self.array[num * B_FIELDS + field]
+
+
+
+    def set( self, num, field, value ):
+        """Writes a field in a child's slot.
+
+        :param num: The child's number.
+        :param field: The field, a B_ constant from const.py.
+        :param value: The number to store.
+        :returns: None
+        """
+        self.array[num * B_FIELDS + field] = value
+
+
+
+    def beat( self, num ):
+        """Records that a child is still doing something.
+
+        :param num: The child's number.
+        :returns: None
+        """
+        self.array[num * B_FIELDS + B_HEARTBEAT] = time.time( )
+
+
+
+    def idle( self, num ):
+        """How long it has been since a child last did anything.
+
+        :param num: The child's number.
+        :returns: Float for seconds since the child's last heartbeat, 0 if it has never had one.
+        """
+        beat = self.array[num * B_FIELDS + B_HEARTBEAT]
+        if beat == 0:
+            return 0.0
+
+        return time.time( ) - beat
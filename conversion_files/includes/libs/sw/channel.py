@@ -0,0 +1,320 @@
+from multiprocessing import Pipe, Lock, Process, Queue
+from collections import deque
+import Queue as Q
+import struct, time, sys
+
+try:
+    basestring
+    integer = ( int, long )
+except NameError:
+    basestring = str
+    integer = int
+
+# Frame header: child number, number of strings defined, number of records
+FRAME = struct.Struct( '<HHH' )
+
+# A string definition: id, length in bytes (followed by the UTF-8 bytes)
+STRING = struct.Struct( '<IH' )
+
+# A record: result, time, ids of up to two strings (0 for none), then a number such as a job's id
+RECORD = struct.Struct( '<BdIIq' )
+
+# Id given in place of the second string when the record's number goes there instead
+NUMBER = 0xFFFFFFFF
+
+# Most strings a writer remembers before it starts over. Keeps both ends' tables bounded when error messages vary.
+MAX_STRINGS = 4096
+
+# Most records sent in a single frame
+BATCH_SIZE = 256
+
+
+
+class Channel:
+    """Carries results from children to the pool. Results are the same lists children have always sent
+    (``[ num, RESULT, time, ... ]``, see the child queue indicies in const.py), but rather than pickling each one
+    through a :py:class:`~multiprocessing.Queue` they are packed into fixed size records and sent in batches, as frames,
+    over a single pipe.
+
+    Strings in a result (error messages, screenshot paths, message types) are sent once and then referred to by
+    number. Every child keeps its own table of strings it has sent; the pool keeps a copy of each.
+
+    The pool end reads with :func:`get`, which works like Queue.get. Each child makes a :class:`Writer` for its end
+    once it's running with :func:`writer`.
+
+    Run ``python -m sw.channel`` for a benchmark against multiprocessing.Queue.
+
+    :return: Channel (self)
+    """
+    def __init__( self ):
+        self.reader, self.sender = Pipe( False )
+
+        # Frames from several children must not interleave
+        self.lock = Lock( )
+
+        # Records read but not yet handed out by get( )
+        self.pending = deque( )
+
+        # Strings each child has defined, by child number
+        self.strings = { }
+
+
+
+    def writer( self, num ):
+        """Makes a writer for a child. Called in the child's process.
+
+        :param num: The child's number.
+        :returns: :class:`Writer`
+        """
+        return Writer( self.sender, self.lock, num )
+
+
+
+    def get( self, block=True, timeout=None ):
+        """Takes a single result from the channel.
+
+        :param True block: Wait for a result if there are none.
+        :param None timeout: Longest to wait in seconds, None to wait forever.
+        :returns: A result list, ``[ num, RESULT, time, string, string or number ]``. Missing strings are "".
+        :raises Queue.Empty: If there was no result and *block* was False or *timeout* passed.
+        """
+        if len( self.pending ) == 0:
+            if not block:
+                timeout = 0
+
+            if not self.reader.poll( timeout ):
+                raise Q.Empty
+
+            self.read( self.reader.recv_bytes( ) )
+
+        return self.pending.popleft( )
+
+
+
+    def empty( self ):
+        """Checks if there are no results waiting.
+
+        :returns: Boolean
+        """
+        return len( self.pending ) == 0 and not self.reader.poll( )
+
+
+
+    def read( self, data ):
+        """Decodes a frame into self.pending.
+
+        :param data: Bytes of a single frame.
+        :returns: None
+        """
+        num, nstrings, nrecords = FRAME.unpack_from( data, 0 )
+        offset = FRAME.size
+
+        strings = self.strings.setdefault( num, { 0: "" } )
+
+        for i in range( nstrings ):
+            id, length = STRING.unpack_from( data, offset )
+            offset += STRING.size
+            strings[id] = data[offset:offset+length].decode( 'utf-8', 'replace' )
+            offset += length
+
+        for i in range( nrecords ):
+            result, t, a, b, n = RECORD.unpack_from( data, offset )
+            offset += RECORD.size
+            self.pending.append( [ num, result, t, strings[a], n if b == NUMBER else strings[b] ] )
+
+
+
+class Writer:
+    """A child's end of a :class:`Channel`. Results are buffered by :func:`put` and sent together by :func:`flush`,
+    which the child calls when a job starts, when it ends (so its result is sent with everything the job recorded), and
+    before it finishes.
+
+    :param sender: Sending end of the channel's pipe.
+    :param lock: The channel's lock, held while sending a frame.
+    :param num: The child's number.
+
+    :return: Writer (self)
+    """
+    def __init__( self, sender, lock, num ):
+        self.sender = sender
+        self.lock = lock
+        self.num = num
+
+        # Ids of the strings we've sent
+        self.ids = { "": 0 }
+
+        # Strings and records waiting for the next flush
+        self.strings = [ ]
+        self.records = [ ]
+
+
+
+    def put( self, r ):
+        """Buffers a result to send. A full batch is sent right away.
+
+        :param r: Result list, ``[ num, RESULT, time, ... ]``. Only the result, time, and up to two strings are sent; a
+            non numeric time (such as the "" sent with READY) is sent as 0. An integer in place of the second string,
+            such as the job id sent when a job starts, is sent as a number rather than a string, so it doesn't fill the
+            string table.
+        :returns: None
+        """
+        # Start over rather than let the table grow forever, the pool overwrites ids as we redefine them. Done before
+        # interning so both of a record's strings come from the same table.
+        if len( self.ids ) + 2 > MAX_STRINGS:
+            self.flush( )
+            self.ids = { "": 0 }
+
+        t = r[2] if len( r ) > 2 and not isinstance( r[2], basestring ) else 0
+        a = self.intern( r[3] ) if len( r ) > 3 else 0
+        b, n = 0, 0
+        if len( r ) > 4:
+            if isinstance( r[4], integer ) and not isinstance( r[4], bool ):
+                b, n = NUMBER, r[4]
+            else:
+                b = self.intern( r[4] )
+
+        self.records.append( RECORD.pack( r[1], t, a, b, n ) )
+
+        if len( self.records ) >= BATCH_SIZE:
+            self.flush( )
+
+
+
+    def intern( self, s ):
+        """Finds the id of a string, queueing it to be sent with the next flush if it's new.
+
+        :param s: The string, anything else is converted to one. None is sent as "".
+        :returns: Integer id.
+        """
+        if s is None:
+            return 0
+
+        if not isinstance( s, basestring ):
+            s = str( s )
+
+        id = self.ids.get( s, None )
+        if id is not None:
+            return id
+
+        id = len( self.ids )
+        self.ids[s] = id
+
+        data = s.encode( 'utf-8' ) if not isinstance( s, bytes ) else s
+        data = data[:65535]
+        self.strings.append( STRING.pack( id, len( data ) ) + data )
+
+        return id
+
+
+
+    def flush( self ):
+        """Sends everything buffered as a single frame.
+
+        :returns: None
+        """
+        if len( self.records ) == 0 and len( self.strings ) == 0:
+            return
+
+        frame = b''.join( [ FRAME.pack( self.num, len( self.strings ), len( self.records ) ) ] + self.strings + self.records )
+        self.strings = [ ]
+        self.records = [ ]
+
+        with self.lock:
+            self.sender.send_bytes( frame )
+
+
+
+def benchmark( children=4, events=50000 ):
+    """Measures how many results per second reach the pool through a :class:`Channel` and through the
+    multiprocessing.Queue it replaced. Each of *children* processes sends *events* results, a mix of successes and
+    failures with a handful of distinct error messages.
+
+    :param 4 children: Number of sending processes.
+    :param 50000 events: Results each process sends.
+    :returns: None
+    """
+    sys.stdout.write( ''.join( [ str( children ), " children sending ", str( events ), " results each\n" ] ) )
+
+    for name, run in [ ( "multiprocessing.Queue", _benchQueue ), ( "Channel, flushed every result", _benchChannel( 1 ) ),
+                       ( "Channel, batched", _benchChannel( BATCH_SIZE ) ) ]:
+        elapsed = run( children, events )
+        sys.stdout.write( ''.join( [ name.ljust( 32 ), str( int( children * events / elapsed ) ).rjust( 10 ), " results/s\n" ] ) )
+        sys.stdout.flush( )
+
+
+
+def _result( num, i ):
+    """A result as a child would send it, used by the benchmark.
+
+    :param num: The child's number.
+    :param i: The result's number.
+    :returns: Result list.
+    """
+    if i % 10 == 0:
+        return [ num, 0, 1.5, ''.join( [ "Timed out waiting for element #", str( i % 7 ) ] ), "" ]
+
+    return [ num, 1, 0.25 + i % 100 / 100.0, "" ]
+
+
+
+def _sendQueue( q, num, events ):
+    """Sends results over a multiprocessing.Queue for the benchmark, one pickle each."""
+    for i in range( events ):
+        q.put( _result( num, i ) )
+
+
+
+def _benchQueue( children, events ):
+    """Times receiving every result over a multiprocessing.Queue."""
+    q = Queue( )
+    procs = [ Process( target=_sendQueue, args=( q, i, events ) ) for i in range( children ) ]
+
+    start = time.time( )
+    for p in procs:
+        p.start( )
+    for i in range( children * events ):
+        q.get( )
+    elapsed = time.time( ) - start
+
+    for p in procs:
+        p.join( )
+
+    return elapsed
+
+
+
+def _sendChannel( channel, num, events, every ):
+    """Sends results over a :class:`Channel` for the benchmark, flushing every *every* results."""
+    w = channel.writer( num )
+    for i in range( events ):
+        w.put( _result( num, i ) )
+        if ( i + 1 ) % every == 0:
+            w.flush( )
+    w.flush( )
+
+
+
+def _benchChannel( every ):
+    """Makes a function that times receiving every result over a :class:`Channel`, flushed every *every* results."""
+    def run( children, events ):
+        channel = Channel( )
+        procs = [ Process( target=_sendChannel, args=( channel, i, events, every ) ) for i in range( children ) ]
+
+        start = time.time( )
+        for p in procs:
+            p.start( )
+        for i in range( children * events ):
+            channel.get( )
+        elapsed = time.time( ) - start
+
+        for p in procs:
+            p.join( )
+
+        return elapsed
+
+    return run
+
+
+
+if __name__ == "__main__":
+    benchmark( )
@@ -1,64 +1,132 @@
-from multiprocessing import Process, Value
+from multiprocessing import Process
 from selenium import webdriver
 from selenium.webdriver.phantomjs.service import Service as PhantomJSService
 from sw.const import * # Constants
-from sw.formatting import formatError, errorLevelToStr
+from sw.formatting import formatError, errorLevelToStr, errorSignature
 from sw.cache import ElementCache 
+from sw.pacing import Pacer
+from sw.screenshots import ScreenshotWriter
+import sw.navtiming, sw.log
 import time, os, traceback, subprocess
+import Queue as Q
 from pprint import pformat
 from datetime import datetime
 from selenium.common.exceptions import *
 
+# Seconds a stopped child's process has to leave before it's terminated
+STOP_TIMEOUT = 5
+
+
+
 class Child:
     """An abstraction upon a process for our :class:`~sw.pool.Pool`. Serves to more easily house a separate process and
     communicate with it crossprocess. A Child is not entirely a separate container that is spawned from Pool and given
     free reign. The bulk of a Child is stored on the primary thread with the Pool, UI, and Reporting. However, 
     :py:func:`~sw.child.Child.think` is on a separate `multiprocessing.Process` along with the provided *func* and
-    GhostDriver / PhantomJS. All communication between Pool and Child is conducted over Child.statusVar (:py:func:`~multiprocessing.Value`) and
-    Child.cq / Child.wq (:py:class:`~multiprocessing.Queue`) to avoid locks (they are multiprocess-safe).
+    GhostDriver / PhantomJS. All communication between Pool and Child is conducted over Child.board (:class:`~sw.board.StatusBoard`),
+    Child.cq (:py:class:`~multiprocessing.Queue`), and Child.wq (:class:`~sw.jobs.JobQueue`) to avoid locks (they are multiprocess-safe).
+    Our status and display live in our slot of the board, the child queue only carries results.
     
     The off-thread child handles its own log, status reporting, error reporting, and getting new jobs. Once the process
     is started control is handed back over to the Pool which then manages the processes. 
 
     
-    :param cq: ChildQueue reference from :class:`~sw.pool.Pool`. Used to transmit the status of this Child
-        to our Pool.
-    :param wq: WorkQueue reference from :class:`~sw.pool.Pool`. This Child pops a function off this Queue 
-        then executes it, then repeats.
+    :param cq: ChildQueue reference from :class:`~sw.pool.Pool`, a :class:`~sw.channel.Channel`. Used to transmit
+        the results of this Child's jobs to our Pool.
+    :param wq: WorkQueue reference from :class:`~sw.pool.Pool`. This Child takes a job off this 
+        :class:`~sw.jobs.JobQueue`, runs *func* for it, then repeats.
+    :param board: :class:`~sw.board.StatusBoard` reference from :class:`~sw.pool.Pool`. Our status and display are
+        written to our slot in it.
+    :param func: The function ran for every job. It is given to the child once rather than with each job.
     :param num: Number of the Child relevant to :class:`~sw.pool.Pool`'s self.data array. This index is used to 
         easily communicate results and relate them to the child in that array. This number is actually one less
         than the index displayed on the console (which starts at 1 for the end user's sake).
     :param log: Base log directory which we spit logs and screenshots into. Just a string which should never change.
     :param options: Dict of kwargs which contain specific options passed to our wrapper.
+    :param None feeder: :class:`~sw.feeder.Feeder` reference from :class:`~sw.pool.Pool` if the run has test data. Each job
+        is given a row from it as self.row.
+    :param None artifacts: :class:`~sw.artifacts.ArtifactPolicy` reference from :class:`~sw.pool.Pool` deciding which
+        failures get a screenshot and a full dump in our log. Every failure does without one.
 
     :return: Child (self)
     """
-    def __init__( self, cq, wq, num, log, options ):
+    def __init__( self, cq, wq, board, func, num, log, options, feeder=None, artifacts=None ):
         self.cq = cq # Our shared output queue (childqueue) (multiprocessing)
         self.wq = wq  # Our shared input queue (workqueue) (multiprocessing)
+        self.board = board # Our shared state (multiprocessing)
 
         self.num = num
         self.driver = None
         self.log = log
-        self.lh = "" 
         self.options = options
         self.level = self.options.get( 'level', NOTICE )
-        self.func  = None
+        self.func  = func
+
+        # Our log, log-#.txt, written to from our process and by the pool on our behalf
+        self.logger = sw.log.fromOptions( self.options, os.path.join( self.log, ''.join( [ 'log-', str( num + 1 ) ] ) ),
+                                          { 'child': num + 1 } )
+
+        # Id of the job we're running, unique across the pool
+        self.job = None
+
+        # Our test data and the row the job we're running was given
+        self.feeder = feeder
+        self.row = None
+
+        # Think times between and within jobs, and how long we've thought during the job we're running
+        self.pacer = Pacer( self.options )
+        self.thought = 0
+
+        # Transactions started in the job we're running, by name, as ( start time, time thought before it )
+        self.transactions = { }
+
+        # Our end of the pool's result channel, made once our process is running
+        self.results = None
+
+        # Browser timings of the pages we load, None unless they're being collected
+        self.navTiming = sw.navtiming.fromOptions( self.options )
+
+        # Writes our screenshots in the background, made in our process when it first takes one
+        self.writer = None
+
+        # Which failures leave artifacts, and ( job, whether it does ) for the last one we asked about
+        self.artifacts = artifacts
+        self.decided = None
+
+        # The job we last took a screenshot in and how many we've taken in it, for naming them
+        self.shotJob = None
+        self.shots = 0
+
         self.sleepTime = self.options.get( 'childsleeptime', 1 )
         self.cache = ElementCache( )
-        self.statusVar = Value( 'i', STARTING )
         
         self.start( )
 
 
 
+    def process( self ):
+        """Runs in our process: :func:`think`, then writes out whatever is left of our log however think ended. A
+           process ends without the usual exit handlers so nothing else would.
+
+           :return: None
+        """
+        try:
+            self.think( )
+        except Exception as e:
+            self.logMsg( ''.join( [ "Child process crashed: ", str( e ), "\n", traceback.format_exc( ) ] ), CRITICAL )
+            raise
+        finally:
+            self.logger.close( )
+
+
+
     def think( self ):
         """This method is spawned on a separate process from our main thread. It takes no arguments, just reads from 
-           self variables set in :py:class:`~sw.child.Child` that are multiprocess-safe: wq, cq, and statusVar (and various 
+           self variables set in :py:class:`~sw.child.Child` that are multiprocess-safe: wq, cq, and board (and various 
            static variables). It also uses various on class variables for storage which are not touched by pool.
 
-           The purpose of this method is to cleanly start a loop of running PhantomJS with a fresh function pulled from
-           wq every time. When think ends, our Child process ends as well.
+           The purpose of this method is to cleanly start a loop of running PhantomJS with self.func for every job
+           pulled from wq. When think ends, our Child process ends as well.
 
            :return: None
         """
@@ -67,7 +135,11 @@ class Child:
         self.display( DISP_START )
 
         wq = self.wq
-        cq = self.cq
+        cq = self.results = self.cq.writer( self.num )
+
+        # Anything a previous process of ours had leased is lost with it
+        if self.feeder is not None:
+            self.feeder.reset( self.num )
 
         # This allows custom service arguments to be forced into PhantomJS, as it is not supported with the Python
         # bindings by default.
@@ -100,102 +172,263 @@ class Child:
         # throw an error instantly if the element does not exist.
         self.driver.implicitly_wait( 0 )
 
+        if self.navTiming is not None:
+            self.navTiming.watch( self.driver, self.pageLoaded )
+
         cq.put( [ self.num, READY, "" ] )
+        cq.flush( )
 
         self.logMsg( "Child process started and loaded" )
 
-        while not wq.empty( ):
-            # Block and wait otherwise exceptions are thrown. I've never seen it fail to get something here as
-            # there's a check below.
-            self.func = wq.get( True, 5 )
+        # In an open loop run jobs arrive over time so we wait for them, otherwise we leave once there's no more work
+        openLoop = self.options.get( 'rate', None ) is not None
+
+        while True:
+            try:
+                self.job = wq.get( openLoop, cancel=self.stopping )
+            except Q.Empty:
+                break
+
+            # The pool is finished with us
+            if self.job is None:
+                break
+
+            # Our row of test data for this job, running out of data ends the run for every child
+            if self.feeder is not None:
+                self.row = self.feeder.take( self.num )
+                if self.row is None:
+                    self.logMsg( "Ran out of rows of test data, no more jobs will be started.", WARNING )
+                    wq.clear( )
+                    wq.close( )
+                    break
+
             res = []
             start = 0
+            failed = False
 
             # Below we set to an error / done and wait.
 
             # FIXME: Waiting a second to show a status isn't appropriate. The Pool should change the status
             # for the child after enough time has elapsed.
             self.status( RUNNING )
+            self.board.set( self.num, B_STEP, 0 )
             
             try:
                 self.cache.clear( )
+                self.thought = 0
+                self.transactions = { }
                 start = time.time( )
                 self.display( DISP_GOOD )
-                cq.put( [ self.num, MESSAGE, time.time( ), R_JOB_START ] )
+                cq.put( [ self.num, MESSAGE, time.time( ), R_JOB_START, self.job ] )
+                cq.flush( )
                 self.func( self.driver )
             except TimeoutException as e:
                 self.display( DISP_ERROR )
 
-                screen = self.logError( str( e ) )
-                self.logMsg( ''.join( [ "Stack trace: ", traceback.format_exc( ) ] ), CRITICAL )
+                screen = self.logError( str( e ), trace=traceback.format_exc( ) )
                 
-                cq.put( [ self.num, FAILED, ( time.time( ) - start ), str( e ), screen ] )
+                cq.put( [ self.num, FAILED, self.elapsed( start ), str( e ), screen ] )
                 self.logMsg( "Timeout when finding element." )
-                time.sleep( 1 )
+                failed = True
+
+                # A timeout usually leaves the browser usable, but whatever the job left behind shouldn't carry over. If it
+                # can't be cleaned up the pool restarts us.
+                if self.options.get( 'resetonerror', True ) and not self.reset( ):
+                    break
             except Exception as e:
                 self.display( DISP_ERROR )
 
-                screen = self.logError( str( e ) ) # Capture the exception and log it
-                self.logMsg( ''.join( [ "Stack trace: ", traceback.format_exc( ) ] ), CRITICAL )
+                screen = self.logError( str( e ), trace=traceback.format_exc( ) ) # Capture the exception and log it
 
-                cq.put( [ self.num, FAILED, ( time.time( ) - start ), str( e ), screen ] )
-                time.sleep( 1 )
-                break
+                cq.put( [ self.num, FAILED, self.elapsed( start ), str( e ), screen ] )
+                failed = True
+
+                # Keep our warm browser if we can get it back to a clean state, otherwise the pool restarts us
+                if not self.options.get( 'resetonerror', True ) or not self.reset( ):
+                    break
             else:
                 self.display( DISP_FINISH )
 
-                t = time.time( ) - start
-                cq.put( [ self.num, DONE, ( time.time( ) - start ), "" ] )
-                self.logMsg( ''.join( [ "Successfully finished job (", format( t ), "s)" ] ) )
-                time.sleep( 0.5 )
+                t = self.elapsed( start )
+                cq.put( [ self.num, DONE, t, "" ] )
+                self.logMsg( [ "Successfully finished job (", format( t ), "s)" ] )
+            finally:
+                # Anything the script didn't end goes with the job, failing with it
+                for name in list( self.transactions.keys( ) ):
+                    self.endTransaction( name, failed )
+
+                # The pool gets our page timings once per job rather than once per page
+                if self.navTiming is not None:
+                    self.navTiming.ship( cq, self.num )
+
+                # Let other children have our row
+                if self.feeder is not None:
+                    self.feeder.done( self.num )
+
+                # Our result goes to the pool as a single frame with everything the job recorded
+                cq.flush( )
+
+                # Write out our log if it's been held long enough
+                self.logger.think( )
+
+            # Think before our next job. In an open loop run arrivals set the pace instead.
+            if not openLoop:
+                time.sleep( self.pacer.between( start, failed ) )
+
+        # The pool takes FINISHED to mean it has everything we sent, so nothing can still be waiting here
+        cq.flush( )
 
         # This line will cleanly kill PhantomJs for us.
         self.driver.quit( )
+
+        # Our last screenshots are still being written
+        if self.writer is not None:
+            self.writer.close( )
+
         self.display( DISP_DONE )
         self.status( FINISHED )
 
+        # Wake the pool so it can hand our work off or clean us up right away
+        cq.put( [ self.num, EXITED, "" ] )
+        cq.flush( )
+
+
+
+    def reset( self ):
+        """Puts the browser back into a clean state after a failed job so it can be reused for the next one rather than
+           restarting our process and PhantomJS. Any windows the job opened are closed, cookies and storage are cleared,
+           and the remaining window is sent to about:blank. The browser is then checked with :func:`healthy`.
+
+           :return: Boolean for if the browser is clean and usable.
+        """
+        try:
+            handles = self.driver.window_handles
+
+            # Close everything but our first window
+            for handle in handles[1:]:
+                self.driver.switch_to.window( handle )
+                self.driver.close( )
+            self.driver.switch_to.window( handles[0] )
+
+            # Storage is per origin so it has to be cleared before we navigate away
+            self.driver.execute_script( "try { window.localStorage.clear( ); window.sessionStorage.clear( ); } catch( e ) { }" )
+            self.driver.delete_all_cookies( )
+            # Past the navtiming wrapper around get, a blank page isn't something the job loaded
+            type( self.driver ).get( self.driver, "about:blank" )
+        except Exception as e:
+            self.logMsg( ''.join( [ "Failed to reset browser session: ", str( e ) ] ), CRITICAL )
+            return False
+
+        self.cache.clear( )
+
+        if not self.healthy( ):
+            return False
+
+        self.logMsg( "Reset browser session after a failed job", INFO )
+
+        return True
 
 
-    def logError( self, e, screenshot=True ):
+
+    def healthy( self ):
+        """Checks that PhantomJS is still responding by running a trivial script in it.
+
+           :return: Boolean for if the browser responded properly.
+        """
+        try:
+            if self.driver.execute_script( "return 1" ) == 1:
+                return True
+        except Exception as e:
+            self.logMsg( ''.join( [ "Browser health check failed: ", str( e ) ] ), CRITICAL )
+            return False
+
+        self.logMsg( "Browser health check failed: bad response", CRITICAL )
+        return False
+
+
+
+    def logError( self, e, screenshot=True, trace=None ):
         """Takes a JSON-encoded Selenium exception's text and spits it into the log in a more meaningful format.
-            Can optionally take a screenshot too.
+            Can optionally take a screenshot too. If the run's artifact policy passes over this failure (see
+            :func:`detailed`) only a single line is logged.
 
            :param e: Unicode JSON-encoded string from a WebDriver-thrown exception. *Must be a String*.
            :param True screenshot: Take a screenshot of the error automatically.
+           :param None trace: Stack trace to log with it.
 
            :return: String for screenshot location, if any.
         """
+        if not self.detailed( e ):
+            self.logMsg( ''.join( [ "Error (not captured, see artifacts options): ", formatError( e ) ] ), CRITICAL )
+            return None
 
         o = pformat( formatError( e, "log" ) )
         self.logMsg( o, CRITICAL )
 
+        if trace is not None:
+            self.logMsg( ''.join( [ "Stack trace: ", trace ] ), CRITICAL )
+
         if screenshot:
             return self.screenshot( CRITICAL )
 
 
 
+    def detailed( self, e ):
+        """Finds whether a failure gets its artifacts captured: a screenshot, a full dump of the error, its stack trace,
+           and local variables. The run's :class:`~sw.artifacts.ArtifactPolicy` decides once per job, the first time
+           it's asked, and whatever it decides holds for everything logged about the job after.
+
+           :param e: The error's text.
+           :return: Boolean
+        """
+        if self.artifacts is None:
+            return True
+
+        if self.decided is None or self.decided[0] != self.job:
+            self.decided = ( self.job, self.artifacts.capture( errorSignature( e ) ) )
+
+        return self.decided[1]
+
+
+
     def screenshot( self, level=NOTICE ):
-        """Saves a screenshot to error_#.png and prints a message into the log specifying the file logged to.
+        """Saves a screenshot to error_<child>_<job>.png and prints a message into the log specifying the file logged to.
+           A second screenshot in the same job is error_<child>_<job>_2.png and so on.
+
+           Only the grab from the browser happens here, the image is written by our :class:`~sw.screenshots.ScreenshotWriter`
+           so we can get back to work. The file appears shortly after this returns. With ``screenshotformat="jpeg"`` it's
+           a .jpg instead. No screenshot is taken once the run is over its ``artifactsbudget``.
            
            :param NOTICE level: This determines whether or not the error message will be logged according to the
                level set in self.level. The screenshot will print anyway. If this error is not greater or equal to the level specified in self.level,
                it is not printed. If it is, the message is printed into log.txt with the level specified by the timestamp.
-           :return: String for screenshot location
+           :return: String for screenshot location, None if none was taken
         """
-        fn = ""
-        i = 0
-        # If we are writing several errors, number them appropriately
         if not os.path.exists( self.log ):
             raise ValueError( ''.join( [ "Cannot write to a log directory that doesn't exist. ", self.log ] ), CRITICAL )
-            return
 
-        while True:
-            fn = os.path.join( self.log, ''.join( [ 'error_', str( i ), '.png' ] ) )
-            i += 1
-            if not os.path.isfile( fn ):
-                break
+        if self.artifacts is not None and not self.artifacts.allow( ):
+            self.logMsg( "Screenshot skipped, the run is over its artifactsbudget.", level )
+            return None
+
+        if self.writer is None:
+            self.writer = ScreenshotWriter( self.logMsg, self.artifacts )
+
+        # Job ids are unique across the pool so no other child can have the name; outside a job our process id is
+        job = str( self.job ) if self.job is not None else ''.join( [ "p", str( os.getpid( ) ) ] )
+        if job != self.shotJob:
+            self.shotJob = job
+            self.shots = 0
+        self.shots += 1
+
+        name = [ 'error_', str( self.num + 1 ), '_', job ]
+        if self.shots > 1:
+            name.extend( [ '_', str( self.shots ) ] )
+        name.append( self.writer.extension )
+        fn = os.path.join( self.log, ''.join( name ) )
+
+        self.writer.write( fn, self.driver.get_screenshot_as_base64( ) )
 
-        self.driver.save_screenshot( fn ) 
         self.logMsg( ''.join( [ "Wrote screenshot to: ", fn ] ), level )
 
         return fn
@@ -205,53 +438,137 @@ class Child:
     def logMsg( self, e, level=NOTICE, **kwargs ):
         """Writes to our message log if level is greater than or equal to our level (in self.log).
         
-           :param e: The message to be written to the log.
+           :param e: The message to be written to the log, or a list of strings to be joined into it only if it's
+               written. Nothing is formatted for a message below our level, see :class:`~sw.log.Logger`.
             
            :param NOTICE level: This determines whether or not the error message will be logged according to the
                level set in self.level. If this error is not greater or equal to the level specified in self.level,
                it is not printed. If it is, the message is printed into log.txt with the level specified by the timestamp.
 
            :Kwargs:
-              * **locals** (*None*): Optional locals dict to print out cleanly.
+              * **locals** (*None*): Optional locals dict to print out cleanly, only formatted if the message is written.
            :return: None
         """
-        locals = kwargs.get( 'locals', None )
-
         # Send error if appropriate
-        if level >= ERROR:
+        if level >= ERR:
             self.display( DISP_ERROR )
 
-        # Determine if we're logging this low
-        if level < self.level:
+        self.logger.log( e, level, kwargs.get( 'locals', None ) )
+
+
+
+    def display( self, t ):
+        """Changes what we show on the console by writing it to our slot on the board, which the UI reads directly.
+           Also counts as a heartbeat.
+           
+           :param t: The status this child will now show, a constant starting with DISP in const.py.
+
+           :returns: None
+        """
+        self.board.set( self.num, B_DISPLAY, t )
+        self.board.beat( self.num )
+
+
+
+    def step( self ):
+        """Marks that our job has moved on to its next step, such as waiting on another element. The step is kept on
+           the board so the pool can tell where a job that has gone quiet got stuck.
+
+           :returns: None
+        """
+        self.board.set( self.num, B_STEP, self.board.get( self.num, B_STEP ) + 1 )
+        self.board.beat( self.num )
+
+        self.pause( self.pacer.within( ) )
+
+
+
+    def pause( self, seconds ):
+        """Thinks for a while during a job, as a user would between actions. The time isn't counted towards the job's
+           time. Scripts can call this directly (``driver.child.pause( 2 )``); a pause is also taken at each step with
+           ``stepthinktime``.
+
+           :param seconds: Seconds to pause.
+           :returns: None
+        """
+        if seconds <= 0:
             return
 
-        # Get our timestamp
-        timestamp = datetime.now( ).strftime( "%H:%M:%S" )
-        
-        # String
-        w = ''.join( [ "[", timestamp, "] ", errorLevelToStr( level ), "\t", e, "\n" ] )
+        self.thought += seconds
+        time.sleep( seconds )
 
-        # Locals if specified
-        if locals != None:
-            self.logMsg( ''.join( [ "Local variables: ", pformat( locals ) ] ), level )
 
-        # This typically errors out the first time through
-        try: 
-            self.lh.write( w ) 
-        except:
-            self.lh = open( os.path.join( self.log, ''.join( [ 'log-', str( self.num + 1 ), '.txt' ] ) ), 'a+', 0 )
-            self.lh.write( w ) 
 
+    def transaction( self, name ):
+        """Times a named step of a job, such as logging in or a search, so it can be seen which part of a job is slow
+           rather than only that the whole job is. Used as a context manager::
 
+             with driver.child.transaction( "login" ):
+                 sendKeys( driver, "username", "id", "user" )
+                 driver.find_element_by_id( "submit" ).click( )
 
-    def display( self, t ):
-        """Sends a display message to the main loop, which is then translated to the UI.
-           
-           :param t: The status this child will now show, a constant starting with DISP in const.py.
+           The transaction fails if an exception leaves the block. For more control, see :func:`startTransaction` and
+           :func:`endTransaction`.
 
+           :param name: The transaction's name. Its results are aggregated with every other transaction of that name.
+           :returns: :class:`Transaction`
+        """
+        return Transaction( self, name )
+
+
+
+    def startTransaction( self, name ):
+        """Starts timing a named transaction. If it isn't ended with :func:`endTransaction` it ends with the job.
+
+           :param name: The transaction's name.
            :returns: None
         """
-        self.cq.put( [ self.num, DISPLAY, t ] )
+        self.transactions[name] = ( time.time( ), self.thought )
+
+
+
+    def endTransaction( self, name, failed=False ):
+        """Ends a named transaction and sends its time to the pool. Time spent thinking during it is left out.
+
+           :param name: The transaction's name, as given to :func:`startTransaction`.
+           :param False failed: If the transaction failed.
+           :returns: None
+        """
+        if name not in self.transactions:
+            self.logMsg( ''.join( [ "Ended transaction \"", name, "\" which was never started." ] ), WARNING )
+            return
+
+        started, thought = self.transactions.pop( name )
+        t = max( 0.0, time.time( ) - started - ( self.thought - thought ) )
+
+        self.results.put( [ self.num, TRANSACTION, t, name, "failed" if failed else "" ] )
+        self.logMsg( [ "Transaction \"", name, "\" ", "failed" if failed else "finished", " (", format( t ), "s)" ], INFO )
+
+
+
+    def pageLoaded( self ):
+        """Reads the browser's timings for the page we're on, if they're being collected (``navtiming``). Called after
+           every successful :py:func:`~sw.utils.sleepwait`; a failure to read them is logged but never fails the job.
+
+           :returns: None
+        """
+        if self.navTiming is None:
+            return
+
+        try:
+            self.navTiming.collect( self.driver )
+        except Exception as e:
+            self.logMsg( ''.join( [ "Failed to read navigation timing: ", str( e ) ] ), WARNING )
+
+
+
+    def elapsed( self, start ):
+        """How long the job we're running has taken, leaving out any time spent thinking during it.
+
+           :param start: UNIX timestamp of when the job started.
+           :returns: Float for seconds.
+        """
+        return max( 0.0, time.time( ) - start - self.thought )
 
 
 
@@ -269,7 +586,7 @@ class Child:
 
 
     def status( self, type=None ):
-        """Uses a multiprocess-safe variable to transmit our status upstream. These values are listed under
+        """Uses our slot on the status board to transmit our status upstream. These values are listed under
            universal status types in const.py. The status types allow better logging and, for example, prevent
            children that were already terminated from being terminated again (and throwing an exception).
 
@@ -281,10 +598,18 @@ class Child:
            :returns: If type isn't specified, our status. If it is, it sets our type and returns None.
         """
         if type is None:
-            return self.statusVar.value
+            return int( self.board.get( self.num, B_STATUS ) )
         else:
-            with self.statusVar.get_lock( ):
-                self.statusVar.value = type
+            self.board.set( self.num, B_STATUS, type )
+
+
+
+    def stopping( self ):
+        """Checks from our process whether the pool has stopped us, so we leave rather than wait for work.
+
+           :return: Boolean
+        """
+        return self.status( ) > RUNNING
 
 
 
@@ -301,14 +626,14 @@ class Child:
         if not os.path.isdir( self.log ):
             os.makedirs( self.log )
 
-        # Open our handle
-        self.lh = open( os.path.join( self.log, ''.join( [ 'log-', str( self.num + 1 ), '.txt' ] ) ), 'a+' )
+        # Our process shouldn't inherit anything we have waiting to be written
+        self.logger.flush( )
 
         # Show loading
         self.display( flag )
 
         # Our process 
-        self.proc = Process( target=self.think, args=( ) )
+        self.proc = Process( target=self.process, args=( ) )
         self.proc.start( )
 
 
@@ -343,8 +668,9 @@ class Child:
         if self.proc == None:
             return
 
-        # Prevent the pool from trying to restart us
+        # Prevent the pool from trying to restart us, and tell our process to leave if it's waiting for work
         self.status( flag )
+        self.wq.wake( )
 
         if msg != "":
             self.logMsg( ''.join( [ "Stopping child process: \"", msg, "\"" ] ) )
@@ -357,15 +683,24 @@ class Child:
                 subprocess.call( [ 'taskkill', '/F', '/T', '/PID', str( self.proc.pid ) ], stdout=open( os.devnull, 'wb' ), stderr=open( os.devnull, 'wb' ) )
             else:
                 subprocess.call( [ 'pkill', '-TERM', '-P', str( self.proc.pid ) ], stdout=open( os.devnull, 'wb' ), stderr=open( os.devnull, 'wb' ) )
-            self.proc.join( )
+            # Our process leaves once its browser is gone, unless it's stuck somewhere it won't notice
+            self.proc.join( STOP_TIMEOUT )
+            if self.proc.is_alive( ):
+                self.logMsg( ''.join( [ "Child process didn't stop within ", str( STOP_TIMEOUT ), "s, terminating it" ] ), WARNING )
+                self.proc.terminate( )
+                self.proc.join( )
             self.proc = None
 
+        # Free up any rows of test data our process was holding
+        if self.feeder is not None:
+            self.feeder.reset( self.num )
+
         # Inform the TUI that we're done.
         self.display( disp_flag )
 
         # Close our log
-        self.lh.close( )
-        
+        self.logger.close( )
+
 
     def flush( self ):
         """Flushes our log so that messages are retained on an internal error.
@@ -373,7 +708,33 @@ class Child:
            :return: None
         """
 
-        self.lh.flush( )
+        self.logger.flush( )
+
+
+
+class Transaction:
+    """Context manager returned by :func:`Child.transaction`.
+
+       :param child: The :class:`Child` running the transaction.
+       :param name: The transaction's name.
+
+       :return: Transaction (self)
+    """
+    def __init__( self, child, name ):
+        self.child = child
+        self.name = name
+
+
+
+    def __enter__( self ):
+        self.child.startTransaction( self.name )
+        return self
+
+
+
+    def __exit__( self, type, value, tb ):
+        self.child.endTransaction( self.name, type is not None )
+        return False
 
 
 
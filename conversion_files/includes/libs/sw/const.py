@@ -4,9 +4,11 @@
 FAILED         = 0
 DONE           = 1
 READY          = 2
-DISPLAY        = 3
 STATUS         = 4
 MESSAGE        = 5
+EXITED         = 6
+TRANSACTION    = 7 # A named transaction within a job ended, its name is in the ERROR slot and "failed" in EXTRA1 if it did
+NAVTIMING      = 8 # Browser timings for a URL pattern, page loads in TIME, the pattern in ERROR, and its sw.navtiming.PageTimes as JSON in EXTRA1
 ####################################################################################################
 
 
@@ -14,11 +16,24 @@ MESSAGE        = 5
 ####################################################################################################
 # Pool Data Indicies
 #   These are stored in pool.data and per child. Failures/Successes store number of each,
-#   while times is another array that stores all the time taken for each child.
+#   while times is a sw.stats.Histogram of the time taken for each of the child's jobs.
 FAILURES       = 0
 SUCCESSES      = 1
-DISPLAY        = 2
-TIMES          = 3
+TIMES          = 2
+####################################################################################################
+
+
+
+####################################################################################################
+# Status Board Fields
+#   Each child's slot in the pool's sw.board.StatusBoard. The status is one of the universal status
+#   types, display one of the display types, step counts the waits in the current job, and heartbeat
+#   is when the child last did anything.
+B_STATUS       = 0
+B_DISPLAY      = 1
+B_STEP         = 2
+B_HEARTBEAT    = 3
+B_FIELDS       = 4
 ####################################################################################################
 
 
@@ -90,4 +105,19 @@ R_JOB_FAIL          = "JOB ERROR"
 R_STOP              = "POOL STOP"
 R_NEW_CHILD         = "NEW CHILD"
 R_END_CHILD         = "END CHILD"
+R_TRANSACTION       = "TRANSACTION"
+R_NAVTIMING         = "NAVIGATION TIMING"
+R_SESSION           = "SESSION"
+####################################################################################################
+
+
+
+####################################################################################################
+# Exit Codes
+#   Returned by a headless run (see sw.headless) so schedulers and CI can tell how the run went.
+EXIT_OK             = 0 # Every job finished successfully
+EXIT_FAILURES       = 1 # Some jobs failed
+EXIT_NO_SUCCESS     = 2 # Work was given but not a single job succeeded
+EXIT_INTERRUPTED    = 3 # Stopped early by the user / scheduler
+EXIT_ERROR          = 4 # Stopped early by an error, such as a browser that won't start
 ####################################################################################################
@@ -0,0 +1,835 @@
+import socket, select, struct, json, time, os, sys, datetime
+from collections import OrderedDict
+from sw.pool import Pool
+from sw.headless import Headless
+from sw.initialsettings import applyDefaults
+from sw.stats import Histogram, Stats
+from sw.navtiming import PageTimes
+from sw.const import * # Constants
+from sw.formatting import *
+from multiprocessing import Process
+import sw.profile
+
+# Options that decide a process's role, these aren't passed on from the coordinator to workers
+ROLE_OPTIONS = [ 'coordinator', 'worker', 'workers', 'localworkers', 'config' ]
+
+# Port used when an address doesn't include one
+DEFAULT_PORT = 9166
+
+
+
+class Connection:
+    """One end of a coordinator/worker TCP connection. Messages are dicts sent as JSON, each framed with its length as a
+    4 byte big-endian integer so they can be picked back out of the stream.
+
+    The socket stays blocking (with a timeout) for sends; reads are only done after select( ) says the socket is readable
+    so :func:`read` never waits.
+
+    :param sock: A connected socket.
+    :param "" name: A name for the other end, used in messages.
+
+    :return: Connection (self)
+    """
+    def __init__( self, sock, name="" ):
+        self.sock = sock
+        self.sock.settimeout( 10 )
+        self.name = name
+
+        # Bytes received that don't make up a full message yet
+        self.buffer = b''
+
+        # Last time we heard anything from the other end
+        self.heard = time.time( )
+
+
+
+    def send( self, msg ):
+        """Sends a message.
+
+        :param msg: Dict to send, must be JSON serializable.
+        :return: None
+        """
+        data = json.dumps( msg ).encode( 'utf-8' )
+        self.sock.sendall( struct.pack( '!I', len( data ) ) + data )
+
+
+
+    def read( self ):
+        """Reads whatever has arrived and decodes every complete message in it. Raises EOFError if the other end has
+        closed the connection.
+
+        :return: List of message dicts, possibly empty.
+        """
+        data = self.sock.recv( 65536 )
+        if not data:
+            raise EOFError( ''.join( [ "Connection closed by ", self.name ] ) )
+
+        self.heard = time.time( )
+        self.buffer += data
+
+        msgs = [ ]
+        while len( self.buffer ) >= 4:
+            size = struct.unpack( '!I', self.buffer[:4] )[0]
+            if len( self.buffer ) < size + 4:
+                break
+
+            msgs.append( json.loads( self.buffer[4:size+4].decode( 'utf-8' ) ) )
+            self.buffer = self.buffer[size+4:]
+
+        return msgs
+
+
+
+    def close( self ):
+        """Closes the connection, ignoring any errors as the other end may already be gone.
+
+        :return: None
+        """
+        try:
+            self.sock.close( )
+        except socket.error:
+            pass
+
+
+
+class Coordinator:
+    """Splits a run across several worker machines, each of which runs its own :class:`~sw.pool.Pool`. The coordinator
+    listens on the ``coordinator`` address and waits for ``workers`` workers to connect before giving each a share of the
+    run: a share of ``jobs`` for a closed loop run or of ``rate`` for an open loop one, weighted by the number of children
+    each worker runs. Everything else in the coordinator's options is passed along as is.
+
+    Workers stream a batch of results every ``batchinterval`` seconds, counters and a :class:`~sw.stats.Histogram` of
+    the job times recorded since their last batch, which the coordinator merges to print live, run-wide summaries. A worker
+    that disconnects, or goes quiet for ``workertimeout`` seconds once the run has started, is dropped and its unfinished
+    jobs (or its rate) are handed out among those left.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :param sys.stdout out: File-like object summaries are written to.
+
+    :return: Coordinator (self)
+    """
+    def __init__( self, options, out=sys.stdout ):
+        self.options = options
+        self.out = out
+
+        host, port = address( options['coordinator'], "0.0.0.0" )
+        self.server = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        self.server.setsockopt( socket.SOL_SOCKET, socket.SO_REUSEADDR, 1 )
+        self.server.bind( ( host, port ) )
+        self.server.listen( 16 )
+
+        # Number of workers to wait for before starting
+        self.expected = options.get( 'workers', 1 )
+
+        # Our workers, each a Connection with some extra bookkeeping
+        self.workers = [ ]
+
+        # Merged results from every worker, overall and per named transaction
+        self.stats = Stats( )
+        self.transactions = OrderedDict( )
+        self.navTiming = OrderedDict( )
+        self.missed = 0
+
+        # Jobs that belonged to dropped workers which couldn't be handed to anyone
+        self.lost = 0
+
+        self.started = None
+        self.interrupted = False
+
+        # The run's load profile, whose targets are split between workers like jobs or rate. None if there isn't one.
+        self.profile = sw.profile.fromOptions( options ) if options.get( 'profile', None ) is not None else None
+
+        self.summaryTime = options.get( 'summaryinterval', 5 )
+        self.timeout = options.get( 'workertimeout', 15 )
+
+        # Next time we print a summary and ping workers
+        self.nextSummary = time.time( )
+
+
+
+    def run( self ):
+        """Waits for our workers, starts them, then gathers their results until they have all finished.
+
+        :return: Integer exit code, see the exit codes in const.py.
+        """
+        self.write( ''.join( [ "Waiting for ", str( self.expected ), " worker(s) on ", str( self.server.getsockname( ) ) ] ) )
+
+        try:
+            while len( [ w for w in self.live( ) if w.ready ] ) < self.expected:
+                self.wait( 1 )
+
+            self.assign( )
+
+            while not self.finished( ):
+                self.wait( max( 0, self.nextSummary - time.time( ) ) )
+
+                if time.time( ) >= self.nextSummary:
+                    self.nextSummary = time.time( ) + self.summaryTime
+                    self.ping( )
+                    self.summary( )
+        except KeyboardInterrupt:
+            self.write( "Interrupted, stopping workers." )
+            self.interrupted = True
+
+        for w in self.live( ):
+            try:
+                w.send( { 'type': "stop" } )
+            except socket.error:
+                pass
+            w.close( )
+
+        self.server.close( )
+        self.summary( )
+
+        for name, stats in self.transactions.items( ):
+            self.write( "   ".join( formatTransaction( name, stats, time.time( ) - ( self.started or time.time( ) ) ) ) )
+
+        for pattern, times in self.navTiming.items( ):
+            self.write( "   ".join( formatNavTiming( pattern, times ) ) )
+
+        return self.exitCode( )
+
+
+
+    def wait( self, timeout ):
+        """Waits up to *timeout* seconds for a new connection or messages from workers and handles anything that arrives.
+        Once the run has started, workers that have gone quiet are dropped. Before then a worker has nothing to say after
+        its hello, so only a closed connection drops it.
+
+        :param timeout: Seconds to wait.
+        :return: None
+        """
+        socks = [ self.server ] + [ w.sock for w in self.live( ) ]
+        readable = select.select( socks, [ ], [ ], timeout )[0]
+
+        for s in readable:
+            if s is self.server:
+                self.accept( )
+                continue
+
+            w = [ w for w in self.workers if w.sock is s ][0]
+            try:
+                for msg in w.read( ):
+                    self.handle( w, msg )
+            except ( EOFError, socket.error, ValueError ) as e:
+                self.drop( w, str( e ) )
+
+        if self.started is None:
+            return
+
+        for w in self.live( ):
+            if time.time( ) - w.heard > self.timeout:
+                self.drop( w, ''.join( [ "nothing heard for ", str( self.timeout ), "s" ] ) )
+
+
+
+    def accept( self ):
+        """Accepts a new worker connection. Workers connecting after the run has started are turned away.
+
+        :return: None
+        """
+        sock, addr = self.server.accept( )
+        w = Connection( sock, ':'.join( [ str( x ) for x in addr ] ) )
+
+        if self.started is not None:
+            w.send( { 'type': "stop" } )
+            w.close( )
+            self.write( ''.join( [ "Turned away late worker ", w.name ] ) )
+            return
+
+        w.alive = True
+        w.ready = False
+        w.done = False
+        w.weight = 1
+        w.assigned = 0
+        w.share = 0
+        w.stats = Stats( )
+        w.gauges = { 'children': 0, 'active': 0, 'left': 0 }
+
+        self.workers.append( w )
+
+
+
+    def handle( self, w, msg ):
+        """Handles a single message from a worker.
+
+        :param w: The worker's :class:`Connection`.
+        :param msg: The message dict.
+        :return: None
+        """
+        if msg['type'] == "hello":
+            w.name = ''.join( [ str( msg.get( 'host', w.name ) ), " (", str( msg.get( 'pid', "" ) ), ")" ] )
+            w.weight = max( 1, msg.get( 'children', 1 ) )
+            w.ready = True
+            self.write( ''.join( [ "Worker connected: ", w.name ] ) )
+
+        elif msg['type'] == "batch":
+            stats = decode( msg )
+
+            w.stats.merge( stats )
+            self.stats.merge( stats )
+            self.missed += msg.get( 'missed', 0 )
+
+            for name, d in msg.get( 'transactions', { } ).items( ):
+                if name not in self.transactions:
+                    self.transactions[name] = Stats( )
+                self.transactions[name].merge( decode( d ) )
+
+            for pattern, d in msg.get( 'navtiming', { } ).items( ):
+                if pattern not in self.navTiming:
+                    self.navTiming[pattern] = PageTimes( )
+                self.navTiming[pattern].merge( PageTimes.fromDict( d ) )
+
+            w.gauges = msg['gauges']
+            w.done = msg['done']
+
+
+
+    def assign( self ):
+        """Gives every worker its share of the run and starts it.
+
+        :return: None
+        """
+        self.started = time.time( )
+        self.nextSummary = self.started
+
+        # Anyone who hasn't introduced themselves by now misses out
+        for w in self.live( ):
+            if not w.ready:
+                self.send( w, { 'type': "stop" } )
+                w.alive = False
+                w.close( )
+
+        live = self.live( )
+        base = dict( ( key, value ) for key, value in self.options.items( ) if key not in ROLE_OPTIONS )
+
+        rate = self.options.get( 'rate', None )
+        shares = split( self.options.get( 'jobs', 1 ) if rate is None else rate, [ w.weight for w in live ], rate is None )
+
+        profiles = self.profileShares( [ w.weight for w in live ] )
+
+        for w, share, stages in zip( live, shares, profiles ):
+            options = dict( base )
+            if rate is None:
+                options['jobs'] = share
+                w.assigned = share
+            else:
+                options['rate'] = share
+                w.share = share
+
+            # The profile is sent as a list of stages, so the end a builder gave it goes along as the duration
+            if stages is not None:
+                options['profile'] = stages
+                options['profilekind'] = self.profile.kind
+                if options.get( 'duration', None ) is None:
+                    options['duration'] = self.profile.end
+
+            w.send( { 'type': "start", 'options': options } )
+            # However long it waited for the others, its time to go quiet starts now
+            w.heard = self.started
+            self.write( ''.join( [ "Started ", w.name, " with ", "rate " if rate is not None else "", str( share ), " jobs" if rate is None else "",
+                                   ", profile " if stages is not None else "",
+                                   str( [ s[1] for s in stages ] ) if stages is not None else "" ] ) )
+
+
+
+    def drop( self, w, reason ):
+        """Drops a worker that disconnected or went quiet, handing its unfinished work to the workers left.
+
+        :param w: The worker's :class:`Connection`.
+        :param reason: Why it's being dropped.
+        :return: None
+        """
+        w.alive = False
+        w.close( )
+        self.write( ''.join( [ "Dropped worker ", w.name, ": ", reason ] ) )
+
+        if self.started is None or w.done:
+            return
+
+        live = [ x for x in self.live( ) if x.ready ]
+        if len( live ) == 0:
+            self.lost += max( 0, w.assigned - w.stats.successes )
+            return
+
+        weights = [ x.weight for x in live ]
+
+        if self.profile is not None:
+            for x, stages in zip( live, self.profileShares( weights ) ):
+                self.send( x, { 'type': "profile", 'stages': stages } )
+
+        if self.options.get( 'rate', None ) is not None:
+            for x, share in zip( live, split( self.options['rate'], weights, False ) ):
+                x.share = share
+                self.send( x, { 'type': "rate", 'rate': share } )
+        elif not self.openLoop( ):
+            left = max( 0, w.assigned - w.stats.successes )
+            for x, share in zip( live, split( left, weights, True ) ):
+                if share > 0:
+                    x.assigned += share
+                    x.done = False
+                    self.send( x, { 'type': "jobs", 'count': share } )
+
+
+
+    def openLoop( self ):
+        """Checks if the run is open loop, given a rate or a profile of rates.
+
+        :return: Boolean
+        """
+        return self.options.get( 'rate', None ) is not None or ( self.profile is not None and self.profile.kind == "rate" )
+
+
+
+    def profileShares( self, weights ):
+        """Splits our load profile between workers. Each stage's target is split by weight, as a whole number of
+        children or a share of the rate, so between them the workers follow the profile as one pool would.
+
+        :param weights: List of weights, one per worker.
+        :return: List of stage lists, one per worker, or of None if there's no profile.
+        """
+        if self.profile is None:
+            return [ None for w in weights ]
+
+        shares = [ [ ] for w in weights ]
+        for start, target, name in self.profile.stages:
+            for stages, share in zip( shares, split( target, weights, self.profile.kind == "children" ) ):
+                stages.append( [ start, share, name ] )
+
+        return shares
+
+
+
+    def send( self, w, msg ):
+        """Sends a message to a worker, dropping it if the connection fails.
+
+        :param w: The worker's :class:`Connection`.
+        :param msg: The message dict.
+        :return: None
+        """
+        try:
+            w.send( msg )
+        except socket.error as e:
+            self.drop( w, str( e ) )
+
+
+
+    def ping( self ):
+        """Lets every worker know we're still here.
+
+        :return: None
+        """
+        for w in self.live( ):
+            self.send( w, { 'type': "ping" } )
+
+
+
+    def live( self ):
+        """Lists the workers that haven't been dropped.
+
+        :return: List of worker :class:`Connection` objects.
+        """
+        return [ w for w in self.workers if w.alive ]
+
+
+
+    def finished( self ):
+        """Checks if the run is over, which is when every worker left has finished its share.
+
+        :return: Boolean for if the run is over.
+        """
+        live = self.live( )
+        if len( live ) == 0:
+            return True
+
+        for w in live:
+            if not w.done:
+                return False
+
+        return True
+
+
+
+    def summary( self ):
+        """Writes a single line describing the whole run to self.out.
+
+        :return: None
+        """
+        live = self.live( )
+        times = self.stats.times
+
+        statstrs = [ ''.join( [ "Workers: ", str( len( live ) ) ] ),
+                     ''.join( [ "Children: ", str( sum( [ w.gauges['children'] for w in live ] ) ) ] ),
+                     ''.join( [ "Act: ", str( sum( [ w.gauges['active'] for w in live ] ) ) ] ),
+                     ''.join( [ "Jobs Left: ", str( sum( [ w.gauges['left'] for w in live ] ) ) ] ),
+                     ''.join( [ "Successful: ", str( self.stats.successes ) ] ),
+                     ''.join( [ "Failed: ", str( self.stats.failures ) ] ),
+                     ''.join( [ "Avg Job: ", format( times.mean( ) ), "s" ] ),
+                     ''.join( [ "p50: ", format( times.percentile( 50 ) ), "s" ] ),
+                     ''.join( [ "p95: ", format( times.percentile( 95 ) ), "s" ] ),
+                     ''.join( [ "p99: ", format( times.percentile( 99 ) ), "s" ] ),
+                     ''.join( [ "Max: ", format( times.max ), "s" ] ) ]
+
+        if self.openLoop( ):
+            statstrs.append( ''.join( [ "Missed: ", str( self.missed ) ] ) )
+
+        if self.started is not None and time.time( ) > self.started:
+            statstrs.append( ''.join( [ "True JPS: ", format( self.stats.successes / ( time.time( ) - self.started ) ) ] ) )
+
+        self.write( "   ".join( statstrs ) )
+
+
+
+    def write( self, msg ):
+        """Writes a timestamped line to self.out.
+
+        :param msg: The line to write.
+        :return: None
+        """
+        self.out.write( ''.join( [ "[", datetime.datetime.now( ).strftime( "%H:%M:%S" ), "]   ", msg, "\n" ] ) )
+        self.out.flush( )
+
+
+
+    def exitCode( self ):
+        """Determines the process exit code from the merged results. See the exit codes in const.py.
+
+        :return: Integer exit code.
+        """
+        if self.interrupted or self.lost > 0:
+            return EXIT_INTERRUPTED
+
+        if self.stats.failures == 0:
+            return EXIT_OK
+
+        if self.stats.successes == 0:
+            return EXIT_NO_SUCCESS
+
+        return EXIT_FAILURES
+
+
+
+class Worker:
+    """Runs a share of a distributed run. A worker connects to the ``worker`` address, introduces itself, and waits for
+    the coordinator to send the run's options along with its share of jobs or rate. Options given on the worker's own
+    command line override those from the coordinator (for example a bigger box can run more children). It then runs its
+    :class:`~sw.pool.Pool` headless, sending a batch of results every ``batchinterval`` seconds.
+
+    The worker stops its pool and exits when told to, when the coordinator disconnects, or when nothing has been heard
+    from it for ``workertimeout`` seconds.
+
+    :param func: The function that will be ran continously to simulate load.
+    :param file: Usually __file__, the name of a script in the directory that log/ will be in.
+    :param options: Dict of kwargs passed to our wrapper.
+    :param overrides: Dict of options given on the command line, which take precedence over the coordinator's.
+
+    :return: Worker (self)
+    """
+    def __init__( self, func, file, options, overrides ):
+        self.func = func
+        self.file = file
+        self.options = options
+        self.overrides = dict( ( key, value ) for key, value in overrides.items( ) if key not in ROLE_OPTIONS )
+
+        self.pool = None
+        self.stopped = False
+        self.lostCoordinator = False
+
+        self.batchTime = options.get( 'batchinterval', 1 )
+        self.timeout = options.get( 'workertimeout', 15 )
+
+        # What we've already sent upstream, so each batch only holds what's new
+        self.sent = Stats( )
+        self.sentMissed = 0
+        self.sentTransactions = { }
+        self.sentNavTiming = { }
+
+
+
+    def run( self ):
+        """Connects, runs our share, and reports until the coordinator is finished with us.
+
+        :return: Integer exit code, see the exit codes in const.py.
+        """
+        host, port = address( self.options['worker'], "127.0.0.1" )
+        self.conn = Connection( socket.create_connection( ( host, port ) ), "coordinator" )
+
+        self.conn.send( { 'type': "hello", 'host': socket.gethostname( ), 'pid': os.getpid( ),
+            'children': self.overrides.get( 'children', self.options.get( 'children', 1 ) ) } )
+
+        # Nothing to do until we're given our share
+        start = None
+        while start is None and not self.stopped:
+            start = self.receive( None )
+
+        if self.stopped:
+            self.conn.close( )
+            return EXIT_INTERRUPTED
+
+        options = dict( ( str( key ), value ) for key, value in start['options'].items( ) )
+        options.update( self.overrides )
+        applyDefaults( options )
+
+        # Several workers can share a machine and a script directory
+        options['logformat'] = ''.join( [ options.get( 'logformat', "%Y-%m-%d_%H-%M-%S" ), "_worker-", str( os.getpid( ) ) ] )
+
+        self.pool = Pool( self.func, self.file, options )
+        self.pool.ui = Headless( self.pool )
+        self.nextBatch = time.time( ) + self.batchTime
+
+        try:
+            while not self.stopped and not self.pool.stopped:
+                self.pool.think( min( self.pool.ui.timeout( ), max( 0, self.nextBatch - time.time( ) ) ) )
+                self.pool.ui.think( )
+
+                self.receive( 0 )
+
+                if time.time( ) >= self.nextBatch:
+                    self.nextBatch = time.time( ) + self.batchTime
+                    self.batch( )
+        except KeyboardInterrupt:
+            self.pool.logMsg( "Interrupted, stopping pool.", WARNING )
+            self.pool.ui.interrupted = True
+
+        self.pool.stop( )
+
+        if not self.lostCoordinator:
+            try:
+                self.batch( )
+            except socket.error:
+                pass
+
+        self.conn.close( )
+        self.pool.ui.summary( )
+        self.pool.ui.transactions( )
+        self.pool.ui.navTiming( )
+        self.pool.ui.report( )
+
+        if self.lostCoordinator:
+            return EXIT_INTERRUPTED
+
+        return self.pool.ui.exitCode( )
+
+
+
+    def receive( self, timeout ):
+        """Handles any messages from the coordinator, waiting up to *timeout* seconds for one.
+
+        :param timeout: Seconds to wait, None to wait forever.
+        :return: The start message if one arrived, otherwise None.
+        """
+        start = None
+
+        if self.conn.sock in select.select( [ self.conn.sock ], [ ], [ ], timeout )[0]:
+            try:
+                msgs = self.conn.read( )
+            except ( EOFError, socket.error, ValueError ) as e:
+                self.lose( str( e ) )
+                return None
+
+            for msg in msgs:
+                if msg['type'] == "start":
+                    start = msg
+                elif msg['type'] == "stop":
+                    self.stopped = True
+                elif msg['type'] == "jobs" and self.pool is not None:
+                    self.pool.workQueue.put( msg['count'] )
+                    self.pool.logMsg( ''.join( [ "Coordinator handed over ", str( msg['count'] ), " more jobs" ] ) )
+                elif msg['type'] == "profile" and self.pool is not None:
+                    self.pool.reprofile( msg['stages'] )
+                elif msg['type'] == "rate" and self.pool is not None:
+                    self.pool.rate = msg['rate']
+                    self.pool.logMsg( ''.join( [ "Coordinator changed our rate to ", str( msg['rate'] ) ] ) )
+        elif timeout is not None and time.time( ) - self.conn.heard > self.timeout:
+            self.lose( ''.join( [ "nothing heard for ", str( self.timeout ), "s" ] ) )
+
+        return start
+
+
+
+    def lose( self, reason ):
+        """Gives up on the coordinator, the run is stopped.
+
+        :param reason: Why we gave up.
+        :return: None
+        """
+        self.stopped = True
+        self.lostCoordinator = True
+
+        if self.pool is not None:
+            self.pool.logMsg( ''.join( [ "Lost the coordinator: ", reason ] ), CRITICAL )
+
+
+
+    def batch( self ):
+        """Sends everything recorded since the last batch to the coordinator, along with a few gauges.
+
+        :return: None
+        """
+        pool = self.pool
+        stats = pool.stats
+
+        alive = 0
+        for c in pool.children:
+            if c.is_alive( ):
+                alive += 1
+
+        transactions = { }
+        for name, x in pool.transactions.items( ):
+            transactions[name] = delta( x, self.sentTransactions.get( name, Stats( ) ) )
+
+        navTiming = { }
+        for pattern, x in pool.navTiming.items( ):
+            navTiming[pattern] = x.diff( self.sentNavTiming.get( pattern, PageTimes( ) ) ).toDict( )
+
+        msg = delta( stats, self.sent )
+        msg.update( { 'type': "batch",
+                      'missed': pool.missed - self.sentMissed,
+                      'transactions': transactions,
+                      'navtiming': navTiming,
+                      'gauges': { 'children': alive, 'active': len( pool.busy ), 'left': pool.workQueue.qsize( ) },
+                      'done': pool.status == RUNNING and pool.done( ) } )
+        self.conn.send( msg )
+
+        self.sent = snapshot( stats )
+        self.sentMissed = pool.missed
+        self.sentTransactions = dict( ( name, snapshot( x ) ) for name, x in pool.transactions.items( ) )
+        self.sentNavTiming = dict( ( pattern, x.copy( ) ) for pattern, x in pool.navTiming.items( ) )
+
+
+
+def delta( stats, sent ):
+    """Encodes what has been recorded in a set of stats since a :func:`snapshot` of them was sent.
+
+    :param stats: :class:`~sw.stats.Stats` to send.
+    :param sent: :func:`snapshot` of them when they were last sent.
+    :return: Dict which :func:`decode` turns back into Stats.
+    """
+    return { 'successes': stats.successes - sent.successes,
+             'failures': stats.failures - sent.failures,
+             'times': stats.times.diff( sent.times ).toDict( ) }
+
+
+
+def snapshot( stats ):
+    """Copies a set of stats as they are now, to compare against with :func:`delta` later.
+
+    :param stats: :class:`~sw.stats.Stats` to copy.
+    :return: :class:`~sw.stats.Stats`
+    """
+    copy = Stats( )
+    copy.successes = stats.successes
+    copy.failures = stats.failures
+    copy.times = stats.times.copy( )
+
+    return copy
+
+
+
+def decode( d ):
+    """Decodes stats encoded by :func:`delta`.
+
+    :param d: Dict from :func:`delta`.
+    :return: :class:`~sw.stats.Stats`
+    """
+    stats = Stats( )
+    stats.successes = d['successes']
+    stats.failures = d['failures']
+    stats.times = Histogram.fromDict( d['times'] )
+
+    return stats
+
+
+
+def local( func, file, options ):
+    """Runs a distributed run on this machine alone: a :class:`Coordinator` and ``localworkers`` :class:`Worker`
+    processes connected to it over the loopback interface. Everything goes through the same protocol as a run across
+    machines, dropped workers included, so this is the way to try out a distributed setup or work on the protocol
+    without more machines. Workers' summaries are left out of the output, each still keeps its own logs.
+
+    The coordinator listens on ``coordinator`` if it's given, otherwise on a free loopback port.
+
+    :param func: The function that will be ran continously to simulate load.
+    :param file: Usually __file__, the name of a script in the directory that log/ will be in.
+    :param options: Dict of kwargs passed to our wrapper.
+    :return: Integer exit code, see the exit codes in const.py.
+    """
+    count = int( options['localworkers'] )
+
+    options = dict( options )
+    if not options.get( 'coordinator', False ):
+        options['coordinator'] = "127.0.0.1:0"
+    options['workers'] = count
+
+    coordinator = Coordinator( options )
+    host, port = coordinator.server.getsockname( )
+
+    workerOptions = dict( ( key, value ) for key, value in options.items( ) if key not in ROLE_OPTIONS )
+    workerOptions['worker'] = ''.join( [ "127.0.0.1" if host == "0.0.0.0" else host, ":", str( port ) ] )
+
+    procs = [ Process( target=_localWorker, args=( func, file, workerOptions ) ) for i in range( count ) ]
+    for p in procs:
+        p.start( )
+
+    try:
+        return coordinator.run( )
+    finally:
+        for p in procs:
+            p.join( 30 )
+            if p.is_alive( ):
+                p.terminate( )
+
+
+
+def _localWorker( func, file, options ):
+    """Runs one of :func:`local`'s workers in its own process."""
+    # Summaries are written to the stdout they were given when imported, so the descriptor itself is swapped
+    devnull = os.open( os.devnull, os.O_WRONLY )
+    os.dup2( devnull, sys.stdout.fileno( ) )
+    Worker( func, file, options, { } ).run( )
+
+
+
+def address( addr, host ):
+    """Splits a "host:port" address. Either part may be left off.
+
+    :param addr: The address, a string. True is taken to mean every default.
+    :param host: Host to use if none is given.
+    :return: Tuple of ( host, port ).
+    """
+    if addr is True or addr is None:
+        return ( host, DEFAULT_PORT )
+
+    addr = str( addr )
+    if ":" in addr:
+        h, port = addr.rsplit( ":", 1 )
+        return ( h or host, int( port ) )
+
+    if addr.isdigit( ):
+        return ( host, int( addr ) )
+
+    return ( addr, DEFAULT_PORT )
+
+
+
+def split( total, weights, whole ):
+    """Splits an amount between several parties in proportion to their weights.
+
+    :param total: The amount to split.
+    :param weights: List of weights, one per party.
+    :param whole: If True the amount is split into integers which add back up to *total* exactly.
+    :return: List of shares, one per weight.
+    """
+    if len( weights ) == 0:
+        return [ ]
+
+    sumWeights = float( sum( weights ) )
+
+    if not whole:
+        return [ total * w / sumWeights for w in weights ]
+
+    shares = [ int( total * w / sumWeights ) for w in weights ]
+    for i in range( int( total ) - sum( shares ) ):
+        shares[i % len( shares )] += 1
+
+    return shares
@@ -0,0 +1,275 @@
+from multiprocessing import Array, Lock, RawValue
+from collections import deque
+import os, csv, json, random, time
+
+class Feeder:
+    """Feeds rows of test data (user accounts, search terms, product ids) to jobs so that load is spread across them
+    rather than every job hitting the same, cached, path. Rows are streamed from a CSV or JSONL file and never loaded
+    into memory as a whole, so files can be as large as the disk allows. A job's row is available to the script as
+    ``driver.child.row``; a dict for a CSV file with a header or a JSONL file, otherwise a list.
+
+    Children lease rows in batches of *batch* to cut down on locking. Where the next batch starts is kept as a byte offset
+    into the file shared by every child. There are three modes:
+
+    - ``sequential``: Rows are handed out in order, wrapping around at the end of the file.
+    - ``random``: Each row is picked at random by seeking to a random spot in the file. Rows after long rows are slightly
+      more likely to be picked. No locking is needed.
+    - ``unique``: As sequential, but a row is never used by two children at once. Rows a child holds are kept in a shared
+      lease table, with a slot of *batch* rows per child, which other children skip over. If every row is leased a child
+      waits for one to be freed.
+
+    Without wrapping the feeder runs dry at the end of the file, which ends the run.
+
+    :param fn: Filename of the data, a .csv or .jsonl file.
+    :param slots: Number of children the lease table has room for, see :class:`~sw.board.StatusBoard`.
+    :param "sequential" mode: "sequential", "random", or "unique".
+    :param 10 batch: Rows leased at a time.
+    :param True wrap: Start again from the top once the end of the file is reached.
+    :param None format: "csv" or "jsonl", guessed from the file extension if not given.
+    :param True header: Whether the first line of a CSV file names its columns.
+
+    :return: Feeder (self)
+    """
+    def __init__( self, fn, slots, mode="sequential", batch=10, wrap=True, format=None, header=True ):
+        if mode not in [ "sequential", "random", "unique" ]:
+            raise ValueError( ''.join( [ "Unknown data mode: ", str( mode ) ] ) )
+
+        if format is None:
+            format = "jsonl" if os.path.splitext( fn )[1].lower( ) in [ ".jsonl", ".json" ] else "csv"
+
+        self.fn = fn
+        self.mode = mode
+        self.batch = batch
+        self.wrap = wrap
+        self.format = format
+        self.size = os.path.getsize( fn )
+
+        # Column names, if the file has them, and where the rows start
+        self.fields = None
+        self.start = 0
+
+        if format == "csv" and header:
+            with open( fn, "rb" ) as f:
+                self.fields = self.parse( f.readline( ) )
+                self.start = f.tell( )
+
+        if self.start >= self.size:
+            raise ValueError( ''.join( [ "No rows in data file: ", fn ] ) )
+
+        # Guards the cursor and lease table
+        self.lock = Lock( )
+
+        # Offset of the next row to lease
+        self.cursor = RawValue( 'l', self.start )
+
+        # Set once the file has been read through without wrapping
+        self.exhausted = RawValue( 'b', 0 )
+
+        # Offsets of rows each child holds, -1 for an empty entry
+        self.leases = None
+        if mode == "unique":
+            self.leases = Array( 'l', [ -1 ] * ( slots * batch ), lock=False )
+
+        ####### Per Process ########
+        # Our own handle on the file, opened in each child's process
+        self.f = None
+
+        # Rows leased by this process and not used yet, as ( offset, row )
+        self.rows = deque( )
+
+        # Offset of the row the current job is using
+        self.current = None
+
+
+
+    def take( self, num ):
+        """Gets the next row for a job, leasing another batch if this child has used the last. Called in the child's
+        process.
+
+        :param num: The child's number.
+        :returns: The row, or None if the data has run out.
+        """
+        if len( self.rows ) == 0:
+            while not self.lease( num ):
+                if self.exhausted.value:
+                    return None
+
+                # Every row is held by another child, one will be freed when a job finishes
+                time.sleep( 0.1 )
+
+        self.current, row = self.rows.popleft( )
+
+        return row
+
+
+
+    def done( self, num ):
+        """Releases the row the current job was using so other children may use it.
+
+        :param num: The child's number.
+        :returns: None
+        """
+        if self.current is None:
+            return
+
+        if self.leases is not None:
+            with self.lock:
+                for i in range( num * self.batch, ( num + 1 ) * self.batch ):
+                    if self.leases[i] == self.current:
+                        self.leases[i] = -1
+                        break
+
+        self.current = None
+
+
+
+    def reset( self, num ):
+        """Releases every row a child holds, used when a child starts or stops. Safe to call from any process.
+
+        :param num: The child's number.
+        :returns: None
+        """
+        self.rows.clear( )
+        self.current = None
+
+        if self.leases is not None:
+            with self.lock:
+                for i in range( num * self.batch, ( num + 1 ) * self.batch ):
+                    self.leases[i] = -1
+
+
+
+    def lease( self, num ):
+        """Reads the next batch of rows into self.rows.
+
+        :param num: The child's number.
+        :returns: Boolean for if any rows were leased.
+        """
+        if self.f is None:
+            self.f = open( self.fn, "rb" )
+
+        if self.mode == "random":
+            for i in range( self.batch ):
+                self.rows.append( self.pick( ) )
+            return True
+
+        with self.lock:
+            if self.exhausted.value:
+                return False
+
+            slot = num * self.batch
+
+            taken = set( )
+            if self.leases is not None:
+                for i in range( slot, slot + self.batch ):
+                    self.leases[i] = -1
+                taken = set( self.leases[:] )
+
+            self.f.seek( self.cursor.value )
+            scanned = 0
+
+            # Stop after a full batch or once every row has been looked at, the header isn't a row
+            while len( self.rows ) < self.batch and scanned < self.size - self.start:
+                offset = self.f.tell( )
+                line = self.f.readline( )
+
+                if not line:
+                    if not self.wrap:
+                        self.exhausted.value = 1
+                        break
+                    self.f.seek( self.start )
+                    continue
+
+                scanned += len( line )
+
+                if line.strip( ) == b'' or offset in taken:
+                    continue
+
+                if self.leases is not None:
+                    self.leases[slot] = offset
+                    slot += 1
+                    taken.add( offset )
+
+                self.rows.append( ( offset, self.parse( line ) ) )
+
+            self.cursor.value = self.f.tell( )
+
+        return len( self.rows ) > 0
+
+
+
+    def pick( self ):
+        """Picks a row at random. Seeks to a random spot in the file and takes the first full line after it.
+
+        :returns: Tuple of ( offset, row ).
+        """
+        while True:
+            offset = random.randint( self.start, self.size - 1 )
+            self.f.seek( offset )
+
+            # Land on the start of the next line
+            if offset != self.start:
+                self.f.readline( )
+
+            offset = self.f.tell( )
+            line = self.f.readline( )
+            if not line:
+                offset = self.start
+                self.f.seek( offset )
+                line = self.f.readline( )
+
+            if line.strip( ) != b'':
+                return ( offset, self.parse( line ) )
+
+
+
+    def parse( self, line ):
+        """Turns a line of the file into a row.
+
+        :param line: Bytes of a single line.
+        :returns: Dict if the file has named columns or is JSONL, otherwise a list.
+        """
+        if not isinstance( line, str ):
+            line = line.decode( 'utf-8' )
+
+        if self.format == "jsonl":
+            return json.loads( line )
+
+        values = next( csv.reader( [ line.rstrip( "\r\n" ) ] ) )
+
+        if self.fields is not None:
+            return dict( zip( self.fields, values ) )
+
+        return values
+
+
+
+    def __getstate__( self ):
+        """File handles can't be passed to a child process, each child opens its own.
+
+        :returns: Dict of our state.
+        """
+        state = self.__dict__.copy( )
+        state['f'] = None
+
+        return state
+
+
+
+def fromOptions( options, slots, base ):
+    """Builds the feeder for a run from its options, see the ``data`` options.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :param slots: Most children the pool can have.
+    :param base: Directory a relative ``data`` filename is relative to, that of the script.
+    :returns: :class:`Feeder`, or None if the run has no data.
+    """
+    fn = options.get( 'data', None )
+    if fn is None:
+        return None
+
+    if not os.path.isabs( fn ):
+        fn = os.path.join( base, fn )
+
+    return Feeder( fn, slots, options.get( 'datamode', "sequential" ), options.get( 'databatch', 10 ),
+                   options.get( 'datawrap', True ), options.get( 'dataformat', None ), options.get( 'dataheader', True ) )
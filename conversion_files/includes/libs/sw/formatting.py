@@ -13,6 +13,50 @@ def format( t, precision=2 ):
 
 
 
+def formatTransaction( name, stats, elapsed ):
+    """Describes a named transaction's results for a summary line.
+
+       :param name: The transaction's name.
+       :param stats: :class:`~sw.stats.Stats` of the transaction.
+       :param elapsed: Seconds the run has lasted, for the rate.
+       :return: List of strings, one per statistic.
+    """
+    total = stats.successes + stats.failures
+    errors = 0.0
+    if total > 0:
+        errors = stats.failures * 100.0 / total
+
+    return [ name,
+             ''.join( [ "Count: ", str( total ) ] ),
+             ''.join( [ "Errors: ", format( errors, 1 ), "%" ] ),
+             ''.join( [ "TPS: ", format( stats.successes / max( elapsed, 0.001 ) ) ] ),
+             ''.join( [ "Avg: ", format( stats.times.mean( ) ), "s" ] ),
+             ''.join( [ "p50: ", format( stats.times.percentile( 50 ) ), "s" ] ),
+             ''.join( [ "p95: ", format( stats.times.percentile( 95 ) ), "s" ] ),
+             ''.join( [ "p99: ", format( stats.times.percentile( 99 ) ), "s" ] ),
+             ''.join( [ "Max: ", format( stats.times.max ), "s" ] ) ]
+
+
+
+def formatNavTiming( pattern, times ):
+    """Describes the browser timings of a URL pattern for a summary line, as the median / 95th percentile of each.
+
+       :param pattern: The URL pattern.
+       :param times: :class:`~sw.navtiming.PageTimes` of the pattern.
+       :return: List of strings, one per statistic.
+    """
+    strs = [ pattern, ''.join( [ "Pages: ", str( times.pages ) ] ) ]
+
+    for m, label in [ ( "dns", "DNS" ), ( "connect", "Connect" ), ( "ttfb", "TTFB" ), ( "domcontentloaded", "DCL" ),
+                      ( "load", "Load" ), ( "resources", "Resources" ) ]:
+        h = times.metrics[m]
+        if h.count > 0:
+            strs.append( ''.join( [ label, ": ", format( h.percentile( 50 ), 3 ), "/", format( h.percentile( 95 ), 3 ), "s" ] ) )
+
+    return strs
+
+
+
 def formatError( res, type="message" ):
     """Formats the WebDriver JSON-encoded error message from an exception for easier printing. In the end, this amounts
        to replacing escaped quotation marks, parsing the JSON message, and extracting the 'errorMessage' key.
@@ -48,6 +92,28 @@ def formatError( res, type="message" ):
 
 
 
+def errorSignature( error ):
+    """Reduces an error message to a signature shared by every occurrence of the same error, so failures can be counted
+       by cause. The message is formatted with :func:`formatError` (so it's at most 80 characters), then URLs, numbers, and long hex ids are replaced
+       with placeholders and whitespace is collapsed.
+
+       :param error: The error message.
+       :return: String, "" for no error.
+    """
+    if not error:
+        return ""
+
+    s = formatError( error )
+
+    s = re.sub( r"[a-z][a-z0-9+.-]*://\S+", "<url>", s )
+    s = re.sub( r"\b(0x)?[0-9a-fA-F]{8,}\b", "<id>", s )
+    s = re.sub( r"\d+(\.\d+)?", "#", s )
+    s = re.sub( r"\s+", " ", s ).strip( )
+
+    return s
+
+
+
 def errorLevelToStr( level, parens=True ):
     """Takes a numeric error level and translates it into a string for displaying in a 
        log.
@@ -0,0 +1,212 @@
+import sys, time, datetime
+from sw.const import * # Constants
+from sw.formatting import *
+import sw.runreport
+
+class Headless:
+    """Headless stands in for :class:`~sw.ui.Ui` when the pool runs without a terminal attached, such as on a CI
+       box or under a scheduler. Rather than redrawing a screen and polling for key presses it prints a single line
+       summary of the pool every `summaryinterval` seconds and then, when the run ends, determines an exit code from
+       the results.
+
+       :param pool: Reference to our owning pool. This pool will be monitored and summarized.
+       :param sys.stdout out: File-like object summaries are written to.
+
+       :return: Headless (self)
+    """
+    def __init__( self, pool, out=sys.stdout ):
+        # The pool we're reporting on
+        self.pool = pool
+
+        self.out = out
+
+        # Seconds between summary lines
+        self.summaryTime = pool.options.get( 'summaryinterval', 5 )
+
+        # Next time we print a summary
+        self.nextSummary = time.time( ) + self.summaryTime
+
+        # Set if the run was cut short by the user
+        self.interrupted = False
+
+
+
+    def think( self ):
+        """Prints out a summary if it has been at least self.summaryTime since the last one.
+
+           :returns: None
+        """
+        if time.time( ) >= self.nextSummary:
+            self.nextSummary = time.time( ) + self.summaryTime
+            self.summary( )
+
+
+
+    def timeout( self ):
+        """How long the pool may wait on its children before the next summary is due.
+
+           :returns: Float for seconds until the next summary.
+        """
+        return max( 0, self.nextSummary - time.time( ) )
+
+
+
+    def sleep( self, amount ):
+        """Sleeps between pool think loops. There are no keys to listen to so this is just a plain sleep.
+
+           :param amount: Float for amount of seconds to wait.
+           :returns: None
+        """
+        time.sleep( amount )
+
+
+
+    def flash( self ):
+        """Called by the pool on a failed job, there is no screen to flash so nothing is done.
+
+           :returns: None
+        """
+        pass
+
+
+
+    def summary( self ):
+        """Writes a single line describing the current state of the pool to self.out and flushes it so
+           that it shows up immediately in captured logs.
+
+           :returns: None
+        """
+        numactive = 0
+        for c in self.pool.children:
+            if c is not None and c.status( ) == RUNNING:
+                numactive += 1
+
+        times = self.pool.timeTaken( )
+
+        statstrs = [ ''.join( [ "[", datetime.datetime.now( ).strftime( "%H:%M:%S" ), "]" ] ),
+                     ''.join( [ "Children: ", str( len( self.pool.children ) ) ] ),
+                     ''.join( [ "Act: ", str( numactive ) ] ),
+                     ''.join( [ "Jobs Left: ", str( self.pool.workQueue.qsize( ) ) ] ),
+                     ''.join( [ "Successful: ", str( self.pool.successful( ) ) ] ),
+                     ''.join( [ "Failed: ", str( self.pool.failed( ) ) ] ),
+                     ''.join( [ "Avg Job: ", format( times.mean( ) ), "s" ] ),
+                     ''.join( [ "p50: ", format( times.percentile( 50 ) ), "s" ] ),
+                     ''.join( [ "p90: ", format( times.percentile( 90 ) ), "s" ] ),
+                     ''.join( [ "p95: ", format( times.percentile( 95 ) ), "s" ] ),
+                     ''.join( [ "p99: ", format( times.percentile( 99 ) ), "s" ] ),
+                     ''.join( [ "Max: ", format( times.max ), "s" ] ) ]
+
+        if len( self.pool.profile.stages ) > 1:
+            stage = self.pool.profile.stages[self.pool.stage]
+            statstrs.append( ''.join( [ "Stage: ", stage[2], " (", str( stage[1] ), ")" ] ) )
+
+        if self.pool.rate is not None:
+            statstrs.append( ''.join( [ "Missed: ", str( self.pool.missed ) ] ) )
+            statstrs.append( ''.join( [ "Lag p99: ", format( self.pool.startLag.percentile( 99 ) ), "s" ] ) )
+
+        if self.pool.started is not None and ( time.time( ) - self.pool.started ) > 0:
+            statstrs.append( ''.join( [ "True JPS: ", format( self.pool.successful( ) / ( time.time( ) - self.pool.started ) ) ] ) )
+
+        self.out.write( ''.join( [ "   ".join( statstrs ), "\n" ] ) )
+        self.out.flush( )
+
+
+
+    def stages( self ):
+        """Writes a line for each stage of the pool's load profile that was reached, with the throughput and job times
+           seen during it. Nothing is written for a profile with a single stage as :func:`summary` already covers it.
+
+           :returns: None
+        """
+        profile = self.pool.profile
+        if len( profile.stages ) < 2:
+            return
+
+        for i in range( len( profile.stages ) ):
+            started = self.pool.stageStarted[i]
+            if started is None:
+                continue
+
+            # A stage ends when the next one we reached started
+            ended = time.time( )
+            for later in self.pool.stageStarted[i+1:]:
+                if later is not None:
+                    ended = later
+                    break
+
+            stats = self.pool.stageStats[i]
+            statstrs = [ profile.stages[i][2],
+                         ''.join( [ "Target: ", str( profile.stages[i][1] ), " ", profile.kind ] ),
+                         ''.join( [ "Length: ", format( ended - started ), "s" ] ),
+                         ''.join( [ "Successful: ", str( stats.successes ) ] ),
+                         ''.join( [ "Failed: ", str( stats.failures ) ] ),
+                         ''.join( [ "JPS: ", format( stats.successes / max( ended - started, 0.001 ) ) ] ),
+                         ''.join( [ "p50: ", format( stats.times.percentile( 50 ) ), "s" ] ),
+                         ''.join( [ "p95: ", format( stats.times.percentile( 95 ) ), "s" ] ) ]
+
+            self.out.write( ''.join( [ "   ".join( statstrs ), "\n" ] ) )
+
+        self.out.flush( )
+
+
+
+    def transactions( self ):
+        """Writes a line for each named transaction the script timed, with its count, error rate, throughput and times.
+
+           :returns: None
+        """
+        elapsed = 0
+        if self.pool.started is not None:
+            elapsed = time.time( ) - self.pool.started
+
+        for name, stats in self.pool.transactions.items( ):
+            self.out.write( ''.join( [ "   ".join( formatTransaction( name, stats, elapsed ) ), "\n" ] ) )
+
+        self.out.flush( )
+
+
+
+    def navTiming( self ):
+        """Writes a line for each URL pattern the browser timed (``navtiming``), with the median / 95th percentile of
+           each timing.
+
+           :returns: None
+        """
+        for pattern, times in self.pool.navTiming.items( ):
+            self.out.write( ''.join( [ "   ".join( formatNavTiming( pattern, times ) ), "\n" ] ) )
+
+        self.out.flush( )
+
+
+
+    def report( self ):
+        """Writes the end of run report, see :mod:`sw.runreport`, and says where it is.
+
+           :returns: None
+        """
+        fn = sw.runreport.fromPool( self.pool )
+
+        if fn is not None:
+            self.out.write( ''.join( [ "Report: ", fn, "\n" ] ) )
+            self.out.flush( )
+
+
+
+    def exitCode( self ):
+        """Determines the process exit code from the results of the run. See the exit codes in const.py.
+
+           :returns: Integer exit code.
+        """
+        if self.interrupted:
+            return EXIT_INTERRUPTED
+
+        if self.pool.error is not None:
+            return EXIT_ERROR
+
+        if self.pool.failed( ) == 0:
+            return EXIT_OK
+
+        if self.pool.successful( ) == 0:
+            return EXIT_NO_SUCCESS
+
+        return EXIT_FAILURES
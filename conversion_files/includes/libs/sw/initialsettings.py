@@ -1,5 +1,48 @@
 import curses, curses.textpad, re, json
-from splunklib import client
+
+# Every option shown in the initial settings wizard, in display order. Plain strings are section titles (or blank
+# spacers) while tuples are ( kwarg, label, default value ).
+SETTINGS = [ "Run Settings",
+             ( 'children',      "# Children",       1 ),
+             ( 'stagger',       "Stagger Spawn",    False ),
+             ( 'jobs',          "# Jobs",           1 ),
+             "",
+             "Pool Settings",
+             ( 'level',         "Log Lvl (0-5)",    0 ),
+             ( 'images',        "Get Images",       False ),
+             "",
+             "Reporting Settings",
+             ( 'report',        "Server",           None ),
+             ( 'report_port',   "Port",             8089 ),
+             ( 'report_user',   "User",             None ),
+             ( 'report_pass',   "Password",         None ),
+             ( 'report_index',  "Index",            None ),
+             ( 'project',       "Project Name",     None ),
+             ( 'run',           "Run Name",         None ),
+             ( 'script',        "Script Name",      None ),
+             ( 'id',            "Client Name",      "auto" ) ]
+
+
+
+def applyDefaults( kwargs ):
+    """Fills in every option from :data:`SETTINGS` that is missing from kwargs with its default. This is what
+       :class:`InitialSettings` does once the wizard finishes and is called directly when running without a terminal.
+       Options defaulting to "auto" and the reporting password are left unset.
+
+       :param kwargs: The keyword arguments provided to :func:`sw.wrapper.main`, modified in place.
+       :returns: kwargs
+    """
+    for s in SETTINGS:
+        if not isinstance( s, tuple ):
+            continue
+
+        key, label, default = s
+        if key not in kwargs and default != "auto" and key != 'report_pass':
+            kwargs[key] = default
+
+    return kwargs
+
+
 
 class InitialSettings:
     """Initializing this class more or less handles every part of the initial settings menu.
@@ -58,12 +101,7 @@ class InitialSettings:
         self.handleInput( )
 
         # Make sure self.kwargs has everything set, we set the defaults here
-        for key in self.kwmap:
-            if key not in self.kwargs:
-                if self.kwmap[key][1] == "auto" or self.kwmap[key][1] == "None":
-                    self.kwmap[key][1] = None
-                elif key != 'report_pass':
-                    self.kwargs[key] = self.kwmap[key][1]
+        applyDefaults( self.kwargs )
 
 
 
@@ -219,6 +257,8 @@ class InitialSettings:
 
             # Attempt to use the splunk server
             try: 
+                # Only needed here, so a run that doesn't report never loads it
+                from splunklib import client
                 splunk = client.connect( host=self.kwargs['report'], 
                          port=self.kwargs.get( 'report_port', self.kwmap['report_port'][1] ), 
                          username=self.kwargs['report_user'], 
@@ -258,46 +298,17 @@ class InitialSettings:
 
     def setupDefaults( self ):
         """This method loads into kwmap and kwarray the defaults for various kwargs as well as the titles to print
-           in front of them on the display screen. It does nothing more than just loading the values up, :func:`renderList`
-           does the dirty work.
+           in front of them on the display screen from :data:`SETTINGS`. It does nothing more than just loading the values up, 
+           :func:`renderList` does the dirty work.
 
            :returns: None
         """
-        self.kwarray.append( "Run Settings" )
-        self.kwarray.append( 'children' )
-        self.kwmap['children']      = [ "# Children", 1 ]
-        self.kwmap['stagger']       = [ "Stagger Spawn", False ]
-        self.kwarray.append( 'stagger' )
-        self.kwmap['jobs']          = [ "# Jobs", 1 ]
-        self.kwarray.append( 'jobs' )
-        
-        self.kwarray.append( "" )
-        self.kwarray.append( "Pool Settings" )
-        self.kwmap['level']         = [ "Log Lvl (0-5)", 0 ]
-        self.kwarray.append( 'level' )
-        self.kwmap['images']        = [ "Get Images", False ]
-        self.kwarray.append( 'images' )
-        self.kwarray.append( "" )
-
-        self.kwarray.append( "Reporting Settings" )
-        self.kwmap['report']        = [ "Server", None ]
-        self.kwarray.append( 'report' )
-        self.kwmap['report_port']   = [ "Port", 8089 ]
-        self.kwarray.append( 'report_port' )
-        self.kwmap['report_user']   = [ "User", None ]
-        self.kwarray.append( 'report_user' )
-        self.kwmap['report_pass']   = [ "Password", None ]
-        self.kwarray.append( 'report_pass' )
-        self.kwmap['report_index']  = [ "Index", None ]
-        self.kwarray.append( 'report_index' )
-        self.kwmap['project']       = [ "Project Name", None ]
-        self.kwarray.append( 'project' )
-        self.kwmap['run']           = [ "Run Name", None ]
-        self.kwarray.append( 'run' )
-        self.kwmap['script']        = [ "Script Name", None ]
-        self.kwarray.append( 'script' )
-        self.kwmap['id']            = [ "Client Name", "auto" ]
-        self.kwarray.append( 'id' )
+        for s in SETTINGS:
+            if isinstance( s, tuple ):
+                self.kwmap[s[0]] = [ s[1], s[2] ]
+                self.kwarray.append( s[0] )
+            else:
+                self.kwarray.append( s )
 
 
 
@@ -0,0 +1,143 @@
+from multiprocessing import Condition, RawValue
+import Queue as Q
+import time
+
+class JobQueue:
+    """Hands out jobs to children. Every child runs the same function, which it is given once when it is created, so a
+    job doesn't need to carry anything but its number. Rather than pickling the function through a
+    :py:class:`~multiprocessing.Queue` for every job, the queue is a pair of shared counters: how many jobs are left and
+    the id of the next one, guarded by a :py:func:`~multiprocessing.Condition` that children wait on for work.
+
+    It keeps the parts of the Queue interface the pool and UI used (:func:`put`, :func:`get`, :func:`empty`, :func:`qsize`)
+    so it can be used in its place.
+
+    :return: JobQueue (self)
+    """
+    def __init__( self ):
+        self.cond = Condition( )
+
+        # Jobs waiting for a child
+        self.left = RawValue( 'l', 0 )
+
+        # Id given to the next job taken
+        self.nextId = RawValue( 'l', 1 )
+
+        # Set once no more jobs will be handed out, children waiting on us leave
+        self.closed = RawValue( 'b', 0 )
+
+
+
+    def put( self, count=1 ):
+        """Adds jobs to the queue.
+
+        :param 1 count: Number of jobs to add.
+        :returns: None
+        """
+        with self.cond:
+            self.left.value += count
+            self.cond.notify_all( )
+
+
+
+    def get( self, block=True, timeout=None, cancel=None ):
+        """Takes a job from the queue.
+
+        :param True block: Wait for a job if there are none.
+        :param None timeout: Longest to wait in seconds, None waits until a job is added or the queue is closed.
+        :param None cancel: Called with no arguments whenever the wait is woken, see :func:`wake`. Returning True
+            gives up on waiting as if the queue had been closed.
+        :returns: Integer job id, or None if the queue has been closed.
+        :raises Queue.Empty: If there was no job and *block* was False or *timeout* passed.
+        """
+        end = None
+        if timeout is not None:
+            end = time.time( ) + timeout
+
+        with self.cond:
+            while self.left.value == 0:
+                if self.closed.value or ( cancel is not None and cancel( ) ):
+                    return None
+
+                if not block:
+                    raise Q.Empty
+
+                if end is None:
+                    self.cond.wait( )
+                else:
+                    remaining = end - time.time( )
+                    if remaining <= 0:
+                        raise Q.Empty
+                    self.cond.wait( remaining )
+
+            self.left.value -= 1
+            job = self.nextId.value
+            self.nextId.value += 1
+
+            return job
+
+
+
+    def take( self, count=1 ):
+        """Removes jobs from the queue without running them.
+
+        :param 1 count: Most jobs to remove.
+        :returns: Integer number of jobs removed.
+        """
+        with self.cond:
+            count = min( count, self.left.value )
+            self.left.value -= count
+
+            return count
+
+
+
+    def clear( self ):
+        """Removes every job waiting in the queue.
+
+        :returns: Integer number of jobs removed.
+        """
+        with self.cond:
+            count = self.left.value
+            self.left.value = 0
+
+            return count
+
+
+
+    def close( self ):
+        """Closes the queue. Children already waiting for a job, and any that ask for one later, are given None once
+        the remaining jobs are gone which tells them to leave.
+
+        :returns: None
+        """
+        with self.cond:
+            self.closed.value = 1
+            self.cond.notify_all( )
+
+
+
+    def wake( self ):
+        """Wakes every child waiting for a job so it checks whether it's been told to stop, see :func:`get`.
+
+        :returns: None
+        """
+        with self.cond:
+            self.cond.notify_all( )
+
+
+
+    def qsize( self ):
+        """Number of jobs waiting for a child.
+
+        :returns: Integer
+        """
+        return self.left.value
+
+
+
+    def empty( self ):
+        """Checks if there are no jobs waiting.
+
+        :returns: Boolean
+        """
+        return self.left.value == 0
@@ -0,0 +1,222 @@
+from sw.const import *
+from sw.formatting import errorLevelToStr
+from pprint import pformat
+import atexit, json, os, threading, time
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+# Bytes held before they're written
+BUFFER_SIZE = 64 * 1024
+
+# Most seconds a record is held before it's written
+FLUSH_INTERVAL = 1
+
+
+
+class Logger:
+    """A buffered log file for the pool or a child. Records below *level* are thrown away before any work is done on
+    them, so a message that won't be written costs a comparison. A message may be given as a list of parts to be joined,
+    which is then only joined if it's written, and local variables are only formatted if they're written too.
+
+    Records are held in memory and written out once *bufferSize* bytes are waiting, once the oldest has waited
+    *interval* seconds (checked on every record and every :func:`think`), and straight away at CRITICAL so the reason
+    for a crash is always on disk. Anything left is written when the process exits normally, and a child flushes when
+    its process ends however it ends, see :py:func:`~sw.child.Child.process`.
+
+    Records are text lines like ``[12:00:00] (NOTICE)    message`` or, with *jsonLines*, one JSON object per line with
+    ``time``, ``level`` and ``msg`` (and ``locals`` if given) plus any *fields*.
+
+    The file is opened on the first write, so a logger made by the pool and carried into a child's process opens its
+    own handle there. Writes are locked so other threads in the process, such as the screenshot writer, can log too.
+
+    :param fn: Filename of the log.
+    :param NOTICE level: Lowest level written.
+    :param False jsonLines: Write JSON lines rather than text.
+    :param "a" mode: Mode the file is opened with.
+    :param None fields: Dict added to every JSON record, such as the child's number.
+    :param BUFFER_SIZE bufferSize: Bytes held before writing.
+    :param FLUSH_INTERVAL interval: Most seconds a record is held.
+
+    :return: Logger (self)
+    """
+    def __init__( self, fn, level=NOTICE, jsonLines=False, mode="a", fields=None, bufferSize=BUFFER_SIZE, interval=FLUSH_INTERVAL ):
+        self.fn = fn
+        self.level = level
+        self.jsonLines = jsonLines
+        self.mode = mode
+        self.fields = fields or { }
+        self.bufferSize = bufferSize
+        self.interval = interval
+
+        self.f = None
+        self.lock = threading.Lock( )
+
+        # Records waiting to be written, their size, and when the oldest was added
+        self.buffer = [ ]
+        self.size = 0
+        self.oldest = None
+
+        # Process we opened the file in, a child's process opens it again rather than share the pool's handle
+        self.pid = None
+
+        # The second our timestamp was last worked out for and what it was, and the names of levels we've written
+        self.second = None
+        self.timestamp = None
+        self.levels = { }
+
+        atexit.register( self.flush )
+
+
+
+    def __getstate__( self ):
+        # Handed to a new process without our handle, lock, or anything not yet written
+        state = dict( self.__dict__ )
+        state['f'] = None
+        state['lock'] = None
+        state['buffer'] = [ ]
+        state['size'] = 0
+        state['oldest'] = None
+        return state
+
+
+
+    def __setstate__( self, state ):
+        self.__dict__.update( state )
+        self.lock = threading.Lock( )
+
+
+
+    def enabled( self, level ):
+        """Finds if a level is being written, for when working out a message is costly on its own.
+
+        :param level: The level.
+        :returns: Boolean
+        """
+        return level >= self.level
+
+
+
+    def log( self, msg, level=NOTICE, locals=None ):
+        """Writes a record if its level is high enough.
+
+        :param msg: The message, a string or a list of parts to join. Parts that aren't strings are converted with str.
+        :param NOTICE level: The level of the message.
+        :param None locals: Dict of local variables to write with it, only formatted if it's written.
+        :returns: None
+        """
+        if level < self.level:
+            return
+
+        if isinstance( msg, ( list, tuple ) ):
+            try:
+                msg = ''.join( msg )
+            except TypeError:
+                # Parts that aren't strings, such as a payload, are only turned into one now it's being written
+                msg = ''.join( [ m if isinstance( m, basestring ) else str( m ) for m in msg ] )
+
+        t = time.time( )
+
+        name = self.levels.get( level, None )
+        if name is None:
+            name = self.levels[level] = errorLevelToStr( level, not self.jsonLines )
+
+        if self.jsonLines:
+            record = dict( self.fields )
+            record['time'] = round( t, 3 )
+            record['level'] = name.strip( )
+            record['msg'] = msg
+            if locals is not None:
+                record['locals'] = dict( ( str( k ), repr( v ) ) for k, v in locals.items( ) )
+            line = ''.join( [ json.dumps( record ), "\n" ] )
+        else:
+            # Formatting the time is most of the cost of a record, it only changes once a second
+            second = int( t )
+            if second != self.second:
+                self.second = second
+                self.timestamp = ''.join( [ "[", time.strftime( "%H:%M:%S", time.localtime( t ) ), "] " ] )
+
+            line = ''.join( [ self.timestamp, name, "\t", msg, "\n" ] )
+            if locals is not None:
+                line = ''.join( [ line, self.timestamp, name, "\tLocal variables: ", pformat( locals ), "\n" ] )
+
+        with self.lock:
+            if self.oldest is None:
+                self.oldest = t
+            self.buffer.append( line )
+            self.size += len( line )
+
+            if level >= CRITICAL or self.size >= self.bufferSize or t - self.oldest >= self.interval:
+                self.write( )
+
+
+
+    def think( self ):
+        """Writes what's waiting if the oldest record has waited long enough.
+
+        :returns: None
+        """
+        if self.oldest is not None and time.time( ) - self.oldest >= self.interval:
+            self.flush( )
+
+
+
+    def flush( self ):
+        """Writes everything waiting.
+
+        :returns: None
+        """
+        with self.lock:
+            self.write( )
+
+
+
+    def write( self ):
+        # Called with the lock held
+        if len( self.buffer ) == 0:
+            return
+
+        if self.f is None or self.pid != os.getpid( ):
+            self.f = open( self.fn, self.mode )
+            self.pid = os.getpid( )
+
+            # Truncating is for the first open only, a child's process adds to what the pool started
+            if self.mode.startswith( "w" ):
+                self.mode = "a"
+
+        self.f.write( ''.join( self.buffer ) )
+        self.f.flush( )
+
+        self.buffer = [ ]
+        self.size = 0
+        self.oldest = None
+
+
+
+    def close( self ):
+        """Writes everything waiting and closes the file.
+
+        :returns: None
+        """
+        with self.lock:
+            self.write( )
+            if self.f is not None and self.pid == os.getpid( ):
+                self.f.close( )
+            self.f = None
+
+
+
+def fromOptions( options, fn, fields=None ):
+    """Makes a log from a run's options, see the ``log`` options.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :param fn: Filename of the log without its extension, .txt or .jsonl is added.
+    :param None fields: Dict added to every JSON record.
+    :returns: :class:`Logger`
+    """
+    useJSON = options.get( 'logjson', False )
+
+    return Logger( ''.join( [ fn, ".jsonl" if useJSON else ".txt" ] ), options.get( 'level', NOTICE ), useJSON, "a", fields,
+                   options.get( 'logbuffer', 64 ) * 1024, options.get( 'logflush', FLUSH_INTERVAL ) )
@@ -0,0 +1,247 @@
+from sw.const import *
+from sw.artifacts import A_TAKEN, A_SAMPLED, A_BUDGET
+import threading, time, atexit
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+# Upper bounds in seconds of the buckets latency histograms are exported with
+BUCKETS = [ 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300 ]
+
+# Port used when an address doesn't include one
+DEFAULT_PORT = 9167
+
+
+
+class MetricsServer:
+    """Serves the pool's counters, gauges, and latency histograms over HTTP in the Prometheus text format so dashboards
+    can scrape a run while it's going. ``GET /metrics`` returns, among others:
+
+    - ``sw_jobs_succeeded_total`` / ``sw_jobs_failed_total``: Jobs finished and failed.
+    - ``sw_job_duration_seconds``: Histogram of successful job times.
+    - ``sw_transaction_duration_seconds`` / ``sw_transaction_failed_total``: The same per named transaction, labelled
+      with ``transaction``.
+    - ``sw_children``, ``sw_children_busy``, ``sw_children_stalled``: Children alive, running a job, and stalled.
+    - ``sw_jobs_queued``: Jobs waiting for a child.
+    - ``sw_child_restarts_total``, ``sw_arrivals_missed_total``: Children started again, open loop arrivals dropped.
+    - ``sw_report_dropped_total``: Reporting events dropped because the server fell too far behind.
+    - ``sw_screenshots_taken_total``, ``sw_artifacts_skipped_total``: Failures captured, and those that weren't labelled
+      with ``reason`` "sampled" or "budget", see :mod:`sw.artifacts`.
+
+    The server runs on its own daemon thread so :py:func:`~sw.pool.Pool.think` never waits on a scrape. A scrape reads
+    the pool's running totals as they are; the histograms are the pool's :class:`~sw.stats.Histogram` objects, so the cost
+    of a scrape depends on the number of transactions and buckets and never on the number of jobs recorded.
+
+    :param pool: The :class:`~sw.pool.Pool` to expose.
+    :param host: Address to listen on.
+    :param port: Port to listen on.
+
+    :return: MetricsServer (self)
+    """
+    def __init__( self, pool, host, port ):
+        self.pool = pool
+
+        server = self
+        class Handler( MetricsHandler ):
+            metrics = server
+
+        self.httpd = HTTPServer( ( host, port ), Handler )
+
+        self.thread = threading.Thread( target=self.httpd.serve_forever )
+        self.thread.daemon = True
+        self.thread.start( )
+
+        # Stop before the interpreter starts tearing down the thread
+        atexit.register( self.stop )
+
+        pool.logMsg( ''.join( [ "Serving metrics on http://", host or "0.0.0.0", ":", str( self.httpd.server_port ), "/metrics" ] ) )
+
+
+
+    def render( self ):
+        """Writes out every metric.
+
+        :returns: String in the Prometheus text exposition format.
+        """
+        pool = self.pool
+        lines = [ ]
+
+        # Taken before reading so a transaction added by the pool mid scrape doesn't upset us
+        transactions = list( pool.transactions.items( ) )
+
+        alive = 0
+        for c in list( pool.children ):
+            if c.is_alive( ):
+                alive += 1
+
+        counter( lines, "sw_jobs_succeeded_total", "Jobs that finished successfully.", pool.stats.successes )
+        counter( lines, "sw_jobs_failed_total", "Jobs that failed.", pool.stats.failures )
+        histogram( lines, "sw_job_duration_seconds", "Time taken by successful jobs, without think time.", [ ( "", pool.stats.times ) ] )
+
+        if len( transactions ) > 0:
+            histogram( lines, "sw_transaction_duration_seconds", "Time taken by successful named transactions.",
+                       [ ( label( "transaction", name ), stats.times ) for name, stats in transactions ] )
+            header( lines, "sw_transaction_failed_total", "Named transactions that failed.", "counter" )
+            for name, stats in transactions:
+                sample( lines, "sw_transaction_failed_total", label( "transaction", name ), stats.failures )
+
+        gauge( lines, "sw_children", "Child processes alive.", alive )
+        gauge( lines, "sw_children_busy", "Children running a job.", len( pool.busy ) )
+        gauge( lines, "sw_children_stalled", "Children that have gone quiet in the middle of a job.", len( pool.stalled ) )
+        gauge( lines, "sw_jobs_queued", "Jobs waiting for a child.", pool.workQueue.qsize( ) )
+        counter( lines, "sw_child_restarts_total", "Times a stopped or dead child was started again.", pool.restarts )
+        counter( lines, "sw_arrivals_missed_total", "Open loop arrivals dropped for want of a child.", pool.missed )
+        if pool.artifacts is not None:
+            counter( lines, "sw_screenshots_taken_total", "Screenshots taken of failures.", pool.artifacts.get( A_TAKEN ) )
+            header( lines, "sw_artifacts_skipped_total", "Captures skipped by the artifact policy.", "counter" )
+            sample( lines, "sw_artifacts_skipped_total", label( "reason", "sampled" ), pool.artifacts.get( A_SAMPLED ) )
+            sample( lines, "sw_artifacts_skipped_total", label( "reason", "budget" ), pool.artifacts.get( A_BUDGET ) )
+        counter( lines, "sw_report_dropped_total", "Reporting events dropped because the reporting queue was full.", pool.reporting.dropped )
+        gauge( lines, "sw_rate", "Jobs started per second in an open loop run, 0 for a closed loop.", pool.rate or 0 )
+        gauge( lines, "sw_stage", "The load profile stage the run is in.", pool.stage )
+
+        started = pool.started
+        gauge( lines, "sw_run_seconds", "Seconds since the first child was ready.", time.time( ) - started if started else 0 )
+
+        return ''.join( lines )
+
+
+
+    def stop( self ):
+        """Stops serving.
+
+        :returns: None
+        """
+        self.httpd.shutdown( )
+        self.httpd.server_close( )
+
+
+
+class MetricsHandler( BaseHTTPRequestHandler ):
+    """Answers scrapes for a :class:`MetricsServer`, which is set as the class's metrics attribute."""
+    metrics = None
+
+    def do_GET( self ):
+        if self.path.split( "?", 1 )[0] not in [ "/metrics", "/" ]:
+            self.send_error( 404 )
+            return
+
+        body = self.metrics.render( ).encode( 'utf-8' )
+
+        self.send_response( 200 )
+        self.send_header( "Content-Type", "text/plain; version=0.0.4; charset=utf-8" )
+        self.send_header( "Content-Length", str( len( body ) ) )
+        self.end_headers( )
+        self.wfile.write( body )
+
+
+
+    def log_message( self, format, *args ):
+        # Scrapes every few seconds would only clutter the console
+        pass
+
+
+
+def header( lines, name, help, type ):
+    """Adds a metric's HELP and TYPE lines.
+
+    :param lines: List of lines being written.
+    :param name: The metric's name.
+    :param help: What the metric is.
+    :param type: "counter", "gauge", or "histogram".
+    :returns: None
+    """
+    lines.append( ''.join( [ "# HELP ", name, " ", help, "\n# TYPE ", name, " ", type, "\n" ] ) )
+
+
+
+def sample( lines, name, labels, value ):
+    """Adds a single sample.
+
+    :param lines: List of lines being written.
+    :param name: The metric's name.
+    :param labels: Labels already formatted, "" for none.
+    :param value: The value.
+    :returns: None
+    """
+    if labels:
+        labels = ''.join( [ "{", labels, "}" ] )
+
+    lines.append( ''.join( [ name, labels, " ", repr( float( value ) ), "\n" ] ) )
+
+
+
+def counter( lines, name, help, value ):
+    """Adds a counter."""
+    header( lines, name, help, "counter" )
+    sample( lines, name, "", value )
+
+
+
+def gauge( lines, name, help, value ):
+    """Adds a gauge."""
+    header( lines, name, help, "gauge" )
+    sample( lines, name, "", value )
+
+
+
+def histogram( lines, name, help, series ):
+    """Adds a histogram, with a series of buckets for each set of labels.
+
+    :param lines: List of lines being written.
+    :param name: The metric's name.
+    :param help: What the metric is.
+    :param series: List of ( labels, :class:`~sw.stats.Histogram` ).
+    :returns: None
+    """
+    header( lines, name, help, "histogram" )
+
+    for labels, h in series:
+        sep = "," if labels else ""
+        for bound, count in zip( BUCKETS, h.cumulative( BUCKETS ) ):
+            sample( lines, ''.join( [ name, "_bucket" ] ), ''.join( [ labels, sep, label( "le", repr( float( bound ) ) ) ] ), count )
+        sample( lines, ''.join( [ name, "_bucket" ] ), ''.join( [ labels, sep, label( "le", "+Inf" ) ] ), h.count )
+        sample( lines, ''.join( [ name, "_sum" ] ), labels, h.total )
+        sample( lines, ''.join( [ name, "_count" ] ), labels, h.count )
+
+
+
+def label( name, value ):
+    """Formats a label, escaping its value.
+
+    :param name: The label's name.
+    :param value: The label's value.
+    :returns: String, ``name="value"``.
+    """
+    value = value.replace( "\\", "\\\\" ).replace( "\"", "\\\"" ).replace( "\n", "\\n" )
+
+    return ''.join( [ name, "=\"", value, "\"" ] )
+
+
+
+def fromOptions( pool ):
+    """Starts serving metrics for a pool if ``metrics`` is set, to a port or "host:port".
+
+    :param pool: The :class:`~sw.pool.Pool`.
+    :returns: :class:`MetricsServer`, or None if metrics aren't being served.
+    """
+    addr = pool.options.get( 'metrics', None )
+    if addr is None or addr is False:
+        return None
+
+    host, port = "", DEFAULT_PORT
+    if addr is not True:
+        addr = str( addr )
+        if ":" in addr:
+            host, port = addr.rsplit( ":", 1 )
+        else:
+            port = addr
+        port = int( port )
+
+    try:
+        return MetricsServer( pool, host, port )
+    except Exception as e:
+        pool.logMsg( ''.join( [ "Failed to serve metrics on ", str( addr ), ": ", str( e ) ] ), CRITICAL )
+        return None
@@ -0,0 +1,277 @@
+from sw.stats import Histogram
+from sw.const import *
+from collections import OrderedDict
+import json, re
+
+# What we measure for each page, each a Histogram of seconds. Resources has one entry per resource the page fetched
+# rather than one per page.
+METRICS = [ "dns", "connect", "ttfb", "domcontentloaded", "load", "resources" ]
+
+# Reads everything for a page in a single round trip: the navigation timing fields we need, then the duration of every
+# resource fetched since we last asked. Resource entries are cleared once read so they're only counted once.
+SCRIPT = """
+var p = window.performance;
+if( !p || !p.timing ) { return null; }
+var t = p.timing, r = [ ];
+if( p.getEntriesByType ) {
+    var e = p.getEntriesByType( 'resource' );
+    for( var i = 0; i < e.length; i++ ) { r.push( e[i].duration ); }
+    if( p.clearResourceTimings ) { p.clearResourceTimings( ); }
+}
+return [ window.location.href, t.navigationStart, t.domainLookupStart, t.domainLookupEnd, t.connectStart, t.connectEnd,
+         t.requestStart, t.responseStart, t.domContentLoadedEventEnd, t.loadEventEnd, r ];
+"""
+
+# Path segments that are ids rather than part of a page's name: numbers, long hex strings, and UUIDs
+ID_SEGMENT = re.compile( r"^(\d+|[0-9a-fA-F]{8,}|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})$" )
+
+
+
+class PageTimes:
+    """The timings of every load of a single URL pattern. Like :class:`~sw.stats.Histogram`, these are mergeable so a
+    child's can be rolled into the pool's and a worker's into the coordinator's.
+
+    :return: PageTimes (self)
+    """
+    def __init__( self ):
+        # Number of page loads counted
+        self.pages = 0
+
+        self.metrics = OrderedDict( ( m, Histogram( ) ) for m in METRICS )
+
+
+
+    def record( self, metric, t ):
+        """Records a single timing.
+
+        :param metric: One of METRICS.
+        :param t: Time in seconds.
+        :return: None
+        """
+        self.metrics[metric].record( t )
+
+
+
+    def merge( self, other ):
+        """Adds another set of page times into this one.
+
+        :param other: The :class:`PageTimes` to add.
+        :return: PageTimes (self)
+        """
+        self.pages += other.pages
+        for m in METRICS:
+            self.metrics[m].merge( other.metrics[m] )
+
+        return self
+
+
+
+    def copy( self ):
+        """Copies the page times so they can be compared against later with :func:`diff`.
+
+        :return: PageTimes
+        """
+        p = PageTimes( )
+        p.pages = self.pages
+        for m in METRICS:
+            p.metrics[m] = self.metrics[m].copy( )
+
+        return p
+
+
+
+    def diff( self, earlier ):
+        """Finds what has been recorded since these page times were copied.
+
+        :param earlier: A :func:`copy` of these page times taken earlier.
+        :return: PageTimes recorded since.
+        """
+        p = PageTimes( )
+        p.pages = self.pages - earlier.pages
+        for m in METRICS:
+            p.metrics[m] = self.metrics[m].diff( earlier.metrics[m] )
+
+        return p
+
+
+
+    def toDict( self ):
+        """Encodes the page times in a JSON friendly form.
+
+        :return: Dict which :func:`fromDict` can turn back into PageTimes.
+        """
+        d = { 'pages': self.pages }
+        for m in METRICS:
+            if self.metrics[m].count > 0:
+                d[m] = self.metrics[m].toDict( )
+
+        return d
+
+
+
+    @classmethod
+    def fromDict( cls, d ):
+        """Decodes page times encoded with :func:`toDict`.
+
+        :param d: Dict from :func:`toDict`.
+        :return: PageTimes
+        """
+        p = cls( )
+        p.pages = d['pages']
+        for m in METRICS:
+            if m in d:
+                p.metrics[m] = Histogram.fromDict( d[m] )
+
+        return p
+
+
+
+class NavTiming:
+    """Collects the browser's own Navigation and Resource Timing for every page a child loads. A job's time includes
+    PhantomJS rendering and the slack in :py:func:`~sw.utils.sleepwait`'s polling; these timings come from the browser and
+    show how long the server took (DNS, connect, time to first byte) apart from how long the page took to become usable
+    (DOMContentLoaded and load, from the start of the navigation).
+
+    Timings are read after every ``driver.get`` and every successful :py:func:`~sw.utils.sleepwait`, with a single
+    ``execute_script`` each time. A page's navigation timings are only counted once, after its load event; once they
+    have been, further waits on the same URL don't read anything. Resources fetched later (by AJAX, for instance) are
+    counted toward the page when it's next read.
+
+    Pages are grouped by URL pattern, see :func:`pattern`. The child keeps a :class:`PageTimes` per pattern and sends
+    them to the pool with :func:`ship` at the end of every job.
+
+    :param None patterns: List of ``[ regex, name ]`` pairs. A URL matching a regex is grouped under its name; the first
+        match wins.
+
+    :return: NavTiming (self)
+    """
+    def __init__( self, patterns=None ):
+        self.patterns = [ ( re.compile( p ), name ) for p, name in ( patterns or [ ] ) ]
+
+        # Page times gathered since we last shipped them, by pattern
+        self.pages = OrderedDict( )
+
+        # The URL we last read and whether its navigation has been counted, which means it had finished loading
+        self.url = None
+        self.counted = False
+
+        # navigationStart of the last page counted, a new navigation to the same URL has a new one
+        self.navigationStart = None
+
+
+
+    def watch( self, driver, loaded ):
+        """Has timings read after each of *driver*'s navigations by wrapping its get.
+
+        :param driver: The child's WebDriver.
+        :param loaded: Called with no arguments after each navigation, see :py:func:`~sw.child.Child.pageLoaded`.
+        :return: None
+        """
+        get = driver.get
+
+        def timedGet( url ):
+            get( url )
+            loaded( )
+
+        driver.get = timedGet
+
+
+
+    def collect( self, driver ):
+        """Reads the current page's timings, if there's anything new to read. A page is only counted once, a new
+        navigation is told apart by its URL or navigationStart, which are read along with the timings so a wait that
+        spanned a navigation always sees the new page.
+
+        :param driver: The child's WebDriver.
+        :return: None
+        """
+        r = driver.execute_script( SCRIPT )
+        if not r:
+            return
+
+        href, navigationStart = r[0], r[1]
+        page = self.page( pattern( href, self.patterns ) )
+
+        for d in r[10]:
+            page.record( "resources", d / 1000.0 )
+
+        if href != self.url or navigationStart != self.navigationStart:
+            self.url = href
+            self.counted = False
+
+        # Wait for the load event so every field is filled in
+        if self.counted or not r[9]:
+            return
+
+        ms = [ r[3] - r[2], r[5] - r[4], r[7] - r[6], r[8] - navigationStart, r[9] - navigationStart ]
+        for m, t in zip( METRICS, ms ):
+            page.record( m, max( 0, t ) / 1000.0 )
+
+        page.pages += 1
+        self.counted = True
+        self.navigationStart = navigationStart
+
+
+
+    def page( self, name ):
+        """Finds the page times for a pattern, adding them if they're new.
+
+        :param name: The URL pattern.
+        :return: :class:`PageTimes`
+        """
+        if name not in self.pages:
+            self.pages[name] = PageTimes( )
+
+        return self.pages[name]
+
+
+
+    def ship( self, results, num ):
+        """Sends everything gathered so far to the pool as a NAVTIMING result per pattern, then starts over.
+
+        :param results: Our end of the result channel, a :class:`~sw.channel.Writer`.
+        :param num: The child's number.
+        :return: None
+        """
+        for name, p in self.pages.items( ):
+            results.put( [ num, NAVTIMING, p.pages, name, json.dumps( p.toDict( ) ) ] )
+
+        self.pages = OrderedDict( )
+
+
+
+def pattern( url, patterns=None ):
+    """Groups a URL with others for the same page: the query string and fragment are dropped and any path segment that
+    looks like an id becomes ``*``, so ``http://host/item/123?x=1`` is ``http://host/item/*``.
+
+    :param url: The URL.
+    :param None patterns: List of ( compiled regex, name ) checked first, see :class:`NavTiming`.
+    :return: String
+    """
+    for regex, name in patterns or [ ]:
+        if regex.search( url ):
+            return name
+
+    url = url.split( "#", 1 )[0].split( "?", 1 )[0]
+
+    scheme, sep, rest = url.partition( "://" )
+    if not sep:
+        scheme, rest = "", url
+
+    parts = rest.split( "/" )
+    parts = parts[:1] + [ "*" if ID_SEGMENT.match( s ) else s for s in parts[1:] ]
+
+    return ''.join( [ scheme, sep, "/".join( parts ) ] )
+
+
+
+def fromOptions( options ):
+    """Builds a child's collector from the run's options, see the ``navtiming`` options.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :return: :class:`NavTiming`, or None if timings aren't being collected.
+    """
+    if not options.get( 'navtiming', False ):
+        return None
+
+    return NavTiming( options.get( 'navtimingpatterns', None ) )
@@ -0,0 +1,123 @@
+import random, time
+
+class ThinkTime:
+    """A distribution of think times, the pauses a real user takes between actions. Used by :class:`Pacer`.
+
+    Think times are given in options as a number of seconds (always that long), a ``[ min, max ]`` list (uniform), or a
+    dict naming the distribution in ``type`` along with its parameters::
+
+        { "type": "exponential", "mean": 5 }
+        { "type": "gaussian", "mean": 5, "sd": 1.5 }
+
+    :param "fixed" kind: "fixed", "uniform", "exponential", or "gaussian".
+    :param 0 time: Seconds for a fixed think time.
+    :param 0 min: Shortest uniform think time.
+    :param 0 max: Longest uniform think time.
+    :param 0 mean: Average exponential or gaussian think time.
+    :param 0 sd: Standard deviation of a gaussian think time.
+
+    :return: ThinkTime (self)
+    """
+    def __init__( self, kind="fixed", time=0, min=0, max=0, mean=0, sd=0 ):
+        if kind not in [ "fixed", "uniform", "exponential", "gaussian" ]:
+            raise ValueError( ''.join( [ "Unknown think time type: ", str( kind ) ] ) )
+
+        self.kind = kind
+        self.time = time
+        self.min = min
+        self.max = max
+        self.mean = mean
+        self.sd = sd
+
+
+
+    def sample( self ):
+        """Picks a think time.
+
+        :returns: Float for seconds, never negative.
+        """
+        if self.kind == "uniform":
+            return random.uniform( self.min, self.max )
+
+        if self.kind == "exponential":
+            if self.mean <= 0:
+                return 0.0
+            return random.expovariate( 1.0 / self.mean )
+
+        if self.kind == "gaussian":
+            return max( 0.0, random.gauss( self.mean, self.sd ) )
+
+        return float( self.time )
+
+
+
+class Pacer:
+    """Decides how long a child pauses: between jobs, and between the steps of a job. Between jobs a child either
+    thinks (``thinktime`` after a success, ``failthinktime`` after a failure), or with ``period`` set starts a job every
+    *period* seconds, waiting out whatever the last job didn't use. A period makes each child run a known number of jobs
+    per second no matter how long they take, up to the point jobs take longer than the period.
+
+    Within a job a child thinks for ``stepthinktime`` at each step (every wait on an element). Time spent thinking inside a
+    job is left out of its recorded time.
+
+    :param options: Dict of kwargs passed to our wrapper.
+
+    :return: Pacer (self)
+    """
+    def __init__( self, options ):
+        self.success = fromOption( options.get( 'thinktime', 0.5 ) )
+        self.failure = fromOption( options.get( 'failthinktime', 1 ) )
+        self.step = fromOption( options.get( 'stepthinktime', None ) )
+
+        # Seconds between job starts, replaces think times between jobs
+        self.period = options.get( 'period', None )
+
+
+
+    def between( self, started, failed=False ):
+        """How long to wait before the next job.
+
+        :param started: UNIX timestamp of when the last job started.
+        :param False failed: If the last job failed.
+        :returns: Float for seconds.
+        """
+        if self.period is not None:
+            return max( 0.0, started + self.period - time.time( ) )
+
+        think = self.failure if failed else self.success
+        if think is None:
+            return 0.0
+
+        return think.sample( )
+
+
+
+    def within( self ):
+        """How long to think at a step of a job.
+
+        :returns: Float for seconds.
+        """
+        if self.step is None:
+            return 0.0
+
+        return self.step.sample( )
+
+
+
+def fromOption( value ):
+    """Builds a :class:`ThinkTime` from an option's value, see :class:`ThinkTime` for the forms it takes.
+
+    :param value: The option's value.
+    :returns: :class:`ThinkTime`, or None for no think time.
+    """
+    if value is None:
+        return None
+
+    if isinstance( value, dict ):
+        params = dict( ( str( key ), v ) for key, v in value.items( ) )
+        return ThinkTime( params.pop( 'type', "fixed" ), **params )
+
+    if isinstance( value, ( list, tuple ) ):
+        return ThinkTime( "uniform", min=value[0], max=value[1] )
+
+    return ThinkTime( "fixed", time=value )
@@ -1,18 +1,26 @@
-from multiprocessing import Queue
+import Queue as Q
 from sw.child import Child
-import time, os, datetime, curses
+import time, os, datetime, random
+from collections import deque, OrderedDict
 from sw.const import * # Constants
 from sw.formatting import * 
 from sw.report import *
+from sw.stats import Histogram, Stats
+from sw.jobs import JobQueue
+from sw.board import StatusBoard
+from sw.channel import Channel
+from sw.profile import Profile, fromOptions
+from sw.navtiming import PageTimes
+import sw.feeder, sw.results, sw.metrics, sw.artifacts, sw.log, json
 
 
 
 class Pool:
     """Stores parameters across all children, sets out log directory, initializes our data arrays,
-        records start times, and pops `numJobs` functions into a Queue. Abstracts and makes it easier to
+        records start times, and puts `numJobs` jobs into a :class:`~sw.jobs.JobQueue`. Abstracts and makes it easier to
         manage scores of child processes. Also has a :func:`think` process to continuously manage them.
 
-        :param func: The function reference that will be put into our work queue `numJobs` times.
+        :param func: The function reference that each child runs for every job.
         :param file: Filename with directory of our script which contained `func`. This is used to create a relative log directory.
         :param kwargs: Kwargs dict passed to :func:`main`, eventually passes arguments on to GhostDriver. 
             'stagger' is pulled from this dict if it exists.
@@ -25,13 +33,22 @@ class Pool:
         # Statistics and data per child
         self.data = [ ]
 
+        # Running totals across every child
+        self.stats = Stats( )
+
+        # Stats for each named transaction scripts time within their jobs, in the order they were first seen
+        self.transactions = OrderedDict( )
+
+        # Browser timings children collected for each URL pattern, see sw.navtiming
+        self.navTiming = OrderedDict( )
+
         self.status = STARTING
 
-        # Our one way queue from our children
-        self.childQueue = Queue( )
+        # Our one way channel of results from our children
+        self.childQueue = Channel( )
 
-        # Our work for children
-        self.workQueue = Queue( )
+        # Our work for children, a count of jobs rather than the function itself
+        self.workQueue = JobQueue( )
 
         # Options to be passed to children
         self.options = kwargs
@@ -50,7 +67,13 @@ class Pool:
         self.started = None
 
         # Our pool log
-        self.lh = open( os.path.join( self.log, 'pool.txt' ), 'w+', 0 )
+        self.logger = sw.log.fromOptions( self.options, os.path.join( self.log, 'pool' ) )
+
+        # Every job's outcome, kept in the log directory for reading back, see sw.results. None if not kept.
+        self.results = sw.results.fromOptions( self.options, self.log )
+
+        # The job each child is running and when it started, by child number
+        self.running = { }
 
         # Our log level
         self.level = self.options['level']
@@ -63,18 +86,114 @@ class Pool:
 
         self.stopped = False
 
+        # Our UI, either a curses Ui or Headless. Set by the main loop once created.
+        self.ui = None
+
         ####### Settings ########
 
-        # Time between children spawning
-        self.staggeredTime = self.options.get( 'staggertime', 5 )
+        # Open loop: jobs to start per second regardless of how fast they finish. None for a fixed number of jobs
+        # handed out as fast as children can take them (closed loop).
+        self.rate = self.options.get( 'rate', None )
+
+        # Spacing of arrivals in open loop, "constant" or "poisson"
+        self.arrival = self.options.get( 'arrival', "constant" )
+
+        # Seconds the run lasts after the first child is ready, None to run until out of work
+        self.duration = self.options.get( 'duration', None )
+
+        # The load profile we follow, which replaces the old stagger timer
+        self.profile = fromOptions( self.options )
+
+        if self.duration is None:
+            self.duration = self.profile.end
+
+        # A profile of rates makes this an open loop run
+        if self.profile.kind == "rate" and self.rate is None:
+            self.rate = self.profile.target( 0 )
+
+            # Children tell they're open loop from the rate option, and would otherwise leave after a single job
+            self.options['rate'] = self.rate
+
+        # Most children we'll grow to in order to keep up with our rate
+        most = self.startChildren
+        if self.profile.kind == "children":
+            most = max( [ most ] + [ int( x[1] ) for x in self.profile.stages ] )
+        self.maxChildren = self.options.get( 'maxchildren', most * 4 )
+
+        # Live state of every child, which they write to directly. Has a slot for as many children as we'll ever have.
+        self.board = StatusBoard( max( self.maxChildren, self.startChildren ) )
+
+        # Rows of test data handed to jobs, None if the script has none
+        self.feeder = sw.feeder.fromOptions( self.options, self.board.capacity, os.path.dirname( os.path.abspath( file ) ) )
+
+        # Which failures leave a screenshot and a full dump behind, shared by every child. None to capture them all.
+        self.artifacts = sw.artifacts.fromOptions( self.options )
+
+        # Seconds a running child can go without a heartbeat before we log it as stalled, and those we have
+        self.stallTime = self.options.get( 'stalltime', 120 )
+        self.stalled = set( )
+
+        # Times a stopped or dead child has been started again
+        self.restarts = 0
+
+        # Times in a row each child's process died before taking a job, and how many we put up with before giving up
+        self.failedStarts = { }
+        self.startRetries = self.options.get( 'startretries', 3 )
+
+        # Why the run was stopped early, None if it wasn't
+        self.error = None
+
+        ####### Open Loop ########
+        # When the run ends (UNIX timestamp), set once started if there's a duration
+        self.ends = None
+
+        # Set once the run has ended and children are being let go
+        self.closing = False
+
+        # Next time a job arrives
+        self.nextArrival = None
+
+        # Jobs in the work queue that no child has started
+        self.pending = 0
+
+        # When each of those pending jobs was due to start, oldest first
+        self.scheduled = deque( )
+
+        # Children currently running a job
+        self.busy = set( )
+
+        # Arrivals dropped because there was no child to run them
+        self.missed = 0
+
+        # Seconds between when a job was due to start and when a child started it
+        self.startLag = Histogram( )
 
         ####### One Offs ########
         # Populate our work queue
-        for x in range(self.options['jobs']):
-            self.workQueue.put( func )
+        if self.rate is None:
+            self.workQueue.put( self.options['jobs'] )
+
+        ####### Profile ########
+        # When we started following the profile, the same moment as self.started so a browser's startup doesn't eat into
+        # the first stage. Until then we stay in the first stage.
+        self.profileStart = None
+
+        # The stage of the profile we're in, and whether its target changed underneath it, see reprofile( )
+        self.stage = 0
+        self.retarget = False
 
-        # Next time we'll spawn a child
-        self.nextSpawn = time.time( )
+        # Stats for each stage and when each began
+        self.stageStats = [ Stats( ) for x in self.profile.stages ]
+        self.stageStarted = [ None for x in self.profile.stages ]
+
+        # Seconds between checks on our children when none of them have reported in
+        self.checkTime = self.options.get( 'checktime', 1 )
+
+        # Next time we check on our children
+        self.nextCheck = time.time( )
+
+        # Live metrics for scraping, served from a thread of its own. None if not served.
+        self.metrics = sw.metrics.fromOptions( self )
 
         self.logMsg( "Pool starting" )
         self.reporting.start( )
@@ -90,15 +209,21 @@ class Pool:
         for c in self.children:
             if c.status( ) >= STOPPED:
                 c.start( )
+                self.restarts += 1
                 self.logMsg( ''.join( [ "Respawning old child (#", str( c.num + 1 ), ")" ] ) )
                 self.reporting.newChild( c.num )
                 return
 
-        self.data.append( [ 0, 0, DISP_LOAD, [ ] ] )
+        if len( self.children ) >= self.board.capacity:
+            self.logMsg( ''.join( [ "Not spawning a child, the pool is at its limit of ", str( self.board.capacity ), " (maxchildren)" ] ), WARNING )
+            return
+
+        self.data.append( [ 0, 0, Histogram( ) ] )
 
         self.reporting.newChild( len( self.children ) )
 
-        self.children.append( Child( self.childQueue, self.workQueue, len( self.children ), self.log, self.options ) )
+        self.children.append( Child( self.childQueue, self.workQueue, self.board, self.func, len( self.children ), self.log, self.options,
+                                     self.feeder, self.artifacts ) )
 
         self.logMsg( ''.join( [ "Spawned new child (#", str( len( self.children ) ), ")" ] ) )
 
@@ -127,7 +252,7 @@ class Pool:
             return
 
         if c.status( ) == RUNNING:
-            self.workQueue.put( self.func )
+            self.retry( )
             self.reporting.jobFail( "User or Pool Stopped Child",  c.num ) 
             self.logMsg( "Readding terminated child's job" )
         else:
@@ -145,10 +270,7 @@ class Pool:
 
         :returns: Integer for number of jobs successfully completed.
         """
-        if len( self.data ) > 0:
-            return reduce( lambda x, y: x + y, map( lambda x: x[SUCCESSES], self.data ) )
-        else:
-            return 0
+        return self.stats.successes
 
 
 
@@ -157,10 +279,7 @@ class Pool:
 
         :returns: Integer for number of failed jobs.
         """
-        if len( self.data ) > 0:
-            return reduce( lambda x, y: x + y, map( lambda x: x[FAILURES], self.data ) )
-        else:
-            return 0
+        return self.stats.failures
 
     
 
@@ -168,69 +287,381 @@ class Pool:
         """Reports how long everything has taken so far.
 
         :param False sum: Whether or not to return the sum of the time taken on jobs.
-        :returns: List of individual job run times if sum is False, otherwise the amount of time taken as a float.
+        :returns: :class:`~sw.stats.Histogram` of successful job run times if sum is False, otherwise the amount of time taken as a float.
         """
-        times = [ item for sublist in map( lambda x: x[TIMES], self.data ) for item in sublist ] # Flatten
-
         if sum:
-            return sum( times )
+            return self.stats.times.total
         else:
-            return times
+            return self.stats.times
 
 
 
-    def think( self ): 
+    def think( self, timeout=0 ): 
         """Runs through a single think loop; called by :py:func:`sw.wrapper.mainLoop` until there is no more work remaining.
-        Check children are alive/restart if there are more jobs. Checks queues and parses any data.
+        Blocks on our childQueue until either a child reports in, *timeout* passes, or something the pool has scheduled
+        (spawning a child, sending reports, checking on children) comes due. Anything that arrives is handled immediately,
+        then children are checked on and restarted if there are more jobs.
+
+        :param 0 timeout: The longest, in seconds, to wait for a child to report in. 0 never blocks.
+        :returns: None
+        """
+        wait = min( timeout, self.nextEvent( ) - time.time( ) )
+        handled = False
+
+        # Block until something happens, then drain anything else that showed up with it
+        try:
+            if wait > 0:
+                r = self.childQueue.get( True, wait )
+            else:
+                r = self.childQueue.get( False )
+
+            while True:
+                self.handle( r )
+                handled = True
+                r = self.childQueue.get( False )
+        except Q.Empty:
+            pass
+
+        self.schedule( )
+
+        if self.results is not None:
+            self.results.think( )
+
+        self.logger.think( )
+
+        # Only look over our children when one has reported in or when we're due for a check
+        if handled or self.status == STARTING or time.time( ) >= self.nextCheck:
+            self.nextCheck = time.time( ) + self.checkTime
+            self.supervise( )
+
+
+
+    def drain( self ):
+        """Handles every result waiting in our childQueue without blocking.
+
+        :returns: None
+        """
+        try:
+            while True:
+                self.handle( self.childQueue.get( False ) )
+        except Q.Empty:
+            pass
+
+
+
+    def nextEvent( self ):
+        """Finds the next time the pool has something scheduled to do on its own, without a child reporting in.
+
+        :returns: Float for a UNIX timestamp.
+        """
+        t = self.nextCheck
+
+        if self.status <= RUNNING and self.profileStart is not None:
+            change = self.profile.nextChange( time.time( ) - self.profileStart )
+            if change is not None:
+                t = min( t, self.profileStart + change )
+
+        if self.ends is not None and not self.closing:
+            t = min( t, self.ends )
+
+        if self.rate is not None and self.nextArrival is not None and self.status == RUNNING:
+            t = min( t, self.nextArrival )
+
+        return t
+
+
+
+    def handle( self, r ):
+        """Handles a single result sent by a child over our childQueue.
+
+        :param r: The result, a list indexed by the child queue indicies in const.py.
+        :returns: None
+        """
+        i = r[NUMBER]
+
+        if r[RESULT] == DONE:
+            self.busy.discard( i )
+            self.data[i][SUCCESSES] += 1
+            self.data[i][TIMES].record( r[TIME] )
+            self.stats.success( r[TIME] )
+            self.stageStats[self.stage].success( r[TIME] )
+            self.reporting.jobFinish( r[TIME], i )
+            self.record( i, r[TIME], sw.results.OUTCOME_DONE )
+
+        elif r[RESULT] == FAILED:
+            if self.ui is not None:
+                self.ui.flash( )
+
+            self.busy.discard( i )
+            self.data[i][FAILURES] += 1
+            self.stats.failure( )
+            self.stageStats[self.stage].failure( )
+            self.reporting.jobFail( r[ERROR], i, r[EXTRA1] )
+            self.record( i, r[TIME], sw.results.OUTCOME_FAILED, signature=errorSignature( r[ERROR] ) )
+
+            # When we get a failure we put the job back on the queue
+            self.retry( )
+
+        elif r[RESULT] == READY and self.started == None:
+            self.started = time.time( )
+            self.nextArrival = self.started
+
+            self.profileStart = self.started
+            self.stageStarted[0] = self.started
+
+            if self.duration is not None:
+                self.ends = self.started + self.duration
+
+        elif r[RESULT] == MESSAGE and r[3]:
+            self.busy.add( i )
+            self.failedStarts.pop( i, None )
+            self.running[i] = ( int( r[EXTRA1] or 0 ), r[TIME] )
+
+            if self.pending > 0:
+                self.pending -= 1
+                self.startLag.record( r[TIME] - self.scheduled.popleft( ) )
+
+            self.reporting.jobStart( i )
+
+        elif r[RESULT] == TRANSACTION:
+            name = r[ERROR]
+            if name not in self.transactions:
+                self.transactions[name] = Stats( )
+
+            if r[EXTRA1]:
+                self.transactions[name].failure( )
+            else:
+                self.transactions[name].success( r[TIME] )
+
+            self.reporting.transaction( name, r[TIME], bool( r[EXTRA1] ), i )
+            self.record( i, r[TIME], sw.results.OUTCOME_FAILED if r[EXTRA1] else sw.results.OUTCOME_DONE, name )
+
+        elif r[RESULT] == NAVTIMING:
+            name = r[ERROR]
+            if name not in self.navTiming:
+                self.navTiming[name] = PageTimes( )
+
+            times = PageTimes.fromDict( json.loads( r[EXTRA1] ) )
+            self.navTiming[name].merge( times )
+
+            self.reporting.navTiming( name, times, i )
+
+        elif r[RESULT] == EXITED:
+            self.busy.discard( i )
+            self.logMsg( ''.join( [ "Child process exited (#", str( i + 1 ), ")" ] ), DEBUG )
+
+
+
+    def record( self, i, t, outcome, transaction=None, signature=None ):
+        """Adds a job or transaction to our results file, if we're keeping one. A transaction is recorded with the id and
+        start of the job it was part of.
+
+        :param i: Number of the child that ran it.
+        :param t: Seconds it took.
+        :param outcome: OUTCOME_DONE or OUTCOME_FAILED from sw.results.
+        :param None transaction: The transaction's name, None for a job.
+        :param None signature: The error's signature if it failed.
+        :returns: None
+        """
+        if self.results is None:
+            return
+
+        job, start = self.running.get( i, ( 0, 0 ) )
+        self.results.write( job, i, start, t, outcome, transaction, signature )
+
+
+
+    def retry( self ):
+        """Puts a job that didn't finish back on the work queue. Open loop runs don't retry as that would raise
+        the load above our rate, it's counted as a failure instead.
+
+        :returns: None
+        """
+        if self.rate is None and not self.closing:
+            self.workQueue.put( )
+
+
+
+    def schedule( self ):
+        """Hands out any jobs due to arrive in an open loop run and ends the run once its duration is up.
+        Called from every :func:`think`.
+
+        :returns: None
+        """
+        if self.ends is not None and not self.closing and time.time( ) >= self.ends:
+            self.finish( )
+
+        if self.rate is None or self.nextArrival is None or self.closing:
+            return
+
+        # Arrivals aren't saved up while paused, starting, or at a rate of 0
+        if self.status != RUNNING or self.rate <= 0:
+            self.nextArrival = max( self.nextArrival, time.time( ) )
+            return
+
+        while self.nextArrival <= time.time( ):
+            self.arrive( self.nextArrival )
+
+            if self.arrival == "poisson":
+                self.nextArrival += random.expovariate( self.rate )
+            else:
+                self.nextArrival += 1.0 / self.rate
+
+
+
+    def arrive( self, due ):
+        """Starts a single job in an open loop run. If every living child is busy or already has a job waiting for it
+        another child is started, up to self.maxChildren. Past that the start is missed.
+
+        :param due: UNIX timestamp of when the job should have started.
+        :returns: None
+        """
+        alive = 0
+        for c in self.children:
+            if c.status( ) <= RUNNING and c.proc is not None:
+                alive += 1
+
+        if alive - len( self.busy ) - self.pending <= 0:
+            if alive >= self.maxChildren:
+                self.missed += 1
+                self.logMsg( ''.join( [ "Missed a job start, all ", str( alive ), " children are busy." ] ), WARNING )
+                return
+
+            self.newChild( )
+            self.logMsg( "Starting additional child to keep up with the arrival rate." )
+
+        self.workQueue.put( )
+        self.pending += 1
+        self.scheduled.append( due )
+
+
+
+    def finish( self ):
+        """Ends a run once its duration has passed. Jobs already running are left to finish but no more are started.
+
+        :returns: None
+        """
+        self.closing = True
+        self.logMsg( ''.join( [ "Run duration of ", str( self.duration ), "s reached, finishing." ] ) )
+
+        if self.rate is not None:
+            # Open loop children wait on the queue for work, this tells them to leave once it's handed out
+            self.workQueue.close( )
+        else:
+            self.workQueue.clear( )
+
+
+
+    def follow( self ):
+        """Follows our load profile, moving between stages as time passes and starting or stopping children to
+        meet the current stage's target. In an open loop run a target number of children is only a minimum as the pool
+        grows to keep up with its rate, while a target rate replaces the pool's rate.
+
+        Targets are only met when a stage begins, so children or a rate changed from the console in the middle of a
+        stage are left alone. Children let go to meet a lower target are idle ones where possible.
 
         :returns: None
         """
+        stage = self.profile.stage( time.time( ) - self.profileStart ) if self.profileStart is not None else 0
+
+        if stage == self.stage and self.status != STARTING and not self.retarget:
+            return
+
+        self.retarget = False
+
+        if stage != self.stage:
+            self.stage = stage
+            self.stageStarted[stage] = time.time( )
+            self.logMsg( ''.join( [ "Entering ", self.profile.stages[stage][2], ", target: ", 
+                str( self.profile.stages[stage][1] ), " ", self.profile.kind ] ) )
+
+        target = self.profile.stages[stage][1]
+
+        # A target rate still needs children to start with, the pool grows from there to keep up
+        if self.profile.kind == "rate":
+            self.rate = target
+            target = self.startChildren
 
-        self.reporting.think( )
+        # No point starting children that will leave right away
+        if self.closing or ( self.rate is None and self.status != STARTING and self.workQueue.empty( ) ):
+            return
+
+        # Newest first, then idle ones ahead of those in the middle of a job
+        alive = [ c for c in self.children[::-1] if c.status( ) <= RUNNING and c.proc is not None ]
+        alive.sort( key=lambda c: c.num in self.busy )
+
+        target = int( target )
+        for i in range( target - len( alive ) ):
+            self.newChild( )
 
-        # Check our queues
-        while not self.childQueue.empty( ):
-            r = self.childQueue.get( False )
-            i = r[NUMBER]
+        if self.rate is None:
+            for c in alive[:max( 0, len( alive ) - target )]:
+                self.endChild( c.num )
 
-            if r[RESULT] == DONE:
-                self.data[i][SUCCESSES] += 1
-                self.data[i][TIMES].append( r[TIME] )
-                self.reporting.jobFinish( r[TIME], i )
 
-            elif r[RESULT] == FAILED:
-                curses.flash( )
 
-                self.data[i][FAILURES] += 1
-                self.reporting.jobFail( r[ERROR], i, r[EXTRA1] )
+    def reprofile( self, stages ):
+        """Replaces the targets of our load profile, keeping when each stage starts, and meets the current stage's new
+        target straight away. A distributed run does this when our share of the load changes.
 
-                # When we get a failure we put the job back on the queue
-                self.workQueue.put( self.func )
+        :param stages: List of ( start, target[, name] ) stages, see :class:`~sw.profile.Profile`.
+        :returns: None
+        """
+        self.profile = Profile( stages, self.profile.kind, self.profile.end )
+        self.retarget = True
+        self.logMsg( ''.join( [ "Load profile changed, now targeting ", str( self.profile.stages[self.stage][1] ), " ",
+            self.profile.kind ] ) )
 
-            elif r[RESULT] == READY and self.started == None:
-                self.started = time.time( )
 
-            elif r[RESULT] == DISPLAY:
-                self.data[i][DISPLAY] = r[TIME]
 
-            elif r[RESULT] == MESSAGE and r[3]:
-                self.reporting.jobStart( i )
+    def supervise( self ):
+        """Spawns children while starting, then checks that children are alive and restarts them if there are more jobs.
+        Called from :func:`think` when a child reports in or self.checkTime has passed.
 
-        # Still spawning children, ignore their status until done.
+        :returns: None
+        """
+        # Spawn our first children, ignore their status until done.
         if self.status == STARTING:
-            left = self.startChildren - len( self.children )
-            # We have children left to spawn, spawn one
-            if left > 0 and time.time( ) > self.nextSpawn:
-                self.newChild( )
-                if self.options['stagger']:
-                    self.nextSpawn = time.time( ) + self.staggeredTime
-            # Done spawning children, so done starting
-            elif left == 0:
-                self.status = RUNNING
+            self.follow( )
+            self.status = RUNNING
         # Constant check to see if children and running and to automatically restart them
         elif self.status == RUNNING: 
+            self.follow( )
+
             # Check that children are alive, restart
             for c in self.children:
+                # A process that died without telling us, likely PhantomJS taking it down with it
+                if c.status( ) <= RUNNING and c.proc is not None and not c.proc.is_alive( ):
+                    if c.status( ) == RUNNING:
+                        self.retry( )
+                        self.reporting.jobFail( "Child process died", c.num )
+                    else:
+                        self.failedStarts[c.num] = self.failedStarts.get( c.num, 0 ) + 1
+                    self.busy.discard( c.num )
+                    c.status( ERRORED )
+                    self.logMsg( ''.join( [ "Child process died unexpectedly (#", str( c.num + 1 ), ")" ] ), ERR )
+
+                    # Most likely PhantomJS can't start at all, restarting it forever won't help
+                    if self.failedStarts.get( c.num, 0 ) >= self.startRetries:
+                        self.error = ''.join( [ "Child #", str( c.num + 1 ), " failed to start ", str( self.failedStarts[c.num] ),
+                            " times in a row, see its log. Stopping the run." ] )
+                        self.logMsg( self.error, CRITICAL )
+                        self.stopped = True
+                        return
+
+                # A job that hasn't moved on in a long while, likely a hung page
+                if c.status( ) == RUNNING and self.board.idle( c.num ) > self.stallTime:
+                    if c.num not in self.stalled:
+                        self.stalled.add( c.num )
+                        self.logMsg( ''.join( [ "Child appears stalled (#", str( c.num + 1 ), "), nothing heard for ",
+                            format( self.board.idle( c.num ) ), "s on step ", str( int( self.board.get( c.num, B_STEP ) ) ) ] ), WARNING )
+                else:
+                    self.stalled.discard( c.num )
+
+                # Open loop runs start children as jobs arrive, see arrive( )
+                if self.rate is not None:
+                    continue
+
                 #Check if we need more workers or if one is alive / without job to take this
                 if c.status( ) >= FINISHED and not self.workQueue.empty( ):
                     count = 0
@@ -240,7 +671,8 @@ class Pool:
                             count += 1
                     # If even after these children start we don't have enough workers for the job queue, start this one too
                     if self.workQueue.qsize( ) - count > 0:
-                        c.start( "Automatic start as more work is available." )
+                        c.start( )
+                        self.restarts += 1
                         self.reporting.newChild( c.num )
                         self.logMsg( "Starting additional child as more work is available." )
                 # Clean up leftover children that have manually terminated but still have processes
@@ -260,34 +692,29 @@ class Pool:
         if self.status >= STOPPED: 
             return True
 
-        if self.childQueue.empty( ) and self.workQueue.empty( ):
-            for c in self.children:
-                if c.status( ) <= PAUSED:
-                    return False
-        else:
+        # Open loop runs have work until their duration is up
+        if self.rate is not None and not self.closing:
             return False
 
-        return True
+        # Children send everything before finishing, so once they have the queue holds all they'll send
+        for c in self.children:
+            if c.status( ) <= PAUSED:
+                return False
+
+        return self.childQueue.empty( ) and self.workQueue.empty( )
 
 
 
     def logMsg( self, msg, level=NOTICE ):
-        """Logs a message to our log file in a consistent format. Depends on pool.lh 
-           already being initialized and ready for writing. Does not flush the handle.
+        """Logs a message to our log file in a consistent format, see :class:`~sw.log.Logger`. Messages below our level
+           are discarded before any formatting is done.
             
-           :param msg: The message to be logged.
+           :param msg: The message to be logged, or a list of parts to be joined into it only if it is.
            :param NOTICE level: The level of the message included. If the level is not
              greater than or equal to the user-specified level, the message is discarded.
            :returns: None
         """
-        # Get our timestamp
-        timestamp = datetime.datetime.now( ).strftime( "%H:%M:%S" )
-        
-        # String
-        w = ''.join( [ "[", timestamp, "] ", errorLevelToStr( level ), "\t", msg, "\n" ] )
-
-        if level >= self.level:
-            self.lh.write( w )
+        self.logger.log( msg, level )
 
 
 
@@ -304,11 +731,24 @@ class Pool:
 
         self.logMsg( "Pool stopped, stopping all children." )
 
+        # Results already sent count, and children who just finished a job aren't stopped mid-job
+        self.drain( )
+
         for c in self.children:
             self.endChild( c.num )
 
         self.status = type 
         self.reporting.stop( )
+
+        # A pause keeps our results file open, anything else is the end of the run
+        if self.results is not None:
+            if type == PAUSED:
+                self.results.flush( )
+            else:
+                self.results.close( )
+
+        if self.artifacts is not None:
+            self.logMsg( ''.join( [ "Artifacts: ", self.artifacts.summary( ) ] ) )
         
 
 
@@ -318,9 +758,16 @@ class Pool:
         :return: None
         """
         self.logMsg( "Pool started, starting all children." )
+
+        # Stopping closed our results file, carry on where it left off
+        if self.results is not None and self.results.f.closed:
+            self.results = sw.results.fromOptions( self.options, self.log )
         for c in self.children:
             c.start( )
             self.reporting.newChild( c.num )
+
+        # Jobs that were running were lost with the children
+        self.busy.clear( )
         
         self.status = RUNNING
         self.reporting.start( )
@@ -0,0 +1,209 @@
+import bisect
+
+class Profile:
+    """A load profile is a series of stages which the :class:`~sw.pool.Pool` follows on its own over the course of a run.
+    Each stage starts a number of seconds into the run and sets a target, either the number of children running jobs or
+    (for open loop runs) the number of jobs started per second. The target holds until the next stage starts.
+
+    Stages are given as a list of ``( start, target )`` tuples, optionally with a name as a third item::
+
+        Profile( [ ( 0, 1 ), ( 60, 5 ), ( 120, 10, "peak" ) ] )
+
+    Most of the time a profile is built by :func:`fromOptions` from the ``profile`` option, using one of the builders in
+    this module (:func:`linear`, :func:`ladder`, :func:`spike`, :func:`soak`) or a list of stages directly. The pool
+    tags its statistics with the stage they were recorded in, so a single run shows where throughput stops scaling.
+
+    :param stages: List of ( start, target[, name] ) tuples. They are sorted by start time.
+    :param "children" kind: What the targets are, "children" or "rate".
+    :param None end: Seconds into the run at which the profile is over, if it has a natural end. Used as the run's
+        duration when one isn't given.
+
+    :return: Profile (self)
+    """
+    def __init__( self, stages, kind="children", end=None ):
+        if kind not in [ "children", "rate" ]:
+            raise ValueError( ''.join( [ "Unknown profile kind: ", str( kind ) ] ) )
+
+        self.kind = kind
+        self.end = end
+
+        self.stages = [ ]
+        for s in sorted( stages, key=lambda s: s[0] ):
+            if len( s ) > 2:
+                name = str( s[2] )
+            else:
+                name = ''.join( [ "Stage ", str( len( self.stages ) + 1 ) ] )
+            self.stages.append( ( s[0], s[1], name ) )
+
+        if len( self.stages ) == 0 or self.stages[0][0] > 0:
+            raise ValueError( "A profile must have a stage starting at 0." )
+
+        # Start times alone for bisect
+        self.starts = [ s[0] for s in self.stages ]
+
+
+
+    def stage( self, elapsed ):
+        """Finds the stage active a number of seconds into the run.
+
+        :param elapsed: Seconds since the run started.
+        :return: Integer index into self.stages.
+        """
+        return max( 0, bisect.bisect_right( self.starts, elapsed ) - 1 )
+
+
+
+    def target( self, elapsed ):
+        """Finds the target a number of seconds into the run.
+
+        :param elapsed: Seconds since the run started.
+        :return: The target of the active stage.
+        """
+        return self.stages[self.stage( elapsed )][1]
+
+
+
+    def nextChange( self, elapsed ):
+        """Finds when the next stage starts.
+
+        :param elapsed: Seconds since the run started.
+        :return: Seconds since the run started of the next stage, or None if this is the last.
+        """
+        i = self.stage( elapsed ) + 1
+
+        if i < len( self.stages ):
+            return self.stages[i][0]
+
+        return None
+
+
+
+def linear( start, end, over, steps=None, hold=None, kind="children" ):
+    """Ramps linearly from one target to another.
+
+    :param start: The target at the beginning of the run.
+    :param end: The target reached after *over* seconds.
+    :param over: Seconds the ramp lasts.
+    :param None steps: How many increments to ramp in. Defaults to one per child for children, or 10 for a rate.
+    :param None hold: Seconds to hold *end* before the profile ends. None holds until the run ends.
+    :param "children" kind: What the targets are, "children" or "rate".
+    :return: :class:`Profile`
+    """
+    if steps is None:
+        if kind == "children":
+            steps = max( 1, abs( end - start ) )
+        else:
+            steps = 10
+
+    stages = [ ]
+    for i in range( steps + 1 ):
+        target = start + ( end - start ) * i / float( steps )
+        if kind == "children":
+            target = int( round( target ) )
+        stages.append( ( over * i / float( steps ), target ) )
+
+    return Profile( stages, kind, _end( over, hold ) )
+
+
+
+def ladder( start, step, count, hold, kind="children" ):
+    """Climbs in equal steps, holding each for the same amount of time.
+
+    :param start: The target of the first step.
+    :param step: Amount added to the target each step.
+    :param count: Number of steps, including the first.
+    :param hold: Seconds each step is held.
+    :param "children" kind: What the targets are, "children" or "rate".
+    :return: :class:`Profile`
+    """
+    stages = [ ( i * hold, start + i * step ) for i in range( count ) ]
+
+    return Profile( stages, kind, count * hold )
+
+
+
+def spike( base, peak, at, length, hold=None, kind="children" ):
+    """Holds a base load, jumps to a peak for a while, then drops back to the base.
+
+    :param base: The target before and after the spike.
+    :param peak: The target during the spike.
+    :param at: Seconds into the run the spike starts.
+    :param length: Seconds the spike lasts.
+    :param None hold: Seconds to hold the base after the spike before the profile ends. None holds until the run ends.
+    :param "children" kind: What the targets are, "children" or "rate".
+    :return: :class:`Profile`
+    """
+    stages = [ ( 0, base, "Base" ), ( at, peak, "Spike" ), ( at + length, base, "Recovery" ) ]
+
+    return Profile( stages, kind, _end( at + length, hold ) )
+
+
+
+def soak( target, rampup, hold, kind="children" ):
+    """Ramps up to a target then holds it for a long time.
+
+    :param target: The target to soak at.
+    :param rampup: Seconds to ramp up over, 0 to start at the target.
+    :param hold: Seconds to hold the target.
+    :param "children" kind: What the targets are, "children" or "rate".
+    :return: :class:`Profile`
+    """
+    if rampup <= 0:
+        return Profile( [ ( 0, target, "Soak" ) ], kind, hold )
+
+    p = linear( 0 if kind == "rate" else 1, target, rampup, kind=kind )
+    p.stages[-1] = ( p.stages[-1][0], p.stages[-1][1], "Soak" )
+    p.end = rampup + hold
+
+    return p
+
+
+
+def fromOptions( options ):
+    """Builds the profile for a run from its options. The ``profile`` option is either a list of stages (see
+    :class:`Profile`) whose kind is given by ``profilekind``, or a dict naming a builder in ``type`` along with its
+    parameters::
+
+        { "type": "linear", "start": 1, "end": 20, "over": 600 }
+
+    Without a profile the old stagger settings are followed: every child at once, or one more every ``staggertime``
+    seconds if ``stagger`` is set.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :return: :class:`Profile`
+    """
+    profile = options.get( 'profile', None )
+    builders = { "linear": linear, "ladder": ladder, "spike": spike, "soak": soak }
+
+    if profile is None:
+        children = options['children']
+        if options.get( 'stagger', False ) and children > 1:
+            p = ladder( 1, 1, children, options.get( 'staggertime', 5 ) )
+            p.end = None
+            return p
+        return Profile( [ ( 0, children ) ] )
+
+    if isinstance( profile, dict ):
+        params = dict( ( str( key ), value ) for key, value in profile.items( ) )
+        type = params.pop( 'type', None )
+
+        if type not in builders:
+            raise ValueError( ''.join( [ "Unknown profile type: ", str( type ) ] ) )
+
+        return builders[type]( **params )
+
+    return Profile( profile, options.get( 'profilekind', "children" ) )
+
+
+
+def _end( at, hold ):
+    """Works out when a profile ends given when its last stage starts.
+
+    :param at: Seconds into the run the last stage starts.
+    :param hold: Seconds the last stage is held, or None for forever.
+    :return: Seconds into the run or None.
+    """
+    if hold is None:
+        return None
+
+    return at + hold
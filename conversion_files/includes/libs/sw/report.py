@@ -1,11 +1,12 @@
-import json, time, os, getpass, socket, base64, traceback
-import splunklib.client as client
-import Queue as Q
+import json, time, os, getpass, socket, traceback, threading, random, uuid
+from collections import deque
 from sw.const import * 
+import sw.spool, sw.sinks
 
 class Report:
-    """Report handles all the reporting events sent from the Pool, currently it exclusively sends these upstream to a
-       Splunk server which then does further handling. The events are sent from the pool via calls to this instance's functions
+    """Report handles all the reporting events sent from the Pool and sends them on to its sinks (see :mod:`sw.sinks`):
+       a Splunk server, through its management port or an HTTP Event Collector, any HTTP endpoint, a local file, or
+       StatsD. Several can be used at once. The events are sent from the pool via calls to this instance's functions
        that in turn call :func:`send`.
 
        Reporting can be disabled putting None (or a blank field) in the initial settings page. This has the
@@ -14,6 +15,32 @@ class Report:
        The reporting class also takes in the custom ``id=""``, ``run=""``, and ``project=""`` from kwargs / initial settings. It 
        uses these settings when communicating unstream with the reporting server. 
 
+       Events are sent in batches of up to ``report_batch``, once that many are waiting or the oldest has waited
+       ``report_interval`` seconds. A batch goes upstream as newline-delimited JSON in a single request over a connection
+       that's kept open between batches, it is only made again after a failure. With ``report_hec`` set, batches are
+       posted to that Splunk HTTP Event Collector (using ``report_token``) rather than through the management port.
+
+       Local sinks (the file and StatsD) get each event once, as soon as its batch is taken off the queue, and never fail.
+       Only the sinks that send upstream are retried and spooled. A batch that fails on one of those is retried on all of
+       them, so with more than one an event may arrive twice.
+
+       Sending happens on a thread of its own (see :func:`sender`) so a slow or unreachable server never holds up the pool.
+       Events wait in a queue of at most ``report_queue`` events. If the server falls that far behind, events are dropped
+       by ``report_overflow``: "oldest" drops the oldest waiting event for each new one, "sample" keeps a random sample of
+       everything that arrived while the queue was full. Dropped events are counted and logged.
+
+       Events that can't be delivered are written to a :class:`~sw.spool.Spool` in the run's log directory rather than
+       held in memory, and everything after them follows them there so order is kept. The spool is replayed, oldest
+       first, once the server answers again. With a spool, reporting is never disabled for failing to send; whatever is
+       still spooled when the run ends can be sent later with ``python -m sw.spool``. Without one (``report_spool=False``),
+       failed batches are queued again in memory and reporting is disabled after 5 failures in a row.
+
+       The run is registered once with a SESSION event carrying everything that identifies it (``id``, ``Project``,
+       ``Script``, ``Run``, ``func``) along with the ``rid`` (session key) and ``cid`` (client) it's known by from then on.
+       Every other event only carries the ``rid``, its ``type`` and ``time``, and its own fields; searches join them to
+       their SESSION event on ``rid``. ``report_compact=False`` puts the identifying fields back in every event. With
+       ``report_gzip``, batches posted over HTTP are gzipped.
+
        :param pool: Reference to our owning pool. This is primarily to access pool.options and not used much elsewhere. 
 
        :return: Report (self)
@@ -36,36 +63,70 @@ class Report:
 
         self.script = pool.options.get( 'script', None )
 
-        self.site = pool.options.get( 'report', None )
-        
-        self.port = pool.options.get( 'report_port', 8089 )
+        # Where events go, and those of them that send upstream and are retried when they fail
+        self.sinks = sw.sinks.fromOptions( pool.options, pool.log )
+        self.remote = [ s for s in self.sinks if s.retry ]
 
-        self.user = pool.options.get( 'report_user', None )
+        # Most events sent in a single request, and most seconds an event waits for others to fill its batch
+        self.batchSize = pool.options.get( 'report_batch', 100 )
+        self.interval = pool.options.get( 'report_interval', 5 )
 
-        self.password = pool.options.get( 'report_pass', None )
-        
-        self.index = pool.options.get( 'report_index', None )
+        # Most events waiting to be sent, and what to do with more: "oldest" or "sample"
+        self.capacity = pool.options.get( 'report_queue', 10000 )
+        self.overflow = pool.options.get( 'report_overflow', "oldest" )
 
-        self.enabled = self.site is not None
+        if self.overflow not in [ "oldest", "sample" ]:
+            raise ValueError( ''.join( [ "Unknown reporting overflow policy: ", str( self.overflow ) ] ) )
+
+        # Events dropped because the queue was full, and how many of those we've logged
+        self.dropped = 0
+        self.logged = 0
+
+        self.enabled = len( self.sinks ) > 0
 
         if not self.enabled:
             return
 
-        # Set these, these are initialized when we get a response from the server
+        # Our session key and client, set when the run is registered by the first event
         self.rid = None
         self.cid = None
 
+        # The SESSION event, until the sender puts it at the front of its next batch
+        self.handshake = None
+
+        # Whether events only carry the session key rather than everything identifying the run
+        self.compact = pool.options.get( 'report_compact', True )
+
         # Set on an error transmitting
         self.nextSend = 0
 
         self.tries = 5
 
-        # Our queue of things to submit to our server
-        self.queue = Q.Queue( )
+        # Our queue of things to submit to our server, guarded by self.lock which the sender waits on
+        self.queue = deque( )
+        self.lock = threading.Condition( )
+
+        # When the oldest payload in the queue was added
+        self.oldest = None
+
+        # Events that have arrived since the queue filled up, for sampling
+        self.overflowed = 0
+
+        # Set when the sender should send everything left and finish
+        self.stopping = False
+
+        # Seconds stop( ) waits for the sender to finish
+        self.flushTimeout = pool.options.get( 'report_flushtimeout', 30 )
+
+        # Where undelivered events go until they can be sent, None to keep them in memory. Only the sender touches it.
+        self.spool = sw.spool.fromOptions( pool.options, pool.log ) if len( self.remote ) > 0 else None
 
         self.func = self.pool.func.__name__
 
-        pool.logMsg( ''.join( [ "Reporting to URL: ", self.site ] ) )
+        pool.logMsg( ''.join( [ "Reporting to: ", ", ".join( [ str( s ) for s in self.sinks ] ) ] ) )
+
+        self.thread = None
+        self.startSender( )
 
 
 
@@ -75,9 +136,8 @@ class Report:
            of the individual reporting functions (such as :func:`endchild`) to facilitate
            standard transmission of the data upstream.
 
-           Currently (to be fixed) it encodes repeat information in every single payload including
-           all identifying characteristics about the run, pool, and our id. There's major issue for this
-           except for further stressing network bandwidth and the JSON parser.
+           The first payload registers the run, see :func:`register`. After that, payloads only carry
+           the session key unless ``report_compact`` is off.
             
            :param payload: A hash of information to send upstream to our reporting server.
            :param type: The R_* constant identifier for the type of payload included. 
@@ -85,37 +145,107 @@ class Report:
         if not self.enabled:
             return
 
+        if self.rid is None:
+            self.register( )
+
         # Encode identifying information and the time
-        payload['id']   = self.id( )
+        if self.compact:
+            payload['rid'] = self.rid
+        else:
+            self.identify( payload )
+        payload['time'] = round( time.time( ), 3 )
+        payload['type'] = type
+
+        # Log payload
+        self.pool.logMsg( [ "Sending payload to queue: ", payload ], DEBUG )
+
+        with self.lock:
+            if len( self.queue ) == 0:
+                self.oldest = payload['time']
+
+            if len( self.queue ) < self.capacity:
+                self.overflowed = 0
+                self.queue.append( payload )
+            else:
+                self.dropped += 1
+                self.overflowed += 1
+
+                if self.overflow == "sample":
+                    # Reservoir sampling: every event that arrived while full has the same chance of being kept
+                    i = random.randint( 0, self.capacity + self.overflowed - 1 )
+                    if i < self.capacity:
+                        self.queue[i] = payload
+                else:
+                    self.queue.popleft( )
+                    self.queue.append( payload )
+                    self.oldest = self.queue[0]['time']
+
+            # An idle sender waits without a timeout, so it needs waking to time the first payload as well as for a full batch
+            if len( self.queue ) == 1 or len( self.queue ) >= self.batchSize:
+                self.lock.notify( )
+
+
+
+    def register( self ):
+        """Starts our session: picks the session key and makes the SESSION event, which the sender sends ahead of
+           everything else.
+
+           :returns: None
+        """
+        self.cid = self.id( )
+        self.rid = uuid.uuid4( ).hex[:16]
+
+        payload = { 'rid': self.rid, 'cid': self.cid, 'pid': os.getpid( ), 'time': round( time.time( ), 3 ), 'type': R_SESSION }
+        self.identify( payload )
+
+        self.pool.logMsg( ''.join( [ "Reporting session: ", self.rid ] ) )
+
+        with self.lock:
+            self.handshake = payload
+
+
+
+    def identify( self, payload ):
+        """Adds everything that identifies the run to a payload.
+
+           :param payload: Dict to add to.
+           :returns: None
+        """
+        payload['id'] = self.id( )
         payload['Project'] = self.project
         payload['Script'] = self.script
         payload['Run'] = self.run
         payload['func'] = self.func
-        payload['time'] = time.time( )
-        payload['type'] = type
 
-        # Log payload
-        self.pool.logMsg( "Sending payload to queue: " + str( payload ), DEBUG )
 
-        self.queue.put( payload )
 
+    def startSender( self ):
+        """Starts the sender thread if it isn't running.
+
+           :returns: None
+        """
+        if self.thread is not None and self.thread.is_alive( ):
+            return
 
+        self.stopping = False
+        self.thread = threading.Thread( target=self.sender )
+        self.thread.daemon = True
+        self.thread.start( )
 
-    def think( self, force=False ):
-        """The think function called by our pool periodically. It handles the transmission of
-           our payload (many individual reports) to the Splunk server.
 
-           If our report.queue has content in it, it prepares to send everything upstream. The payload is transmitted
-           in JSON with the following general format::
+
+    def sender( self ):
+        """Runs on the sender thread. Handles the transmission of our payloads (many individual reports) to the Splunk
+           server.
+
+           When the queue has a full batch in it, or its oldest payload has waited long enough, a batch is taken off and
+           sent upstream. Each payload is transmitted in JSON with the following general format::
 
              { 
-                "cid" => #, // Our client ID assigned by the server, nil if we don't have one yet.
-                "rid" => #, // Our run ID assined by the server, ^
+                "rid" => "...", // Our session key, see register( ).
                 "type" => R_START,    // For example, this is the type of payload here.
                 "time" => UNIX_EPOCH, // Since sometimes the Queue has a delay in transmission, each
                                       // payload contains it own timestamp.
-                // Some miscellaneous identifying information goes in here that's deprecated
-                // and unused.
 
                 // If the type involves a child:
                 "ChildID" => #, // The index of our child in pool.children / pool.data
@@ -124,89 +254,207 @@ class Report:
                 "timetaken" => UNIX_EPOCH //The time the job took to complete.
              }
 
-          This module attempts to send the payload upstream 5 times, waiting 5 seconds between reattempts. On the fifth failure
-          it never tries again. It is noted in the log when it gives up.
+          A batch that fails to send goes to the spool and the connection is dropped, to be made again on the next attempt
+          5 seconds later. While anything is spooled, or the server is failing, new batches are spooled too and each
+          wakeup replays a batch from the spool. Without a spool a failed batch is put back at the front of the queue.
+          Once :func:`stop` is called everything left is sent (or spooled, if the server is down) and the thread ends.
 
-          :param False force: Force the queue to be sent upstream.
           :returns: None
         """
-        t = time.time( )
-        if not self.enabled:
-            return
-        if self.queue.qsize( ) == 0:
-            return
-        if self.nextSend != 0 and t < self.nextSend and not force:
-            return
-
-        # We try to smash all of our data into a single array, which is then in
-        # a hash. This way we can trasmit everything in one fell swoop.
-        data = [ ]
+        while True:
+            with self.lock:
+                while True:
+                    if not self.enabled:
+                        return
 
-        while self.queue.qsize( ) > 0:
-            m = None
-            try:
-                m = self.queue.get( False )
-            except Q.Empty as e:
-                break
-            data.append( m )
-
-        if len( data ) > 0:
-            self.pool.logMsg( ' '.join( [ 'Sending', str( len( data ) ), 'payload(s) to server.' ] ), NOTICE )
-
-            # Prepare a single event to fire off
-            for i in range(len(data)):
-                r = None
-                d = data.pop( )
-                try:
-                    r = self.sendSplunk( json.dumps( d ) )
-                except Exception as e:
-                    self.pool.logMsg( "Fatal error with reporting, probably failed to connect: ", CRITICAL )
-                    self.pool.logMsg( traceback.format_exc( ), CRITICAL )
-                    if self.tries > 0:
-                        self.tries -= 1
-                        self.pool.logMsg( ''.join( [ "Disabling reporting after ", str( self.tries ), " more tries." ] ), CRITICAL )
-                        self.nextSend = t + 5
+                    t = time.time( )
+                    backlog = self.spool is not None and self.spool.pending( )
+                    if len( self.queue ) == 0:
+                        if backlog and t >= self.nextSend:
+                            break
+                        if self.stopping:
+                            return
+                        wait = self.nextSend - t if backlog else None
+                    elif t < self.nextSend:
+                        # Out to disk while the server is down, a full batch at a time
+                        if self.spool is not None and ( self.stopping or len( self.queue ) >= self.batchSize ):
+                            break
+                        wait = self.nextSend - t
+                    elif self.stopping or backlog or len( self.queue ) >= self.batchSize:
+                        break
                     else:
-                        self.pool.logMsg( "Disabling reporting.", CRITICAL )
-                        self.enabled = False
-                        return
+                        wait = self.oldest + self.interval - t
+                        if wait <= 0:
+                            break
+
+                    self.lock.wait( wait )
+
+                batch = [ self.queue.popleft( ) for i in range( min( self.batchSize, len( self.queue ) ) ) ]
+                if self.handshake is not None:
+                    batch.insert( 0, self.handshake )
+                    self.handshake = None
+                if len( self.queue ) > 0:
+                    self.oldest = self.queue[0]['time']
+
+                dropped = self.dropped
+
+            if dropped > self.logged:
+                self.pool.logMsg( ''.join( [ "Reporting queue full, dropped ", str( dropped - self.logged ), " event(s) (",
+                                             str( dropped ), " in total)" ] ), WARNING )
+                self.logged = dropped
+
+            for sink in self.sinks:
+                if not sink.retry:
+                    try:
+                        sink.send( batch )
+                    except Exception:
+                        self.pool.logMsg( ''.join( [ "Error reporting to ", str( sink ), ": ", traceback.format_exc( ) ] ), WARNING )
+
+            if len( self.remote ) == 0:
+                continue
+
+            if self.spool is not None and ( self.spool.pending( ) or time.time( ) < self.nextSend ):
+                # Behind what's already spooled, to keep them in order
+                self.spool.append( batch )
+                if time.time( ) >= self.nextSend:
+                    self.replay( self.spool )
+                continue
+
+            if not self.transmit( batch ):
+                if self.spool is not None:
+                    self.spool.append( batch )
+                    continue
+
+                with self.lock:
+                    # Back to the front, newer events give way if that overfills the queue
+                    self.queue.extendleft( reversed( batch ) )
+                    while len( self.queue ) > self.capacity:
+                        self.queue.pop( )
+                        self.dropped += 1
+                    self.oldest = self.queue[0]['time']
+
+
+
+    def transmit( self, batch ):
+        """Sends a single batch to every sink that sends upstream. Called on the sender thread.
+
+           :param batch: List of payloads.
+           :returns: Boolean for if it was sent.
+        """
+        self.pool.logMsg( ' '.join( [ 'Sending', str( len( batch ) ), 'payload(s) to server.' ] ), NOTICE )
+
+        try:
+            for sink in self.remote:
+                sink.send( batch )
+        except Exception as e:
+            self.pool.logMsg( "Fatal error with reporting, probably failed to connect: ", CRITICAL )
+            self.pool.logMsg( traceback.format_exc( ), CRITICAL )
+            self.disconnect( )
+
+            if self.spool is not None:
+                self.nextSend = time.time( ) + 5
+                if self.tries == 5:
+                    self.tries -= 1
+                    self.pool.logMsg( ''.join( [ "Spooling reporting events to ", self.spool.directory,
+                                                 " until the server answers." ] ), CRITICAL )
+            elif self.tries > 0:
+                self.tries -= 1
+                self.pool.logMsg( ''.join( [ "Disabling reporting after ", str( self.tries ), " more tries." ] ), CRITICAL )
+                self.nextSend = time.time( ) + 5
+            else:
+                self.pool.logMsg( "Disabling reporting.", CRITICAL )
+                self.enabled = False
+
+            return False
+
+        self.tries = 5
+        self.nextSend = 0
 
-                    # Put our data back in the send queue
-                    self.queue.put( d )
-                    for m in data:
-                        self.queue.put( m )
-                    return
+        return True
 
 
 
-    def sendSplunk( self, data ):
-        """Sends data to a Splunk sever encoded in JSON.
+    def replay( self, spool ):
+        """Sends the oldest batch in a spool.
 
-           :param data: JSON of data to send to the splunk server.
-           :returns: The parsed splunk event on success.
+           :param spool: The :class:`~sw.spool.Spool`.
+           :returns: Boolean for if it was sent, False if there was nothing to send.
         """
-        splunk = client.connect( host=self.site, 
-                port=self.port, 
-                username=self.user, 
-                password=self.password )
-        index = splunk.indexes[self.index]
-        return index.submit( data, sourcetype='py-event' )
-        
+        batch = spool.read( self.batchSize )
+        if len( batch ) == 0 or not self.transmit( batch ):
+            return False
+
+        spool.consume( len( batch ) )
+
+        return True
+
+
+
+    def upload( self, spool ):
+        """Sends everything in a spool, such as one left by a finished run. Failures are retried 5 seconds apart until
+           reporting is disabled, as they would be during a run without a spool.
+
+           :param spool: The :class:`~sw.spool.Spool`.
+           :returns: Integer, events sent.
+        """
+        while self.enabled and spool.pending( ):
+            if not self.replay( spool ):
+                time.sleep( max( 0, self.nextSend - time.time( ) ) )
+
+        return spool.delivered
+
+
+
+    def disconnect( self ):
+        """Drops our connections upstream so the next send makes new ones.
+
+           :returns: None
+        """
+        for sink in self.sinks:
+            try:
+                sink.disconnect( )
+            except Exception:
+                pass
+
+
 
     def start( self ):
-        """Sends a start notification payload.
+        """Sends a start notification payload. Starts sending again if we were stopped.
             
            :returns: None
         """
+        if self.enabled:
+            self.startSender( )
+
         self.send( { }, R_START )
 
     def stop( self ):
-        """Sends a stop notification payload. Also flushes the queue so when the pool terminates data isn't lost.
+        """Sends a stop notification payload. Also flushes the queue so when the pool terminates data isn't lost, waiting
+           up to ``report_flushtimeout`` seconds for the sender to finish.
             
            :returns: None
         """
         self.send( { }, R_STOP )
-        self.think( True )
+
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.stopping = True
+            self.lock.notify( )
+
+        self.thread.join( self.flushTimeout )
+
+        if self.thread.is_alive( ):
+            self.pool.logMsg( ''.join( [ "Gave up waiting for reporting to finish sending, ", str( len( self.queue ) ),
+                                         " event(s) not sent." ] ), CRITICAL )
+        elif self.spool is not None and self.spool.pending( ):
+            self.spool.close( )
+            self.pool.logMsg( ''.join( [ "Reporting events left undelivered in ", self.spool.directory, ", send them with: ",
+                                         "python -m sw.spool ", self.spool.directory, " <reporting options>" ] ), CRITICAL )
+
+        if not self.thread.is_alive( ):
+            self.disconnect( )
 
     def jobStart( self, child ):
         """Sends a job start notification payload.
@@ -233,20 +481,46 @@ class Report:
 
            :param error: The error text that was included with the error.
            :param child: The index of the child reporting in pool.children/pool.data.
-           :param None screenshot: A image from selenium's screenshot to be encoded in base64 
-             for sending (optional).
+           :param None screenshot: Where the child's screenshot of the failure is written (optional). The child writes
+             it in the background so it may not be there yet; only the path is sent.
            :returns: None
         """
 
         data = { 'error': error, 'childID': child }
 
-        if screenshot is not None and False:
-            self.pool.logMsg( "Screenshot: " + screenshot )
-            with open( screenshot, "rb") as img:
-                data['screenshot'] = base64.b64encode( img.read( ) ) 
+        if screenshot:
+            data['screenshot'] = screenshot
         
         self.send( data, R_JOB_FAIL )
 
+    def transaction( self, name, timetaken, failed, child ):
+        """Sends a named transaction's result.
+
+           :param name: The transaction's name.
+           :param timetaken: The time the transaction took.
+           :param failed: If the transaction failed.
+           :param child: The index of the child reporting in pool.children/pool.data.
+           :returns: None
+        """
+        self.send( { 'name': name, 'timetaken': timetaken, 'failed': failed, 'childID': child }, R_TRANSACTION )
+
+    def navTiming( self, pattern, times, child ):
+        """Sends the browser timings a child collected for a URL pattern during a job, as a page count and the
+           mean and 95th percentile of each timing.
+
+           :param pattern: The URL pattern.
+           :param times: :class:`~sw.navtiming.PageTimes` collected.
+           :param child: The index of the child reporting in pool.children/pool.data.
+           :returns: None
+        """
+        data = { 'pattern': pattern, 'pages': times.pages, 'childID': child }
+
+        for m, h in times.metrics.items( ):
+            if h.count > 0:
+                data[m] = { 'count': h.count, 'mean': h.mean( ), 'p95': h.percentile( 95 ) }
+
+        self.send( data, R_NAVTIMING )
+
     def newChild( self, child ):
         """Sends a new child notification payload. This is called even when a child
            is restarted.
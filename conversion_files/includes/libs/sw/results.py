@@ -0,0 +1,391 @@
+from sw.stats import Stats
+from sw.formatting import formatTransaction
+from collections import OrderedDict
+from array import array
+import struct, mmap, os, sys, time
+
+# Start of every results file: magic and format version
+HEADER = struct.Struct( '<8sH' )
+MAGIC = b'SWRESULT'
+VERSION = 1
+
+# Start of every block: its kind and how many records or strings it holds
+BLOCK = struct.Struct( '<4sI' )
+RECORDS = b'RECS'
+STRINGS = b'STRS'
+
+# A string definition: id, length in bytes (followed by the UTF-8 bytes)
+STRING = struct.Struct( '<IH' )
+
+# Columns of a record block in the order they're stored, with their array typecode and size in bytes. Each column holds
+# every record of the block before the next column starts.
+COLUMNS = [ ( "job", 'I', 4 ),         # Id of the job, see sw.jobs
+            ( "child", 'H', 2 ),       # Number of the child that ran it
+            ( "start", 'd', 8 ),       # UNIX timestamp of when the job started
+            ( "duration", 'd', 8 ),    # Seconds taken, without think time
+            ( "outcome", 'B', 1 ),     # OUTCOME_*
+            ( "transaction", 'I', 4 ), # String id of the transaction's name, 0 for the job as a whole
+            ( "signature", 'I', 4 ) ]  # String id of the error's signature, 0 if it didn't fail
+
+# Values of the outcome column
+OUTCOME_FAILED = 0
+OUTCOME_DONE = 1
+
+# Records a writer holds before writing a block
+BLOCK_SIZE = 4096
+
+# Name of the results file in a run's log directory
+FILENAME = "results.bin"
+
+
+
+class ResultsWriter:
+    """Appends the outcome of every job, and every named transaction, to a results file in the run's log directory. The
+    file is a compact record of a run that can be read back with :class:`ResultsReader` while the run is going or long
+    after, without parsing logs.
+
+    The file is append-only and made of blocks. A record block holds up to :data:`BLOCK_SIZE` records stored column by
+    column (every job id, then every child number, and so on, see :data:`COLUMNS`), so a reader can pull a single column
+    of a block out as an array without touching the rest. Transaction names and error signatures are stored once in a
+    string block and referred to by id. A string block always comes before the first record block that uses it.
+
+    Records are buffered and written a block at a time, or by :func:`think` every *interval* seconds so readers keep up
+    with the run. A block is written with a single write so a reader never sees half of one.
+
+    :param fn: Filename of the results file, created if it doesn't exist.
+    :param 1 interval: Most seconds a record is held before being written.
+
+    :return: ResultsWriter (self)
+    """
+    def __init__( self, fn, interval=1 ):
+        self.fn = fn
+        self.interval = interval
+
+        new = not os.path.exists( fn ) or os.path.getsize( fn ) == 0
+        self.f = open( fn, "ab" )
+
+        # Ids of strings already in the file, and those waiting to be written
+        self.ids = { "": 0 }
+        self.strings = [ ]
+
+        if new:
+            self.f.write( HEADER.pack( MAGIC, VERSION ) )
+            self.f.flush( )
+        else:
+            # Carry on from a file left by an earlier pool, such as after a restart
+            reader = ResultsReader( fn )
+            for id, s in reader.strings.items( ):
+                self.ids[s] = id
+            reader.close( )
+
+        # Records waiting to be written, a list per column
+        self.columns = [ [ ] for c in COLUMNS ]
+
+        # Last time we wrote
+        self.written = time.time( )
+
+
+
+    def write( self, job, child, start, duration, outcome, transaction=None, signature=None ):
+        """Buffers a single record.
+
+        :param job: Id of the job.
+        :param child: Number of the child that ran it.
+        :param start: UNIX timestamp of when it started.
+        :param duration: Seconds taken.
+        :param outcome: OUTCOME_DONE or OUTCOME_FAILED.
+        :param None transaction: The transaction's name, None for the job itself.
+        :param None signature: The error's signature if it failed, see :func:`~sw.formatting.errorSignature`.
+        :returns: None
+        """
+        values = [ job or 0, child, start or 0, duration or 0, outcome, self.intern( transaction ), self.intern( signature ) ]
+
+        for i in range( len( values ) ):
+            self.columns[i].append( values[i] )
+
+        if len( self.columns[0] ) >= BLOCK_SIZE:
+            self.flush( )
+
+
+
+    def intern( self, s ):
+        """Finds the id of a string, queueing it to be written if it's new.
+
+        :param s: The string, None for none.
+        :returns: Integer id, 0 for none.
+        """
+        if not s:
+            return 0
+
+        id = self.ids.get( s, None )
+        if id is not None:
+            return id
+
+        id = len( self.ids )
+        self.ids[s] = id
+
+        data = s.encode( 'utf-8' ) if not isinstance( s, bytes ) else s
+        data = data[:65535]
+        self.strings.append( STRING.pack( id, len( data ) ) + data )
+
+        return id
+
+
+
+    def think( self ):
+        """Writes out anything that has been held for longer than our interval. Called by the pool every think.
+
+        :returns: None
+        """
+        if time.time( ) - self.written >= self.interval:
+            self.flush( )
+
+
+
+    def flush( self ):
+        """Writes everything buffered, strings first.
+
+        :returns: None
+        """
+        self.written = time.time( )
+
+        n = len( self.columns[0] )
+        if n == 0 and len( self.strings ) == 0:
+            return
+
+        data = [ ]
+
+        if len( self.strings ) > 0:
+            data.append( BLOCK.pack( STRINGS, len( self.strings ) ) )
+            data.extend( self.strings )
+            self.strings = [ ]
+
+        if n > 0:
+            data.append( BLOCK.pack( RECORDS, n ) )
+            for ( name, typecode, size ), values in zip( COLUMNS, self.columns ):
+                data.append( struct.pack( ''.join( [ '<', str( n ), typecode ] ), *values ) )
+            self.columns = [ [ ] for c in COLUMNS ]
+
+        self.f.write( b''.join( data ) )
+        self.f.flush( )
+
+
+
+    def close( self ):
+        """Writes everything buffered and closes the file.
+
+        :returns: None
+        """
+        self.flush( )
+        self.f.close( )
+
+
+
+class ResultsReader:
+    """Reads a results file written by :class:`ResultsWriter` by memory-mapping it. Only block headers are read up front;
+    a column is decoded straight from the map, a block at a time, when asked for with :func:`column`. A file still being
+    written can be read, :func:`refresh` picks up blocks added since.
+
+    :param fn: Filename of the results file.
+
+    :return: ResultsReader (self)
+    """
+    def __init__( self, fn ):
+        self.fn = fn
+        self.f = open( fn, "rb" )
+        self.map = None
+
+        header = self.f.read( HEADER.size )
+        if len( header ) < HEADER.size or HEADER.unpack( header )[0] != MAGIC:
+            self.f.close( )
+            raise ValueError( ''.join( [ "Not a results file: ", fn ] ) )
+
+        # Transaction names and error signatures by id
+        self.strings = { 0: "" }
+
+        # Record blocks as ( offset of their first column, number of records )
+        self.blocks = [ ]
+
+        # Where the next block we haven't read starts
+        self.offset = HEADER.size
+
+        self.refresh( )
+
+
+
+    def refresh( self ):
+        """Maps the file again if it has grown and reads any new block headers.
+
+        :returns: None
+        """
+        size = os.fstat( self.f.fileno( ) ).st_size
+        if self.map is not None and len( self.map ) == size:
+            return
+
+        if self.map is not None:
+            self.map.close( )
+        self.map = mmap.mmap( self.f.fileno( ), size, access=mmap.ACCESS_READ )
+
+        while self.offset + BLOCK.size <= size:
+            kind, n = BLOCK.unpack_from( self.map, self.offset )
+            offset = self.offset + BLOCK.size
+
+            if kind == RECORDS:
+                end = offset + n * sum( c[2] for c in COLUMNS )
+                if end > size:
+                    break
+                self.blocks.append( ( offset, n ) )
+
+            elif kind == STRINGS:
+                strings = { }
+                for i in range( n ):
+                    if offset + STRING.size > size:
+                        break
+                    id, length = STRING.unpack_from( self.map, offset )
+                    offset += STRING.size + length
+                    strings[id] = self.map[offset-length:offset].decode( 'utf-8', 'replace' )
+
+                # Only part of the block is there yet
+                end = offset
+                if len( strings ) < n or end > size:
+                    break
+                self.strings.update( strings )
+
+            else:
+                raise ValueError( ''.join( [ "Corrupt results file: ", self.fn, " at ", str( self.offset ) ] ) )
+
+            self.offset = end
+
+
+
+    def __len__( self ):
+        return sum( n for offset, n in self.blocks )
+
+
+
+    def column( self, name ):
+        """Reads a column a block at a time.
+
+        :param name: The column's name, see :data:`COLUMNS`.
+        :returns: Generator of arrays, one per block.
+        """
+        skip = 0
+        for c in COLUMNS:
+            if c[0] == name:
+                typecode, size = c[1], c[2]
+                break
+            skip += c[2]
+        else:
+            raise ValueError( ''.join( [ "Unknown results column: ", str( name ) ] ) )
+
+        for offset, n in self.blocks:
+            start = offset + skip * n
+            a = array( typecode )
+            if hasattr( a, 'frombytes' ):
+                a.frombytes( self.map[start:start+size*n] )
+            else:
+                a.fromstring( self.map[start:start+size*n] )
+            if sys.byteorder == 'big':
+                a.byteswap( )
+            yield a
+
+
+
+    def records( self, *names ):
+        """Reads several columns together, a record at a time.
+
+        :param names: The columns' names, see :data:`COLUMNS`.
+        :returns: Generator of tuples, one value per column.
+        """
+        for arrays in zip( *[ self.column( name ) for name in names ] ):
+            for r in zip( *arrays ):
+                yield r
+
+
+
+    def summary( self ):
+        """Works out the run's stats from its records.
+
+        :returns: Tuple of ( Stats for jobs, OrderedDict of Stats by transaction name, dict of failure counts by error
+            signature, seconds from the first start to the last finish ).
+        """
+        jobs = Stats( )
+        transactions = OrderedDict( )
+        signatures = { }
+        first = None
+        last = None
+
+        for start, duration, outcome, transaction, signature in self.records( "start", "duration", "outcome", "transaction",
+                                                                               "signature" ):
+            if transaction == 0:
+                stats = jobs
+                if first is None or start < first:
+                    first = start
+                if last is None or start + duration > last:
+                    last = start + duration
+            else:
+                name = self.strings.get( transaction, "" )
+                if name not in transactions:
+                    transactions[name] = Stats( )
+                stats = transactions[name]
+
+            if outcome == OUTCOME_DONE:
+                stats.success( duration )
+            else:
+                stats.failure( )
+                if signature != 0:
+                    s = self.strings.get( signature, "" )
+                    signatures[s] = signatures.get( s, 0 ) + 1
+
+        return ( jobs, transactions, signatures, ( last - first ) if first is not None else 0 )
+
+
+
+    def close( self ):
+        """Unmaps and closes the file.
+
+        :returns: None
+        """
+        if self.map is not None:
+            self.map.close( )
+        self.f.close( )
+
+
+
+def fromOptions( options, log ):
+    """Opens the results file for a run, see the ``results`` options.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :param log: The run's log directory.
+    :returns: :class:`ResultsWriter`, or None if results aren't being kept.
+    """
+    if not options.get( 'results', True ):
+        return None
+
+    return ResultsWriter( os.path.join( log, FILENAME ), options.get( 'resultsinterval', 1 ) )
+
+
+
+
+def main( fn ):
+    """Prints a summary of a results file. Run as ``python -m sw.results logs/<run>/results.bin``.
+
+    :param fn: Filename of the results file.
+    :returns: None
+    """
+    reader = ResultsReader( fn )
+    jobs, transactions, signatures, elapsed = reader.summary( )
+
+    sys.stdout.write( ''.join( [ "   ".join( formatTransaction( "Jobs", jobs, elapsed ) ), "\n" ] ) )
+    for name, stats in transactions.items( ):
+        sys.stdout.write( ''.join( [ "   ".join( formatTransaction( name, stats, elapsed ) ), "\n" ] ) )
+
+    for s, count in sorted( signatures.items( ), key=lambda x: -x[1] ):
+        sys.stdout.write( ''.join( [ str( count ).rjust( 8 ), "   ", s, "\n" ] ) )
+
+    reader.close( )
+
+
+
+if __name__ == "__main__":
+    main( sys.argv[1] )
@@ -0,0 +1,419 @@
+from sw.stats import Histogram, Stats
+from sw.results import ResultsReader, OUTCOME_DONE, FILENAME
+from sw.formatting import format
+from collections import OrderedDict
+from sw.const import *
+import os, sys, csv, time, math, datetime, traceback
+
+# Most points along the time axis of a chart, the run is split into this many intervals (at least a second each)
+POINTS = 120
+
+# Percentiles charted and tabled
+PERCENTILES = [ 50, 95, 99 ]
+
+# Colors of the lines on a chart, in order
+COLORS = [ "#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd" ]
+
+
+
+class RunReport:
+    """Builds an end of run report from a run's results file (see :mod:`sw.results`): a self-contained HTML page with
+    charts of throughput, errors, and latency percentiles over time along with tables by transaction, error signature,
+    and child, plus the same figures as CSV files for spreadsheets.
+
+    The results are streamed a block at a time, only running totals and a :class:`~sw.stats.Histogram` per interval,
+    transaction, and child are kept. Memory doesn't grow with the number of jobs so multi-million job runs can be
+    reported on.
+
+    :param fn: Filename of the results file.
+
+    :return: RunReport (self)
+    """
+    def __init__( self, fn ):
+        self.fn = fn
+
+        # UNIX timestamps of the first job's start and the last job's end, and seconds per interval
+        self.first = None
+        self.last = None
+        self.step = 1
+
+        # Per interval: jobs finished, jobs failed, and a Histogram of the times of successful jobs
+        self.done = [ ]
+        self.failed = [ ]
+        self.times = [ ]
+
+        # Totals, for jobs, each transaction, and each child
+        self.jobs = Stats( )
+        self.transactions = OrderedDict( )
+        self.children = { }
+
+        # Failures by error signature as [ count, first seen, last seen ]
+        self.errors = { }
+
+
+
+    def build( self ):
+        """Reads the results file. The first pass only reads the start and duration columns to find how long the run
+        lasted, the second does the rest. Records without a start time (a job whose start the pool never heard about) are
+        counted but left out of the time series.
+
+        :returns: RunReport (self)
+        """
+        reader = ResultsReader( self.fn )
+
+        for starts, durations in zip( reader.column( "start" ), reader.column( "duration" ) ):
+            known = [ s for s in starts if s > 0 ]
+            if len( known ) == 0:
+                continue
+            first, last = min( known ), max( known ) + max( durations )
+            self.first = first if self.first is None else min( self.first, first )
+            self.last = last if self.last is None else max( self.last, last )
+
+        if self.first is None:
+            reader.close( )
+            return self
+
+        self.step = max( 1, int( math.ceil( ( self.last - self.first ) / POINTS ) ) )
+        n = int( ( self.last - self.first ) // self.step ) + 1
+
+        self.done = [ 0 ] * n
+        self.failed = [ 0 ] * n
+        self.times = [ Histogram( ) for i in range( n ) ]
+
+        for child, start, duration, outcome, transaction, signature in reader.records( "child", "start", "duration", "outcome",
+                                                                                        "transaction", "signature" ):
+            ok = outcome == OUTCOME_DONE
+
+            if transaction != 0:
+                name = reader.strings.get( transaction, "" )
+                if name not in self.transactions:
+                    self.transactions[name] = Stats( )
+                if ok:
+                    self.transactions[name].success( duration )
+                else:
+                    self.transactions[name].failure( )
+                continue
+
+            i = min( n - 1, int( ( start + duration - self.first ) // self.step ) ) if start > 0 else None
+
+            if child not in self.children:
+                self.children[child] = Stats( )
+
+            if ok:
+                if i is not None:
+                    self.done[i] += 1
+                    self.times[i].record( duration )
+                self.jobs.success( duration )
+                self.children[child].success( duration )
+            else:
+                if i is not None:
+                    self.failed[i] += 1
+                self.jobs.failure( )
+                self.children[child].failure( )
+
+                e = self.errors.setdefault( reader.strings.get( signature, "" ) or "(unknown)", [ 0, start, start ] )
+                e[0] += 1
+                e[1] = min( e[1], start )
+                e[2] = max( e[2], start )
+
+        reader.close( )
+
+        return self
+
+
+
+    def elapsed( self ):
+        """Seconds from the first job's start to the last job's end.
+
+        :returns: Float
+        """
+        if self.first is None:
+            return 0.0
+
+        return max( 0.001, self.last - self.first )
+
+
+
+    def write( self, directory ):
+        """Writes report.html and the CSV files into a directory.
+
+        :param directory: Where to write, usually the run's log directory.
+        :returns: Filename of the HTML report.
+        """
+        self.writeCSV( os.path.join( directory, "report-timeseries.csv" ), [ "seconds", "finished", "failed", "per second" ] +
+                       [ ''.join( [ "p", str( p ) ] ) for p in PERCENTILES ], self.series( ) )
+
+        self.writeCSV( os.path.join( directory, "report-transactions.csv" ), [ "name", "count", "failed", "mean", "max" ] +
+                       [ ''.join( [ "p", str( p ) ] ) for p in PERCENTILES ],
+                       [ [ name ] + self.row( stats ) for name, stats in self.summaries( ) ] )
+
+        self.writeCSV( os.path.join( directory, "report-errors.csv" ), [ "signature", "count", "first seen", "last seen" ],
+                       [ [ s, e[0], e[1], e[2] ] for s, e in self.sortedErrors( ) ] )
+
+        self.writeCSV( os.path.join( directory, "report-children.csv" ), [ "child", "count", "failed", "mean", "max" ] +
+                       [ ''.join( [ "p", str( p ) ] ) for p in PERCENTILES ],
+                       [ [ c + 1 ] + self.row( self.children[c] ) for c in sorted( self.children.keys( ) ) ] )
+
+        fn = os.path.join( directory, "report.html" )
+        with open( fn, "wb" ) as f:
+            f.write( self.html( ).encode( 'utf-8' ) )
+
+        return fn
+
+
+
+    def series( self ):
+        """The time series, one row per interval.
+
+        :returns: List of rows: seconds into the run, jobs finished, jobs failed, jobs finished per second, then the
+            times at each of PERCENTILES.
+        """
+        rows = [ ]
+        for i in range( len( self.done ) ):
+            rows.append( [ i * self.step, self.done[i], self.failed[i], self.done[i] / float( self.step ) ] +
+                         [ self.times[i].percentile( p ) for p in PERCENTILES ] )
+
+        return rows
+
+
+
+    def summaries( self ):
+        """Stats for jobs as a whole followed by each transaction.
+
+        :returns: List of ( name, Stats ).
+        """
+        return [ ( "(all jobs)", self.jobs ) ] + list( self.transactions.items( ) )
+
+
+
+    def sortedErrors( self ):
+        """Error signatures, most frequent first.
+
+        :returns: List of ( signature, [ count, first seen, last seen ] ).
+        """
+        return sorted( self.errors.items( ), key=lambda x: -x[1][0] )
+
+
+
+    def row( self, stats ):
+        """Figures for a table row.
+
+        :param stats: :class:`~sw.stats.Stats`
+        :returns: List of count, failures, mean, max, then the times at each of PERCENTILES.
+        """
+        return [ stats.successes + stats.failures, stats.failures, stats.times.mean( ), stats.times.max ] + \
+               [ stats.times.percentile( p ) for p in PERCENTILES ]
+
+
+
+    def writeCSV( self, fn, header, rows ):
+        """Writes a CSV file.
+
+        :param fn: Filename.
+        :param header: List of column names.
+        :param rows: List of rows.
+        :returns: None
+        """
+        with open( fn, "w" ) as f:
+            w = csv.writer( f, lineterminator="\n" )
+            w.writerow( header )
+            for r in rows:
+                w.writerow( [ cell( x ) for x in r ] )
+
+
+
+    def html( self ):
+        """Renders the report as a single HTML page. Charts are inline SVG so the page has no outside dependencies.
+
+        :returns: String
+        """
+        rows = self.series( )
+        seconds = [ r[0] for r in rows ]
+
+        parts = [ "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Run report</title><style>",
+                  "body { font-family: sans-serif; margin: 2em; color: #222; } table { border-collapse: collapse; margin-bottom: 2em; }",
+                  "td, th { border: 1px solid #ccc; padding: 4px 8px; text-align: right; } td:first-child, th:first-child { text-align: left; }",
+                  "svg { margin-bottom: 2em; } .legend span { margin-right: 1.5em; }",
+                  "</style></head><body>",
+                  "<h1>Run report</h1>",
+                  "<p>", escape( os.path.abspath( self.fn ) ), "</p>" ]
+
+        if self.first is None:
+            parts.append( "<p>No jobs were recorded.</p></body></html>\n" )
+            return ''.join( parts )
+
+        elapsed = self.elapsed( )
+        total = self.jobs.successes + self.jobs.failures
+        parts += [ "<p>", str( total ), " jobs from ", timestamp( self.first ), " to ", timestamp( self.last ), " (",
+                   format( elapsed, 0 ), "s), ", str( self.jobs.failures ), " failed, ",
+                   format( self.jobs.successes / elapsed ), " successful jobs per second.</p>" ]
+
+        parts += [ "<h2>Throughput</h2>",
+                   chart( seconds, [ ( "finished per second", [ r[3] for r in rows ] ),
+                                     ( "failed per second", [ r[2] / float( self.step ) for r in rows ] ) ] ) ]
+
+        parts += [ "<h2>Job time</h2>",
+                   chart( seconds, [ ( ''.join( [ "p", str( p ) ] ), [ r[4 + i] for r in rows ] )
+                                     for i, p in enumerate( PERCENTILES ) ], "s" ) ]
+
+        parts += [ "<h2>Transactions</h2>",
+                   table( [ "Name", "Count", "Failed", "Mean", "Max" ] + [ ''.join( [ "p", str( p ) ] ) for p in PERCENTILES ],
+                          [ [ name ] + self.row( stats ) for name, stats in self.summaries( ) ] ) ]
+
+        parts += [ "<h2>Errors</h2>",
+                   table( [ "Signature", "Count", "% of failures", "First seen", "Last seen" ],
+                          [ [ s, e[0], format( e[0] * 100.0 / max( 1, self.jobs.failures ), 1 ), timestamp( e[1] ),
+                              timestamp( e[2] ) ] for s, e in self.sortedErrors( ) ] ) ]
+
+        parts += [ "<h2>Children</h2>",
+                   table( [ "Child", "Count", "Failed", "Mean", "Max" ] + [ ''.join( [ "p", str( p ) ] ) for p in PERCENTILES ],
+                          [ [ str( c + 1 ) ] + self.row( self.children[c] ) for c in sorted( self.children.keys( ) ) ] ) ]
+
+        parts.append( "</body></html>\n" )
+
+        return ''.join( parts )
+
+
+
+def chart( xs, series, unit="", width=900, height=240 ):
+    """Draws a line chart as inline SVG.
+
+    :param xs: List of x values, seconds into the run.
+    :param series: List of ( label, list of y values ).
+    :param "" unit: Shown after the y axis's largest value.
+    :param 900 width: Width in pixels.
+    :param 240 height: Height in pixels.
+    :returns: String of SVG, with a legend.
+    """
+    left, bottom, pad = 60, 20, 10
+    top = max( [ max( ys ) if len( ys ) > 0 else 0 for label, ys in series ] + [ 0 ] ) or 1
+    right = max( xs[-1] if len( xs ) > 0 else 0, 1 )
+
+    def point( x, y ):
+        return ''.join( [ format( left + ( width - left - pad ) * x / float( right ), 1 ), ",",
+                          format( height - bottom - ( height - bottom - pad ) * y / float( top ), 1 ) ] )
+
+    parts = [ "<div class=\"legend\">" ]
+    for i, ( label, ys ) in enumerate( series ):
+        parts += [ "<span style=\"color: ", COLORS[i % len( COLORS )], "\">&#9632; ", escape( label ), "</span>" ]
+    parts.append( "</div>" )
+
+    parts += [ "<svg xmlns=\"http://www.w3.org/2000/svg\" width=\"", str( width ), "\" height=\"", str( height ), "\">",
+               "<line x1=\"", str( left ), "\" y1=\"", str( height - bottom ), "\" x2=\"", str( width - pad ), "\" y2=\"",
+               str( height - bottom ), "\" stroke=\"#888\"/>",
+               "<line x1=\"", str( left ), "\" y1=\"", str( pad ), "\" x2=\"", str( left ), "\" y2=\"", str( height - bottom ),
+               "\" stroke=\"#888\"/>",
+               "<text x=\"", str( left - 4 ), "\" y=\"", str( pad + 10 ), "\" font-size=\"11\" text-anchor=\"end\">",
+               format( top ), unit, "</text>",
+               "<text x=\"", str( left - 4 ), "\" y=\"", str( height - bottom ), "\" font-size=\"11\" text-anchor=\"end\">0</text>",
+               "<text x=\"", str( width - pad ), "\" y=\"", str( height - 4 ), "\" font-size=\"11\" text-anchor=\"end\">",
+               str( int( right ) ), "s</text>" ]
+
+    for i, ( label, ys ) in enumerate( series ):
+        parts += [ "<polyline fill=\"none\" stroke-width=\"1.5\" stroke=\"", COLORS[i % len( COLORS )], "\" points=\"",
+                   " ".join( [ point( x, y ) for x, y in zip( xs, ys ) ] ), "\"/>" ]
+
+    parts.append( "</svg>" )
+
+    return ''.join( parts )
+
+
+
+def table( header, rows ):
+    """Draws an HTML table. Floats are shown to 3 places.
+
+    :param header: List of column names.
+    :param rows: List of rows.
+    :returns: String of HTML.
+    """
+    parts = [ "<table><tr>" ] + [ ''.join( [ "<th>", escape( h ), "</th>" ] ) for h in header ] + [ "</tr>" ]
+
+    for r in rows:
+        parts.append( "<tr>" )
+        for x in r:
+            if isinstance( x, float ):
+                x = format( x, 3 )
+            parts += [ "<td>", escape( x if isinstance( x, type( u"" ) ) else str( x ) ), "</td>" ]
+        parts.append( "</tr>" )
+
+    parts.append( "</table>" )
+
+    return ''.join( parts )
+
+
+
+def cell( x ):
+    """Prepares a value for the csv module, which only takes UTF-8 bytes for text on Python 2.
+
+    :param x: The value.
+    :returns: The value to write.
+    """
+    if sys.version_info[0] < 3 and isinstance( x, type( u"" ) ):
+        return x.encode( 'utf-8' )
+
+    return x
+
+
+
+def escape( s ):
+    """Escapes text for HTML.
+
+    :param s: String
+    :returns: String
+    """
+    return s.replace( "&", "&amp;" ).replace( "<", "&lt;" ).replace( ">", "&gt;" ).replace( "\"", "&quot;" )
+
+
+
+def timestamp( t ):
+    """Formats a UNIX timestamp for the report.
+
+    :param t: UNIX timestamp.
+    :returns: String
+    """
+    return datetime.datetime.fromtimestamp( t ).strftime( "%Y-%m-%d %H:%M:%S" )
+
+
+
+def fromPool( pool ):
+    """Writes the end of run report for a pool into its log directory, if it kept a results file and ``runreport``
+    isn't turned off. Called once the pool has stopped. A report that can't be written is logged rather than ending the
+    run with an error.
+
+    :param pool: The :class:`~sw.pool.Pool`.
+    :returns: Filename of the HTML report, or None.
+    """
+    if pool.results is None or not pool.options.get( 'runreport', True ):
+        return None
+
+    pool.results.flush( )
+
+    start = time.time( )
+    try:
+        fn = RunReport( pool.results.fn ).build( ).write( pool.log )
+    except Exception as e:
+        pool.logMsg( ''.join( [ "Failed to write run report: ", str( e ), "\n", traceback.format_exc( ) ] ), CRITICAL )
+        return None
+
+    pool.logMsg( ''.join( [ "Wrote run report to ", fn, " (", format( time.time( ) - start ), "s)" ] ) )
+
+    return fn
+
+
+
+def main( path ):
+    """Writes the report for a finished run again. Run as ``python -m sw.runreport logs/<run>``.
+
+    :param path: The run's log directory or its results file.
+    :returns: None
+    """
+    if os.path.isdir( path ):
+        path = os.path.join( path, FILENAME )
+
+    fn = RunReport( path ).build( ).write( os.path.dirname( os.path.abspath( path ) ) )
+    sys.stdout.write( ''.join( [ "Wrote ", fn, "\n" ] ) )
+
+
+
+if __name__ == "__main__":
+    main( sys.argv[1] )
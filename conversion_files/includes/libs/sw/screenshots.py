@@ -0,0 +1,122 @@
+from sw.const import *
+import base64, os, threading, io
+
+try:
+    import Queue as Q
+except ImportError:
+    import queue as Q
+
+# Screenshots waiting to be written before taking another waits for room
+QUEUE_SIZE = 16
+
+
+
+class ScreenshotWriter:
+    """Writes a child's screenshots on a thread of its own. A failing job only has to ask the browser for the image; the
+    decoding and the write to disk happen here while the child goes on to its next job.
+
+    Each screenshot is written to a temporary name and renamed into place, so whoever sees a screenshot's file sees all
+    of it. At most :data:`QUEUE_SIZE` wait at once, past that :func:`write` waits for room rather than holding on to
+    more of them in memory.
+
+    With an :class:`~sw.artifacts.ArtifactPolicy` asking for thumbnails or JPEGs, screenshots are shrunk and converted
+    here too, with PIL. Without PIL they're written as they are and a warning is logged. The bytes written are counted
+    against the policy's budget.
+
+    :param log: Called with ( message, level ) when a screenshot can't be written, such as a child's logMsg.
+    :param None policy: The run's :class:`~sw.artifacts.ArtifactPolicy`, if it has one.
+
+    :return: ScreenshotWriter (self)
+    """
+    def __init__( self, log, policy=None ):
+        self.log = log
+        self.policy = policy
+
+        # PIL's Image module if screenshots are converted, otherwise None
+        self.image = None
+        if policy is not None and ( policy.thumbnail is not None or policy.format != "png" ):
+            try:
+                from PIL import Image
+                self.image = Image
+            except ImportError:
+                log( "PIL isn't installed, screenshots are written full size as PNG.", WARNING )
+
+        # Extension of the files we write
+        self.extension = ".jpg" if self.image is not None and policy.format == "jpeg" else ".png"
+
+        # ( filename, base64 PNG ) waiting to be written, None to finish
+        self.queue = Q.Queue( QUEUE_SIZE )
+
+        self.thread = threading.Thread( target=self.run )
+        self.thread.daemon = True
+        self.thread.start( )
+
+
+
+    def write( self, fn, data ):
+        """Queues a screenshot to be written.
+
+        :param fn: Filename to write to.
+        :param data: The PNG, base64 encoded as WebDriver's get_screenshot_as_base64 returns it.
+        :returns: None
+        """
+        self.queue.put( ( fn, data ) )
+
+
+
+    def run( self ):
+        """Writes screenshots as they are queued, until :func:`close`.
+
+        :returns: None
+        """
+        while True:
+            item = self.queue.get( )
+            if item is None:
+                return
+
+            fn, data = item
+            try:
+                tmp = ''.join( [ fn, ".tmp" ] )
+                data = base64.b64decode( data )
+                if self.image is not None:
+                    data = self.convert( data )
+                with open( tmp, "wb" ) as f:
+                    f.write( data )
+                os.rename( tmp, fn )
+
+                if self.policy is not None:
+                    self.policy.spend( len( data ) )
+            except Exception as e:
+                self.log( ''.join( [ "Failed to write screenshot ", fn, ": ", str( e ) ] ), CRITICAL )
+
+
+
+    def convert( self, data ):
+        """Shrinks and converts a screenshot as the policy asks.
+
+        :param data: The PNG's bytes.
+        :returns: The new image's bytes.
+        """
+        img = self.image.open( io.BytesIO( data ) )
+
+        width = self.policy.thumbnail
+        if width is not None and img.size[0] > width:
+            img.thumbnail( ( width, int( img.size[1] * float( width ) / img.size[0] ) + 1 ) )
+
+        out = io.BytesIO( )
+        if self.policy.format == "jpeg":
+            img.convert( "RGB" ).save( out, "JPEG", quality=75 )
+        else:
+            img.save( out, "PNG", optimize=True )
+
+        return out.getvalue( )
+
+
+
+    def close( self ):
+        """Writes everything queued and stops.
+
+        :returns: None
+        """
+        self.queue.put( None )
+        self.thread.join( )
@@ -0,0 +1,426 @@
+from sw.const import *
+import json, os
+
+# Name of the events file in a run's log directory when report_file is True
+FILENAME = "events.ndjson"
+
+# Port used when a StatsD address doesn't include one
+STATSD_PORT = 8125
+
+# Most bytes put in a single StatsD datagram, small enough not to be fragmented
+DATAGRAM_SIZE = 512
+
+
+
+class Sink:
+    """Somewhere reporting events go. A :class:`~sw.report.Report` hands every batch it sends to each of its sinks from
+    its sender thread, so a sink may block while sending without holding up the pool.
+
+    A sink's own dependencies are imported when it first sends, never when the module is imported, so a sink that isn't
+    used costs nothing.
+
+    :return: Sink (self)
+    """
+    # Whether a batch that fails to send should be retried, and spooled in the meantime. Sinks that can't tell whether
+    # anything arrived, or that are only ever local, are sent each event once and never raise.
+    retry = True
+
+    def send( self, batch ):
+        """Sends a batch of events.
+
+        :param batch: List of payloads, see :func:`~sw.report.Report.send`.
+        :returns: None, raises if the batch wasn't delivered.
+        """
+        raise NotImplementedError
+
+
+
+    def disconnect( self ):
+        """Drops any connection so the next send makes a new one. Called after a failure and when reporting stops.
+
+        :returns: None
+        """
+        pass
+
+
+
+    def __str__( self ):
+        return self.__class__.__name__
+
+
+
+class FileSink( Sink ):
+    """Appends events to a local file, one JSON object per line.
+
+    :param fn: Filename, created if it doesn't exist.
+
+    :return: FileSink (self)
+    """
+    retry = False
+
+    def __init__( self, fn ):
+        self.fn = fn
+        self.f = None
+
+
+
+    def send( self, batch ):
+        if self.f is None:
+            self.f = open( self.fn, "ab" )
+
+        self.f.write( ''.join( [ ''.join( [ json.dumps( d, separators=( ',', ':' ) ), "\n" ] ) for d in batch ] ).encode( 'utf-8' ) )
+        self.f.flush( )
+
+
+
+    def disconnect( self ):
+        if self.f is not None:
+            self.f.close( )
+            self.f = None
+
+
+
+    def __str__( self ):
+        return self.fn
+
+
+
+class StatsDSink( Sink ):
+    """Sends counters and timers to a StatsD server over UDP. Nothing waits for an answer and a datagram that can't be
+    sent is dropped, so this never blocks or fails. Events become:
+
+    - ``<prefix>.jobs.started``, ``<prefix>.jobs.done``, ``<prefix>.jobs.failed``: Counters.
+    - ``<prefix>.job``: Timer of successful jobs.
+    - ``<prefix>.transaction.<name>``: Timer of successful named transactions, ``<prefix>.transaction.<name>.failed``
+      counts failures.
+    - ``<prefix>.children.started``, ``<prefix>.children.ended``: Counters.
+
+    :param host: The server's address.
+    :param STATSD_PORT port: The server's port.
+    :param "sw" prefix: Put before every metric's name.
+
+    :return: StatsDSink (self)
+    """
+    retry = False
+
+    def __init__( self, host, port=STATSD_PORT, prefix="sw" ):
+        self.address = ( host, port )
+        self.prefix = prefix
+        self.socket = None
+
+
+
+    def send( self, batch ):
+        if self.socket is None:
+            import socket
+            self.socket = socket.socket( socket.AF_INET, socket.SOCK_DGRAM )
+            self.socket.setblocking( False )
+
+        lines = [ ]
+        for d in batch:
+            lines.extend( self.metrics( d ) )
+
+        # As many lines to a datagram as fit
+        datagram = [ ]
+        size = 0
+        for line in lines:
+            if size + len( line ) + 1 > DATAGRAM_SIZE and len( datagram ) > 0:
+                self.sendDatagram( datagram )
+                datagram = [ ]
+                size = 0
+            datagram.append( line )
+            size += len( line ) + 1
+
+        if len( datagram ) > 0:
+            self.sendDatagram( datagram )
+
+
+
+    def sendDatagram( self, lines ):
+        try:
+            self.socket.sendto( '\n'.join( lines ).encode( 'utf-8' ), self.address )
+        except Exception:
+            pass
+
+
+
+    def metrics( self, d ):
+        """Turns an event into StatsD lines.
+
+        :param d: The payload.
+        :returns: List of strings.
+        """
+        type = d.get( 'type', None )
+
+        if type == R_JOB_START:
+            return [ self.metric( "jobs.started", 1, "c" ) ]
+        elif type == R_JOB_COMPLETE:
+            return [ self.metric( "jobs.done", 1, "c" ), self.metric( "job", d['timetaken'] * 1000, "ms" ) ]
+        elif type == R_JOB_FAIL:
+            return [ self.metric( "jobs.failed", 1, "c" ) ]
+        elif type == R_TRANSACTION:
+            name = ''.join( [ "transaction.", statsdName( d['name'] ) ] )
+            if d['failed']:
+                return [ self.metric( ''.join( [ name, ".failed" ] ), 1, "c" ) ]
+            return [ self.metric( name, d['timetaken'] * 1000, "ms" ) ]
+        elif type == R_NEW_CHILD:
+            return [ self.metric( "children.started", 1, "c" ) ]
+        elif type == R_END_CHILD:
+            return [ self.metric( "children.ended", 1, "c" ) ]
+
+        return [ ]
+
+
+
+    def metric( self, name, value, kind ):
+        return ''.join( [ self.prefix, ".", name, ":", str( round( value, 3 ) if kind == "ms" else value ), "|", kind ] )
+
+
+
+    def disconnect( self ):
+        if self.socket is not None:
+            self.socket.close( )
+            self.socket = None
+
+
+
+    def __str__( self ):
+        return ''.join( [ "statsd://", self.address[0], ":", str( self.address[1] ) ] )
+
+
+
+class HTTPSink( Sink ):
+    """Posts each batch to a URL as newline-delimited JSON in a single request. The connection is kept open between
+    batches. Anything but a 2xx answer is a failure.
+
+    :param url: Where to post.
+    :param False gzip: Whether to gzip the body.
+
+    :return: HTTPSink (self)
+    """
+    def __init__( self, url, gzip=False ):
+        self.url = url
+        self.gzip = gzip
+        self.http = None
+
+
+
+    def send( self, batch ):
+        try:
+            import httplib
+            from urlparse import urlparse
+        except ImportError:
+            import http.client as httplib
+            from urllib.parse import urlparse
+
+        url = urlparse( self.url )
+
+        if self.http is None:
+            if url.scheme == "https":
+                self.http = httplib.HTTPSConnection( url.hostname, url.port or self.defaultPort( url ), timeout=30 )
+            else:
+                self.http = httplib.HTTPConnection( url.hostname, url.port or self.defaultPort( url ), timeout=30 )
+
+        body = self.body( batch ).encode( 'utf-8' )
+        headers = self.headers( )
+
+        if self.gzip:
+            import zlib
+            # wbits of 31 writes a gzip header and trailer
+            z = zlib.compressobj( 6, zlib.DEFLATED, 31 )
+            body = z.compress( body ) + z.flush( )
+            headers["Content-Encoding"] = "gzip"
+
+        path = url.path if url.path not in [ "", "/" ] else self.defaultPath( )
+        if url.query:
+            path = ''.join( [ path, "?", url.query ] )
+
+        self.http.request( "POST", path, body, headers )
+        r = self.http.getresponse( )
+        text = r.read( )
+
+        if r.status < 200 or r.status >= 300:
+            raise IOError( ''.join( [ str( self ), " answered ", str( r.status ), ": ", text.decode( 'utf-8', 'replace' ) ] ) )
+
+
+
+    def body( self, batch ):
+        return '\n'.join( [ json.dumps( d, separators=( ',', ':' ) ) for d in batch ] )
+
+
+
+    def headers( self ):
+        return { "Content-Type": "application/x-ndjson" }
+
+
+
+    def defaultPort( self, url ):
+        return 443 if url.scheme == "https" else 80
+
+
+
+    def defaultPath( self ):
+        return "/"
+
+
+
+    def disconnect( self ):
+        if self.http is not None:
+            try:
+                self.http.close( )
+            except Exception:
+                pass
+            self.http = None
+
+
+
+    def __str__( self ):
+        return self.url
+
+
+
+class HECSink( HTTPSink ):
+    """Posts each batch to a Splunk HTTP Event Collector, see :class:`HTTPSink`.
+
+    :param url: The collector, /services/collector/event is used if no path is given.
+    :param token: The collector token to authenticate with.
+    :param None index: Index to put events in, the token's default if None.
+    :param False gzip: Whether to gzip the body.
+    :param True compact: Whether events leave their time to the collector's envelope, see ``report_compact``.
+
+    :return: HECSink (self)
+    """
+    def __init__( self, url, token, index=None, gzip=False, compact=True ):
+        HTTPSink.__init__( self, url, gzip )
+        self.token = token
+        self.index = index
+        self.compact = compact
+
+
+
+    def body( self, batch ):
+        events = [ ]
+        for d in batch:
+            if self.compact:
+                # The envelope carries the time
+                d = dict( d )
+                event = { 'time': d.pop( 'time' ), 'sourcetype': 'py-event', 'event': d }
+            else:
+                event = { 'time': d['time'], 'sourcetype': 'py-event', 'event': d }
+            if self.index is not None:
+                event['index'] = self.index
+            events.append( json.dumps( event, separators=( ',', ':' ) ) )
+
+        return '\n'.join( events )
+
+
+
+    def headers( self ):
+        return { "Authorization": ''.join( [ "Splunk ", str( self.token ) ] ), "Content-Type": "application/json" }
+
+
+
+    def defaultPort( self, url ):
+        return 8088
+
+
+
+    def defaultPath( self ):
+        return "/services/collector/event"
+
+
+
+class SplunkSink( Sink ):
+    """Submits each batch to a Splunk index through the management port with splunklib, one event per line. The
+    connection is made on the first send and kept.
+
+    :param host: The Splunk server.
+    :param port: Its management port.
+    :param user: Username, must be allowed to submit to the index.
+    :param password: Password for the username.
+    :param index: The index to submit to.
+
+    :return: SplunkSink (self)
+    """
+    def __init__( self, host, port, user, password, index ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.index = index
+
+        # The index we submit to, once connected
+        self.target = None
+
+
+
+    def send( self, batch ):
+        if self.target is None:
+            import splunklib.client as client
+            splunk = client.connect( host=self.host,
+                    port=self.port,
+                    username=self.user,
+                    password=self.password )
+            self.target = splunk.indexes[self.index]
+
+        self.target.submit( '\n'.join( [ json.dumps( d, separators=( ',', ':' ) ) for d in batch ] ), sourcetype='py-event' )
+
+
+
+    def disconnect( self ):
+        self.target = None
+
+
+
+    def __str__( self ):
+        return ''.join( [ "splunk://", str( self.host ), ":", str( self.port ) ] )
+
+
+
+def statsdName( name ):
+    """Makes a transaction name safe to use in a StatsD metric's name.
+
+    :param name: The name.
+    :returns: String of letters, numbers, underscores, and dashes.
+    """
+    return ''.join( [ c if c.isalnum( ) or c in "_-" else "_" for c in name ] )
+
+
+
+def fromOptions( options, log ):
+    """Builds the sinks a run reports to from its options: ``report`` (or ``report_hec``), ``report_http``,
+    ``report_file``, and ``report_statsd``. Any number may be set at once.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :param log: The run's log directory, None if there isn't a run.
+    :returns: List of :class:`Sink`, empty if reporting is off.
+    """
+    sinks = [ ]
+
+    if options.get( 'report_hec', None ) is not None:
+        sinks.append( HECSink( options['report_hec'], options.get( 'report_token', None ), options.get( 'report_index', None ),
+                               options.get( 'report_gzip', False ), options.get( 'report_compact', True ) ) )
+    elif options.get( 'report', None ) is not None:
+        sinks.append( SplunkSink( options['report'], options.get( 'report_port', 8089 ), options.get( 'report_user', None ),
+                                  options.get( 'report_pass', None ), options.get( 'report_index', None ) ) )
+
+    if options.get( 'report_http', None ) is not None:
+        sinks.append( HTTPSink( options['report_http'], options.get( 'report_gzip', False ) ) )
+
+    fn = options.get( 'report_file', None )
+    if fn is not None and fn is not False:
+        if fn is True:
+            fn = FILENAME
+        if log is not None:
+            fn = os.path.join( log, fn )
+        sinks.append( FileSink( fn ) )
+
+    addr = options.get( 'report_statsd', None )
+    if addr is not None and addr is not False:
+        host, port = str( addr ), STATSD_PORT
+        if ":" in host:
+            host, port = host.rsplit( ":", 1 )
+            port = int( port )
+        sinks.append( StatsDSink( host, port, options.get( 'report_statsd_prefix', "sw" ) ) )
+
+    return sinks
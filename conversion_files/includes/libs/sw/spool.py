@@ -0,0 +1,285 @@
+from sw.const import *
+import json, os, sys, time
+
+# Segment files are named with this prefix, their sequence number, and this suffix
+PREFIX = "segment-"
+SUFFIX = ".jsonl"
+
+# Bytes written to a segment before the next one is started
+SEGMENT_SIZE = 1024 * 1024
+
+# File holding the segment and offset replay has got to, so nothing is sent twice after a restart
+POSITION = "position"
+
+# Name of the spool directory in a run's log directory
+DIRNAME = "spool"
+
+
+
+class Spool:
+    """A queue of reporting events kept on disk, for when they can't be delivered. Events are appended one JSON object
+    per line to segment files in *directory* and read back in the order they were added. Only the batch being read is
+    held in memory, so an outage of any length costs disk rather than memory.
+
+    A segment is written until it reaches *segmentSize* bytes, then the next is started. Replay reads from the oldest
+    segment and deletes it once everything in it has been delivered. How far replay has got is kept in the directory too,
+    so a spool left behind by a run can be picked up by another :class:`Spool` (see :func:`main`) without sending
+    anything twice. A line cut short by a crash is skipped.
+
+    :param directory: Directory of segment files, created when the first event is added if it doesn't exist.
+    :param SEGMENT_SIZE segmentSize: Bytes written to a segment before starting another.
+
+    :return: Spool (self)
+    """
+    def __init__( self, directory, segmentSize=SEGMENT_SIZE ):
+        self.directory = directory
+        self.segmentSize = segmentSize
+
+        # Sequence numbers of segments on disk, oldest first
+        self.segments = [ ]
+        if os.path.isdir( directory ):
+            self.segments = sorted( int( fn[len( PREFIX ):-len( SUFFIX )] ) for fn in os.listdir( directory )
+                                    if fn.startswith( PREFIX ) and fn.endswith( SUFFIX ) )
+
+        # Where replay is in the oldest segment, and where it will be once what was last read is delivered
+        self.offset = 0
+        self.next = 0
+
+        if len( self.segments ) > 0 and os.path.exists( self.path( POSITION ) ):
+            with open( self.path( POSITION ) ) as f:
+                segment, offset = [ int( x ) for x in f.read( ).split( ) ]
+            while len( self.segments ) > 0 and self.segments[0] < segment:
+                os.remove( self.segment( self.segments.pop( 0 ) ) )
+            if len( self.segments ) > 0 and self.segments[0] == segment:
+                self.offset = offset
+
+        # The segment being appended to
+        self.f = None
+
+        # Events appended and delivered through this spool
+        self.appended = 0
+        self.delivered = 0
+
+
+
+    def path( self, fn ):
+        return os.path.join( self.directory, fn )
+
+
+
+    def segment( self, n ):
+        return self.path( ''.join( [ PREFIX, str( n ).zfill( 6 ), SUFFIX ] ) )
+
+
+
+    def append( self, payloads ):
+        """Adds events to the end of the spool.
+
+        :param payloads: List of dicts.
+        :returns: None
+        """
+        if len( payloads ) == 0:
+            return
+
+        if not os.path.isdir( self.directory ):
+            os.makedirs( self.directory )
+
+        if self.f is None:
+            # Never add to a segment a crash might have cut short
+            n = self.segments[-1] + 1 if len( self.segments ) > 0 else 1
+            self.segments.append( n )
+            self.f = open( self.segment( n ), "ab" )
+
+        self.f.write( ''.join( [ ''.join( [ json.dumps( p ), "\n" ] ) for p in payloads ] ).encode( 'utf-8' ) )
+        self.f.flush( )
+        self.appended += len( payloads )
+
+        if self.f.tell( ) >= self.segmentSize:
+            self.f.close( )
+            self.f = None
+
+
+
+    def read( self, n ):
+        """Reads the oldest events not yet delivered. They stay in the spool until :func:`consume` is called.
+
+        :param n: Most events to read.
+        :returns: List of dicts, empty if there's nothing left.
+        """
+        payloads = [ ]
+
+        while len( self.segments ) > 0:
+            writing = self.f is not None and self.segments[0] == self.segments[-1]
+
+            with open( self.segment( self.segments[0] ), "rb" ) as f:
+                f.seek( self.offset )
+                self.next = self.offset
+                while len( payloads ) < n:
+                    line = f.readline( )
+                    if not line.endswith( b"\n" ):
+                        break
+                    self.next += len( line )
+                    try:
+                        payloads.append( json.loads( line.decode( 'utf-8' ) ) )
+                    except ValueError:
+                        pass
+                done = len( payloads ) < n
+
+            if len( payloads ) > 0 or writing or not done:
+                return payloads
+
+            # Nothing left in this segment and nothing more will be added to it
+            self.drop( )
+
+        return payloads
+
+
+
+    def consume( self, n ):
+        """Removes the events last returned by :func:`read`, once they've been delivered.
+
+        :param n: Number of events that were read.
+        :returns: None
+        """
+        self.offset = self.next
+        self.delivered += n
+
+        with open( self.path( POSITION ), "w" ) as f:
+            f.write( ''.join( [ str( self.segments[0] ), " ", str( self.offset ) ] ) )
+
+        if self.f is not None and self.segments[0] == self.segments[-1] and self.offset >= self.f.tell( ):
+            # Caught up with the writer, start afresh
+            self.f.close( )
+            self.f = None
+            self.drop( )
+
+
+
+    def drop( self ):
+        """Deletes the oldest segment.
+
+        :returns: None
+        """
+        os.remove( self.segment( self.segments.pop( 0 ) ) )
+        self.offset = 0
+        self.next = 0
+
+        if len( self.segments ) == 0 and os.path.exists( self.path( POSITION ) ):
+            os.remove( self.path( POSITION ) )
+
+
+
+    def pending( self ):
+        """Finds if there's anything in the spool to be delivered.
+
+        :returns: Boolean
+        """
+        return len( self.segments ) > 0
+
+
+
+    def size( self ):
+        """Finds roughly how much is waiting to be delivered.
+
+        :returns: Integer, bytes.
+        """
+        return sum( os.path.getsize( self.segment( n ) ) for n in self.segments ) - self.offset
+
+
+
+    def close( self ):
+        """Closes the segment being written. Anything not delivered is left on disk.
+
+        :returns: None
+        """
+        if self.f is not None:
+            self.f.close( )
+            self.f = None
+
+
+
+def fromOptions( options, log ):
+    """Opens the reporting spool for a run, see the ``report_spool`` options.
+
+    :param options: Dict of kwargs passed to our wrapper.
+    :param log: The run's log directory.
+    :returns: :class:`Spool`, or None if events aren't spooled.
+    """
+    if not options.get( 'report_spool', True ):
+        return None
+
+    return Spool( os.path.join( log, DIRNAME ), options.get( 'report_spoolsize', SEGMENT_SIZE ) )
+
+
+
+class Uploader:
+    """Stands in for a pool when uploading a spool after a run, so a :class:`~sw.report.Report` can be made with just
+    reporting options.
+
+    :param options: Dict of the reporting options, as they would be passed to the wrapper.
+
+    :return: Uploader (self)
+    """
+    def __init__( self, options ):
+        self.options = options
+        self.options['report_spool'] = False
+
+        # There's no run going, so no log directory
+        self.log = None
+
+
+
+    def func( self ):
+        pass
+
+
+
+    def logMsg( self, msg, level=NOTICE ):
+        if level < NOTICE:
+            return
+
+        if isinstance( msg, list ):
+            msg = ''.join( [ str( m ) for m in msg ] )
+        sys.stdout.write( ''.join( [ msg, "\n" ] ) )
+
+
+
+def main( args ):
+    """Sends the events left in a run's spool to the reporting server. Run as
+    ``python -m sw.spool logs/<run> report=host report_user=... report_pass=... report_index=...``, or with
+    ``report_hec=... report_token=...``. The options are the same as a script's reporting options.
+
+    :param args: The run's log directory or its spool, then the options as name=value.
+    :returns: None
+    """
+    from sw.report import Report
+
+    path = args[0]
+    if os.path.isdir( os.path.join( path, DIRNAME ) ):
+        path = os.path.join( path, DIRNAME )
+
+    options = { }
+    for a in args[1:]:
+        name, value = a.split( "=", 1 )
+        try:
+            value = json.loads( value )
+        except ValueError:
+            pass
+        options[name] = value
+
+    spool = Spool( path )
+    report = Report( Uploader( options ) )
+
+    if not report.enabled:
+        raise ValueError( "Nowhere to upload to, set report or report_hec." )
+
+    sent = report.upload( spool )
+    spool.close( )
+
+    sys.stdout.write( ''.join( [ "Uploaded ", str( sent ), " event(s), ", str( spool.size( ) if spool.pending( ) else 0 ),
+                                 " byte(s) left in ", path, "\n" ] ) )
+
+
+
+if __name__ == "__main__":
+    main( sys.argv[1:] )
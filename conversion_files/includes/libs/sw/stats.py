@@ -0,0 +1,272 @@
+class Histogram:
+    """A log-linear (HDR-style) histogram of times. Recording a time, and reading the count, mean, max, or any percentile
+    from it, costs the same no matter how many times have been recorded, and its memory is bounded by the range of times
+    rather than how many there are. This lets multi-hour runs keep latency percentiles without storing every job time.
+
+    Times are counted in units of *resolution* seconds. Each power of two is split into :attr:`SUB_BUCKETS` linear buckets,
+    so any time reported back (such as by :func:`percentile`) is within about 1.6% of what was recorded. A one hour job
+    lands in roughly the 1,400th bucket; self.counts only grows as far as the largest time recorded.
+
+    Histograms are mergeable: adding one to another with :func:`merge` gives exactly what recording both sets of times into a
+    single histogram would have. This is how per child histograms roll up into the pool's and how histograms are combined
+    across machines.
+
+    :param 0.0001 resolution: Smallest difference in seconds that is distinguished.
+
+    :return: Histogram (self)
+    """
+    SUB_BUCKETS = 64
+
+    def __init__( self, resolution=0.0001 ):
+        self.resolution = resolution
+
+        # Number of recorded times in each bucket, indexed by :func:`index`
+        self.counts = [ ]
+
+        # Running totals
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+
+    def record( self, t, count=1 ):
+        """Records a time into the histogram.
+
+        :param t: The time to record in seconds. Negative times are recorded as 0.
+        :param 1 count: The number of times to record it.
+        :return: None
+        """
+        if t < 0:
+            t = 0
+
+        i = self.index( int( t / self.resolution ) )
+
+        if i >= len( self.counts ):
+            self.counts.extend( [ 0 ] * ( i + 1 - len( self.counts ) ) )
+
+        self.counts[i] += count
+        self.count += count
+        self.total += t * count
+
+        if t > self.max:
+            self.max = t
+
+
+
+    def index( self, units ):
+        """Translates a number of units into its bucket index. The first 2 * :attr:`SUB_BUCKETS` units have a bucket
+        each, after that every power of two is split into :attr:`SUB_BUCKETS` buckets.
+
+        :param units: Positive integer number of units (time / resolution).
+        :return: Integer index into self.counts.
+        """
+        if units < 2 * self.SUB_BUCKETS:
+            return units
+
+        shift = units.bit_length( ) - self.SUB_BUCKETS.bit_length( )
+        return shift * self.SUB_BUCKETS + ( units >> shift )
+
+
+
+    def value( self, i ):
+        """Translates a bucket index back into a time, the middle of the range of times the bucket holds.
+
+        :param i: Integer bucket index.
+        :return: Float time in seconds.
+        """
+        shift = i // self.SUB_BUCKETS - 1
+        if shift <= 0:
+            return i * self.resolution
+
+        low = ( i - shift * self.SUB_BUCKETS ) << shift
+        return ( low + ( ( 1 << shift ) - 1 ) / 2.0 ) * self.resolution
+
+
+
+    def percentile( self, p ):
+        """Finds the time which *p* percent of recorded times are at or below.
+
+        :param p: The percentile, 0-100.
+        :return: Float time in seconds, 0 if nothing has been recorded.
+        """
+        if self.count == 0:
+            return 0.0
+
+        if p >= 100:
+            return self.max
+
+        target = max( 1, int( round( self.count * p / 100.0 ) ) )
+        seen = 0
+        for i in range( len( self.counts ) ):
+            seen += self.counts[i]
+            if seen >= target:
+                return min( self.value( i ), self.max )
+
+        return self.max
+
+
+
+    def mean( self ):
+        """Averages all recorded times. Handles an empty histogram.
+
+        :return: Float time in seconds.
+        """
+        if self.count == 0:
+            return 0.0
+
+        return self.total / self.count
+
+
+
+    def cumulative( self, bounds ):
+        """Counts the recorded times at or below each of a list of bounds, as Prometheus histogram buckets do. Costs the
+        same no matter how many times have been recorded.
+
+        :param bounds: Ascending list of times in seconds.
+        :return: List of counts, one per bound.
+        """
+        counts = [ ]
+        seen = 0
+        i = 0
+
+        for b in bounds:
+            while i < len( self.counts ) and self.value( i ) <= b:
+                seen += self.counts[i]
+                i += 1
+            counts.append( seen )
+
+        return counts
+
+
+
+    def merge( self, other ):
+        """Adds every time recorded in another histogram with the same resolution into this one.
+
+        :param other: The :class:`Histogram` to add.
+        :return: Histogram (self)
+        """
+        if len( other.counts ) > len( self.counts ):
+            self.counts.extend( [ 0 ] * ( len( other.counts ) - len( self.counts ) ) )
+
+        for i in range( len( other.counts ) ):
+            self.counts[i] += other.counts[i]
+
+        self.count += other.count
+        self.total += other.total
+        self.max = max( self.max, other.max )
+
+        return self
+
+
+
+    def copy( self ):
+        """Copies the histogram so it can be compared against later with :func:`diff`.
+
+        :return: Histogram
+        """
+        h = Histogram( self.resolution )
+        h.counts = list( self.counts )
+        h.count = self.count
+        h.total = self.total
+        h.max = self.max
+
+        return h
+
+
+
+    def diff( self, earlier ):
+        """Finds what has been recorded since this histogram was copied. The max is this histogram's, as the max of
+        only the newer times isn't known.
+
+        :param earlier: A :func:`copy` of this histogram taken earlier.
+        :return: Histogram of the times recorded since.
+        """
+        h = Histogram( self.resolution )
+        h.counts = [ c - ( earlier.counts[i] if i < len( earlier.counts ) else 0 ) for i, c in enumerate( self.counts ) ]
+        h.count = self.count - earlier.count
+        h.total = self.total - earlier.total
+        h.max = self.max
+
+        return h
+
+
+
+    def toDict( self ):
+        """Encodes the histogram in a compact, JSON friendly form. Only buckets with something in them are included.
+
+        :return: Dict which :func:`fromDict` can turn back into a Histogram.
+        """
+        return { 'resolution': self.resolution,
+                 'total': self.total,
+                 'max': self.max,
+                 'counts': [ [ i, c ] for i, c in enumerate( self.counts ) if c > 0 ] }
+
+
+
+    @classmethod
+    def fromDict( cls, d ):
+        """Decodes a histogram encoded with :func:`toDict`.
+
+        :param d: Dict from :func:`toDict`.
+        :return: Histogram
+        """
+        h = cls( d['resolution'] )
+
+        for i, c in d['counts']:
+            if i >= len( h.counts ):
+                h.counts.extend( [ 0 ] * ( i + 1 - len( h.counts ) ) )
+            h.counts[i] += c
+            h.count += c
+
+        h.total = d['total']
+        h.max = d['max']
+
+        return h
+
+
+
+class Stats:
+    """Running job counters with a :class:`Histogram` of successful job times. Kept for the pool as a whole so that
+    the UI can read totals without walking every child.
+
+    :return: Stats (self)
+    """
+    def __init__( self ):
+        self.successes = 0
+        self.failures = 0
+        self.times = Histogram( )
+
+
+
+    def success( self, t ):
+        """Records a successful job.
+
+        :param t: Time in seconds the job took.
+        :return: None
+        """
+        self.successes += 1
+        self.times.record( t )
+
+
+
+    def failure( self ):
+        """Records a failed job.
+
+        :return: None
+        """
+        self.failures += 1
+
+
+
+    def merge( self, other ):
+        """Adds another set of stats into this one.
+
+        :param other: The :class:`Stats` to add.
+        :return: Stats (self)
+        """
+        self.successes += other.successes
+        self.failures += other.failures
+        self.times.merge( other.times )
+
+        return self
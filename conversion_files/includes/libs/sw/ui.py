@@ -42,6 +42,9 @@ class Ui:
 
         self.screenUpdateTime = 0.1 
 
+        # Longest the main loop waits on the pool before checking for key presses
+        self.keyTime = 0.05
+
         # Dimensions and subwindow for statistics section
         self.STATS_HEIGHT  = 7
         self.STATS_WIDTH   = self.x( )-2
@@ -112,14 +115,15 @@ class Ui:
     def think( self ):
         """Calls several other functions which need to be checked constantly. Includes
            :func:`updateStats`, :func:`updateKeys`, and :func:`updateMain`. 
-           The last one is called every time think is, while the other two are called every 
-           self.nextUpdate seconds.
+           These are called every self.screenUpdateTime seconds while key presses are handled
+           every time think is.
 
            :returns: None
         """
-        self.updateMain( )
+        self.handleKeys( )
         if time.time( ) >= self.nextUpdate:
             self.nextUpdate = time.time( ) + self.screenUpdateTime
+            self.updateMain( )
             self.updateStats( )
             self.updateKeys( )
 
@@ -137,16 +141,27 @@ class Ui:
         end = amount + time.time( )
         while time.time( ) < end:
             time.sleep( 0.01 )
+            self.handleKeys( )
+
+
+
+    def handleKeys( self ):
+        """Reads every key pressed since the last call and acts on them. Does not wait for a key press.
+
+           :returns: None
+        """
+        while True:
             key = self.scr.getch( )
 
             # Catch keys which do nothing
-            if key == -1 and len( self.keys ) > 0:
-                clear = [ "p", "q", "s", "+", "-" ]
-                for c in clear:
-                    if c in self.keys:
-                        del self.keys[:]
-                        break
-                continue
+            if key == -1:
+                if len( self.keys ) > 0:
+                    clear = [ "p", "q", "s", "+", "-" ]
+                    for c in clear:
+                        if c in self.keys:
+                            del self.keys[:]
+                            break
+                return
             elif key == curses.KEY_ENTER:
                 del self.keys[:]
                 continue
@@ -184,6 +199,15 @@ class Ui:
 
 
 
+    def flash( self ):
+        """Flashes the screen, called by the pool when a job fails.
+
+           :returns: None
+        """
+        curses.flash( )
+
+
+
     def handleCommandKeys( self, key ):
         """Part of our :func:`sleep` function which checks if any of our accepted keys
         are pressed. It handles the logic for interpreting presses while recording and
@@ -230,12 +254,9 @@ class Ui:
                 ##Now do operations specific to each command
                 if "j" in self.keys:
                     if "+" in self.keys:
-                        for i in range(num):
-                            self.pool.workQueue.put( self.pool.func )
+                        self.pool.workQueue.put( num )
                     if "-" in self.keys:
-                        for i in range(num):
-                            if not self.pool.workQueue.empty( ):
-                                self.pool.workQueue.get( False, False )
+                        self.pool.workQueue.take( num )
                 elif "c" in self.keys:
                     if "+" in self.keys:
                         for i in range(num):
@@ -264,10 +285,7 @@ class Ui:
                 continue
             s = ''.join( [ "#", str( c.num + 1 ) ] )
 
-            if type( self.pool.data[c.num][DISPLAY] ) == int:
-                self.main.addstr( y, x, s, curses.color_pair( self.pool.data[c.num][DISPLAY] ) )
-            else:
-                self.main.addstr( y, x ,s )
+            self.main.addstr( y, x, s, curses.color_pair( int( self.pool.board.get( c.num, B_DISPLAY ) ) ) )
 
             y += 2 # Scoot down two lines for each number
             if y > self.y( ) - self.STATS_HEIGHT - 4:
@@ -289,8 +307,9 @@ class Ui:
         jpstr = None
         t = time.time( )
 
-        this = [ len( self.pool.children ), self.pool.successful( ) + self.pool.failed( ), self.pool.workQueue.qsize( ) ]
-        if self.last[0] != this[0] or self.last[1] != this[1] or self.last[2] != this[2]: 
+        this = [ len( self.pool.children ), self.pool.successful( ) + self.pool.failed( ), self.pool.workQueue.qsize( ),
+                 sum( [ x.successes + x.failures for x in self.pool.transactions.values( ) ] ) ]
+        if self.last != this: 
             # Store this for next time
             self.last = this
 
@@ -310,6 +329,16 @@ class Ui:
             # Number of Jobs Left
             statstrs.append( ''.join( [ "Jobs Left: ", str( self.pool.workQueue.qsize( ) ) ] ) )
 
+            # Where we are in our load profile
+            if len( self.pool.profile.stages ) > 1:
+                stage = self.pool.profile.stages[self.pool.stage]
+                statstrs.append( ''.join( [ "Stage: ", stage[2], " (", str( stage[1] ), ")" ] ) )
+
+            # Open loop starts that were missed and how late the rest were
+            if self.pool.rate is not None:
+                statstrs.append( ''.join( [ "Missed: ", str( self.pool.missed ) ] ) )
+                statstrs.append( ''.join( [ "Lag p99: ", format( self.pool.startLag.percentile( 99 ) ), "s" ] ) )
+
             # Number of Jobs Successful
             statstrs.append( ''.join( [ "Successful: ", str( self.pool.successful( ) ) ] ) )
 
@@ -319,12 +348,17 @@ class Ui:
 
             # Average Job Time
             times = self.pool.timeTaken( )
-            avgtime = avg( times )
+            avgtime = times.mean( )
             statstrs.append( ''.join( [ "Avg Job: ", format( avgtime ), "s" ] ) )
-            totaltime = sum( times )
+            totaltime = times.total
+
+            # Job Time Percentiles
+            for p in [ 50, 95, 99 ]:
+                statstrs.append( ''.join( [ "p", str( p ), ": ", format( times.percentile( p ) ), "s" ] ) )
+            statstrs.append( ''.join( [ "Max: ", format( times.max ), "s" ] ) )
 
             # Jobs per minute
-            if len( times ) > 0:
+            if times.count > 0:
                 jps_ideal = ( 1 / avgtime ) * numactive
 
                 if jps_ideal < 0.25 and jps_ideal > 0:
@@ -332,7 +366,7 @@ class Ui:
                 elif jps_ideal > 0:
                     jpstr = ''.join( [ "Ideal JPS: ", format( jps_ideal ) ] )
 
-            if len( times ) > 5 and totaltime > 0 and ( time.time( ) - self.pool.started ) > 0:
+            if times.count > 5 and totaltime > 0 and ( time.time( ) - self.pool.started ) > 0:
                 jps_true = self.pool.successful( ) / ( time.time( ) - self.pool.started )
 
                 if jps_true < 0.25:
@@ -344,6 +378,10 @@ class Ui:
             if jpstr is not None:
                 statstrs.append( jpstr )
 
+            # Named transactions, the slowest part of a job is what we're after
+            for name, x in self.pool.transactions.items( ):
+                statstrs.append( ''.join( [ name, " p95: ", format( x.times.percentile( 95 ) ), "s (", str( x.failures ), " failed)" ] ) )
+
             adj = 2 # Amount we are shifting right in characters
             k = 0   # Amount we are shifting vertically
             for st in statstrs:
@@ -60,7 +60,7 @@ def exists( driver, element, type, **kwargs ):
             elif type == "css_selector":
                 e = driver.find_element_by_css_selector( element )
         except Exception as e:
-            driver.child.logMsg( ''.join( [ "Error received when checking for existence: ", str( e ) ] ), DEBUG )
+            driver.child.logMsg( [ "Error received when checking for existence: ", str( e ) ], DEBUG )
             return False
 
     if cache:
@@ -91,6 +91,9 @@ def sleepwait( driver, element, type, **kwargs ):
          * **quiet** -- Whether to print errors on failure.
        :return: Boolean if doesn't exist, :py:class:`~selenium.webdriver.remote.webelement.WebElement` if it does.
     """
+    # Any think time at this step comes before we start timing the wait
+    driver.child.step( )
+
     start        = time.time( )
     timeout      = kwargs.get( 'timeout', driver.child.options.get( 'elementwaittimeout', 15 ) )
     lightConfirm = kwargs.get( 'lightConfirm', driver.child.options.get( 'lightconfirm', False ) )
@@ -104,7 +107,7 @@ def sleepwait( driver, element, type, **kwargs ):
     
     e = exists( driver, element, type, url=url, cache=cache, lightConfirm=lightConfirm )
     if not e:
-        driver.child.logMsg( ''.join( [ "Beginning wait for element \"", element, "\" of type \"", type, "\"." ] ), NOTICE )
+        driver.child.logMsg( [ "Beginning wait for element \"", element, "\" of type \"", type, "\"." ], NOTICE )
 
         while not e:
             if time.time( ) - start > timeout: 
@@ -114,18 +117,25 @@ def sleepwait( driver, element, type, **kwargs ):
             e = exists( driver, element, type, url=url, cache=cache, lightConfirm=lightConfirm )
         else:
             driver.child.display( DISP_GOOD ) 
+            driver.child.pageLoaded( )
             return e 
     else:
         driver.child.display( DISP_GOOD )
+        driver.child.pageLoaded( )
         return e
 
+    message = ''.join( [  "Element ", element, " not found within timeout ", str(timeout), "s." ] )
+
+    # When everything is failing the same way only some failures get our locals dumped, see sw.artifacts
+    dump = locals( ) if ( die or not quiet ) and driver.child.detailed( message ) else None
+
     if not quiet:
         driver.child.logMsg( ''.join( [ "Element will not be found on page \"", 
-            driver.current_url, "\"." ] ), CRITICAL, locals=locals( ) )
+            driver.current_url, "\"." ] ), CRITICAL, locals=dump )
 
     if die:
-        driver.child.logMsg( "Child will now terminate.", CRITICAL, locals=locals( ) )
-        raise TimeoutException( ''.join( [  "Element ", element, " not found within timeout ", str(timeout), "s." ] ) )
+        driver.child.logMsg( "Child will now terminate.", CRITICAL, locals=dump )
+        raise TimeoutException( message )
         # Wait to be killed
     return False
 
@@ -205,7 +215,7 @@ def waitToDisappear( driver, element, **kwargs ):
             return
         else:
             if not recur:
-                driver.child.logMsg( ''.join( [ "Waiting for \"", element, "\"." ] ), NOTICE )
+                driver.child.logMsg( [ "Waiting for \"", element, "\"." ], NOTICE )
             driver.child.display( DISP_WAIT )
             time.sleep( thinkTime )
 
@@ -214,17 +224,20 @@ def waitToDisappear( driver, element, **kwargs ):
 
         while exists( driver, element, type, **kwargs ):
             if time.time( ) - start > timeout:
+                message = ''.join( [ "Element ", element, " didn't disappear within timeout", str(timeout), "s." ] )
+                dump = locals( ) if driver.child.detailed( message ) else None
+
                 driver.child.logMsg( ''.join( [ "Element did not disappear within ", str( timeout ), "s, timed out." ] ), 
-                        CRITICAL, locals=locals( ) )
+                        CRITICAL, locals=dump )
                 if die:
-                    driver.child.logMsg( "Child will now terminate.", CRITICAL, locals=locals( ) )
+                    driver.child.logMsg( "Child will now terminate.", CRITICAL, locals=dump )
                     driver.child.flush( )
-                    raise TimeoutException( ''.join( [ "Element ", element, " didn't disappear within timeout", str(timeout), "s." ] ) ) 
+                    raise TimeoutException( message ) 
 
                 break #this skips the else
             time.sleep( thinkTime )
         else:
-            driver.child.logMsg( ''.join( [ "Element \"", element, "\" disappeared!" ] ), INFO )
+            driver.child.logMsg( [ "Element \"", element, "\" disappeared!" ], INFO )
 
             if stayGone > 0:
                 w = stayGone + time.time( )
@@ -1,18 +1,48 @@
 from sw.pool import Pool
 from sw.ui import Ui
-from sw.initialsettings import InitialSettings
-import sys, time, curses
+from sw.headless import Headless
+from sw.distributed import Coordinator, Worker, local
+from sw.initialsettings import InitialSettings, applyDefaults
+from sw.const import * # Constants
+import sw.runreport
+import sys, time, curses, json, ast
 
 
 def main( func, file, **kwargs ):
     """ Is called from our wrapped script. Parses any arguments passed to our script from the command
         line and then starts and manages our pool.
 
+        Options are layered, with later sources overriding earlier ones: the kwargs from the script's
+        options header, then a JSON config file (``config=file.json``), then ``key=value`` arguments from the command
+        line. If ``headless`` is set the curses console is skipped entirely, see :func:`headlessMain`. A run can also be
+        spread across machines, see :mod:`sw.distributed`: ``coordinator`` hands work out and ``worker`` takes it, or
+        ``localworkers`` runs both on this machine.
+
         :param func: The function that will be ran continously to simulate load.
         :param file: Usually __file__, the name of a script in the directory that log/ will be in.
         :returns: None
     """
-    # Get options and defaults 
+    args = parseArgs( sys.argv[1:] )
+
+    config = args.get( 'config', kwargs.get( 'config', None ) )
+    if config is not None:
+        kwargs.update( loadConfig( config ) )
+
+    kwargs.update( args )
+
+    if kwargs.get( 'localworkers', False ):
+        sys.exit( local( func, file, kwargs ) )
+
+    if kwargs.get( 'coordinator', False ):
+        sys.exit( Coordinator( kwargs ).run( ) )
+
+    if kwargs.get( 'worker', False ):
+        sys.exit( Worker( func, file, kwargs, args ).run( ) )
+
+    if kwargs.get( 'headless', False ):
+        sys.exit( headlessMain( func, file, kwargs ) )
+
+    # Get options and defaults
     curses.wrapper( InitialSettings, kwargs )
 
     pool = Pool( func, file, kwargs )
@@ -21,11 +51,18 @@ def main( func, file, **kwargs ):
 
     pool.stop( )
 
+    if pool.error is not None:
+        sys.stdout.write( ''.join( [ pool.error, "\n" ] ) )
+
+    fn = sw.runreport.fromPool( pool )
+    if fn is not None:
+        sys.stdout.write( ''.join( [ "Report: ", fn, "\n" ] ) )
+
 
 
 def mainLoop( stdscr, pool ):
-    """Takes the pool created previously and just loops around it. Currently it just calls the pool's
-        think function repeatedly.
+    """Takes the pool created previously and just loops around it. The pool's think function waits on its
+        children, but never so long that key presses go unanswered.
 
         :param stdscr: Our screen from curses.
         :param pool: Our created child pool in :func:`main`.
@@ -37,8 +74,110 @@ def mainLoop( stdscr, pool ):
     pool.ui.drawMainScreen( True )
 
     while not pool.stopped:
-        pool.think( )
+        pool.think( pool.ui.keyTime )
         pool.ui.think( )
-        pool.ui.sleep( 0.1 )
 
     curses.endwin( )
+
+
+
+def headlessMain( func, file, kwargs ):
+    """Runs a pool to completion without a terminal. The initial settings wizard is skipped (along with its
+       validation) and any option not provided is set to its default.
+
+       :param func: The function that will be ran continously to simulate load.
+       :param file: Usually __file__, the name of a script in the directory that log/ will be in.
+       :param kwargs: Dict of options, already merged from the script, config file, and command line.
+       :returns: Integer exit code, see the exit codes in const.py.
+    """
+    applyDefaults( kwargs )
+
+    pool = Pool( func, file, kwargs )
+
+    return headlessLoop( pool )
+
+
+
+def headlessLoop( pool ):
+    """The headless counterpart to :func:`mainLoop`. Loops around the pool until it has no more work, printing
+       a periodic summary, then stops it. Ctrl+C stops the pool cleanly.
+
+       :param pool: Our created child pool in :func:`headlessMain`.
+       :returns: Integer exit code, see the exit codes in const.py.
+    """
+    pool.ui = Headless( pool )
+
+    try:
+        while not pool.stopped:
+            pool.think( pool.ui.timeout( ) )
+            pool.ui.think( )
+
+            # Only check once every child has spawned, before that the work queue may still be filling
+            if pool.status == RUNNING and pool.done( ):
+                pool.stopped = True
+    except KeyboardInterrupt:
+        pool.logMsg( "Interrupted, stopping pool.", WARNING )
+        pool.ui.interrupted = True
+
+    pool.stop( )
+
+    if pool.error is not None:
+        pool.ui.out.write( ''.join( [ pool.error, "\n" ] ) )
+
+    pool.ui.summary( )
+    pool.ui.stages( )
+    pool.ui.transactions( )
+    pool.ui.navTiming( )
+    pool.ui.report( )
+
+    return pool.ui.exitCode( )
+
+
+
+def parseArgs( argv ):
+    """Parses command line arguments into an options dict. Arguments take the same form as options directives,
+       ``key=value``, where value is a Python literal (``children=5``, ``stagger=True``). Values that aren't literals are
+       kept as strings so quoting can be left off. Leading dashes are ignored and a bare argument is a flag, so
+       ``--headless`` is the same as ``headless=True``.
+
+       :param argv: List of arguments, usually sys.argv[1:].
+       :returns: Dict of options.
+    """
+    args = { }
+
+    for a in argv:
+        a = a.lstrip( "-" )
+        if "=" in a:
+            key, value = a.split( "=", 1 )
+            args[key] = parseValue( value )
+        elif a != "":
+            args[a] = True
+
+    return args
+
+
+
+def parseValue( value ):
+    """Converts a string from the command line into the Python literal it represents.
+
+       :param value: String to convert.
+       :returns: The literal value if it is one, otherwise the original string.
+    """
+    try:
+        return ast.literal_eval( value )
+    except ( ValueError, SyntaxError ):
+        return value
+
+
+
+def loadConfig( fn ):
+    """Loads options from a JSON config file which contains a single object of option names to values.
+
+       :param fn: Filename of the config file.
+       :returns: Dict of options.
+    """
+    with open( fn, "r" ) as f:
+        config = json.load( f )
+
+    # JSON gives us unicode keys which can't be used as kwargs
+    return dict( ( str( key ), value ) for key, value in config.items( ) )
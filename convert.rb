@@ -100,6 +100,16 @@ def convert_keywords( file )
         func << ( $1 + "driver.child.screenshot( )\n" )
         next
       end
+
+      if l =~ /([\s]+)\#transaction (.+)/
+        func << ( $1 + "driver.child.startTransaction( '#{$2.strip}' )\n" )
+        next
+      end
+
+      if l =~ /([\s]+)\#endtransaction (.+)/
+        func << ( $1 + "driver.child.endTransaction( '#{$2.strip}' )\n" )
+        next
+      end
       ################################################################################################
 
 